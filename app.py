@@ -2,14 +2,13 @@ import streamlit as st
 import time
 import streamlit.components.v1 as components
 
-# Local imports
+# Local imports (lightweight: enough to render the landing page)
 from ui.styles import get_custom_css
-from ui.components import render_header, render_sidebar, render_chat_message, render_dashboard_metrics, render_example_questions_popup
+from ui.components import render_header, render_sidebar, render_chat_message, render_dashboard_metrics, render_example_questions_popup, render_query_memory_admin, render_model_router_admin, render_events_table, render_collapsed_chat_message, render_rerun_timings, render_session_memory
 from ui.auth import render_landing_page
-from models.llm_service import get_llm, setup_agent, get_response
-from utils.response_formatter import enhance_response_presentation
-from utils.visualization import execute_viz_code
-from config.config import APP_TITLE, APP_ICON, BASE_PROMPT_PATH
+from utils.warmup import start_background_warmup
+from utils.metrics import QUESTIONS, STAGE_LATENCY, record_cache, start_metrics_exporter
+from config.config import APP_TITLE, APP_ICON, BASE_PROMPT_PATH, STRUCTURED_PROMPT_PATH, STRUCTURED_OUTPUT_ENABLED, FOLLOWUP_REFINEMENT_ENABLED, SHOW_ADMIN_TOOLS, TABLE_RENDER_MODE, HISTORY_FULL_RENDER_COUNT, RENDER_TIMINGS_KEPT, QA_CACHE_MAX_ENTRIES, BACKGROUND_WARMUP_ENABLED, MAP_LEVEL
 
 # App configuration
 st.set_page_config(
@@ -19,6 +18,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Expose /metrics (and/or the metrics file) once per process
+start_metrics_exporter()
+
+# Import pandas/plotly/LangChain in the background while the landing page is shown
+if BACKGROUND_WARMUP_ENABLED:
+    start_background_warmup()
+
 # Check authentication first - show landing page if not authenticated
 if not render_landing_page():
     # User is not authenticated, landing page is displayed
@@ -26,6 +32,20 @@ if not render_landing_page():
     st.stop()
 
 # User is authenticated - proceed with main app
+# Heavy imports are deferred until here (usually already warm from the background thread)
+from models.llm_service import UncachedAnswer, computed_answers, get_database, get_response
+from catalog.incremental import sync_dependent_caches
+from utils.response_formatter import enhance_response_presentation, build_events_frame, format_insights_section, summarize_response
+from models.query_memory import list_plans
+from models.router import list_outcomes
+from utils.refinement import refine_from_history
+from utils.visualization import execute_viz_code
+from utils.cache_backend import cached, namespace_generation, pin_generations
+from utils.session_memory import LRUDict, SessionArtifactStore, history_text_bytes, process_rss_bytes
+
+# Cache generations are read from the backend once per rerun
+pin_generations()
+
 # Apply custom styling
 st.markdown(get_custom_css(), unsafe_allow_html=True)
 
@@ -37,24 +57,92 @@ render_example_questions_popup()
 
 # Render sidebar (only after popup is dismissed)
 render_sidebar()
-
-# In app.py
+if SHOW_ADMIN_TOOLS:
+    render_query_memory_admin(list_plans())
+    render_model_router_admin(list_outcomes())
 
 # Load the prompt
 @st.cache_data
 def load_prompt():
-    """Load the base prompt template from file."""
+    """Load the base (or structured-output) prompt template from file."""
+    prompt_path = STRUCTURED_PROMPT_PATH if STRUCTURED_OUTPUT_ENABLED else BASE_PROMPT_PATH
     try:
-        with open(BASE_PROMPT_PATH, "r") as file:    
+        with open(prompt_path, "r") as file:    
             return file.read()
     except FileNotFoundError:
-        st.error(f"Could not find prompt file at {BASE_PROMPT_PATH}")
+        st.error(f"Could not find prompt file at {prompt_path}")
         # Fallback in case file is not found
         return """You are an expert analyst for power systems and energy markets. Answer the following question: {question}"""
     
-# Initialize LLM and setup agent
-llm = get_llm()
-agent_executor = setup_agent(llm)
+def render_enhanced_response(enhanced_response):
+    """Render an enhanced response, showing any HTML table snippet via components.html."""
+    if "<div" in enhanced_response and "<table" in enhanced_response:
+        # Split out any markdown before the table
+        pre, html_part = enhanced_response.split("<div", 1)
+        table_html = "<div" + html_part
+        # Extract complete div block containing the table
+        close_idx = table_html.find("</div>")
+        if close_idx != -1:
+            close_idx += len("</div>")
+            table_block = table_html[:close_idx]
+            rest = table_html[close_idx:]
+        else:
+            table_block = table_html
+            rest = ""
+        # Render any leading markdown (e.g., headers)
+        if pre.strip():
+            st.markdown(pre, unsafe_allow_html=True)
+        # Render the scrollable table
+        components.html(table_block, height=450, scrolling=True)
+        # Render following content (e.g., insights)
+        if rest.strip():
+            st.markdown(rest, unsafe_allow_html=True)
+    else:
+        st.markdown(enhanced_response, unsafe_allow_html=True)
+
+def render_history_entry(chat, i):
+    """Render the table, insights and supporting map of a history entry."""
+    if chat.get('refined_from') is not None:
+        st.caption(f"Refined locally from the results of Question {chat['refined_from'] + 1}")
+
+    # Derived frames and figures live in the session's byte-capped artifact store
+    artifacts = st.session_state.artifacts
+
+    # Grid mode: typed events frame in the virtualized data grid
+    events_frame = artifacts.get_or_build(f"frame:{i}", lambda: build_events_frame(chat['response'])) if TABLE_RENDER_MODE == 'grid' else None
+    if events_frame is not None:
+        st.markdown("## Analysis Results")
+        render_events_table(events_frame, key=f"events_table_{i}")
+        insights_text = format_insights_section(chat['response'])
+        if insights_text:
+            st.markdown(insights_text, unsafe_allow_html=True)
+    else:
+        # Process and display the enhanced content with proper markdown rendering
+        render_enhanced_response(enhance_response_presentation(chat['response']))
+
+    # Execute and display the visualization with a connecting element
+    if chat['viz_code'] or True:  # Always try to generate visualization
+        st.markdown("### Supporting Visualization")
+
+        def build_figure():
+            fig, status = execute_viz_code(chat['viz_code'], chat['response'])
+            # The builder is skipped on cached reruns: the status is kept in the figure (shared
+            # cache) or, without a figure, with the history entry (the session caches None)
+            if fig is not None and status:
+                fig.update_layout(meta={'status': list(status)})
+            chat['viz_status'] = status
+            return fig
+
+        fig = artifacts.get_or_build(f"figure:{i}", lambda: cached('figure', f"{MAP_LEVEL}|{chat['response']}", build_figure))
+        meta = fig.layout.meta if fig else None
+        status = meta.get('status') if isinstance(meta, dict) else chat.get('viz_status')
+        if status:
+            level, message = status
+            (st.error if level == 'error' else st.info)(message)
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No specific visualization could be generated for this response.")
 
 # Load the prompt
 PROMPT = load_prompt()
@@ -63,7 +151,9 @@ PROMPT = load_prompt()
 if 'history' not in st.session_state:
     st.session_state.history = []
 if 'qa_cache' not in st.session_state:
-    st.session_state.qa_cache = {}
+    st.session_state.qa_cache = LRUDict(QA_CACHE_MAX_ENTRIES)
+if 'artifacts' not in st.session_state:
+    st.session_state.artifacts = SessionArtifactStore()
 
 # Set current time for timestamps
 st.session_state['current_time'] = time.strftime('%H:%M:%S')
@@ -77,53 +167,61 @@ question = st.text_input(
 
 # Process user input
 if st.button("Analyze"):
-    with st.spinner("Generating insights and visualization..."):
-        response, response_time, viz_code = get_response(question, agent_executor, PROMPT)
-    st.session_state.history.append({"question": question, "response": response, "time": response_time, "viz_code": viz_code})
+    # Follow-ups that only filter/sort/limit the previous result are answered locally
+    refined = refine_from_history(question, st.session_state.history) if FOLLOWUP_REFINEMENT_ENABLED else None
+    if refined:
+        response, response_time, refined_from = refined
+        QUESTIONS.inc(path='followup')
+        st.session_state.history.append({"question": question, "response": response, "time": response_time,
+                                         "viz_code": None, "refined_from": refined_from})
+    else:
+        with st.spinner("Generating insights and visualization..."):
+            # Catalog updates by other processes bump the database's data version; dropping the caches
+            # here keeps this process from serving answers from before the update, whatever the backend
+            try:
+                sync_dependent_caches(get_database()._engine)
+            except Exception:
+                pass
+            computed = computed_answers()
+            try:
+                response, response_time, viz_code = get_response(question, PROMPT, namespace_generation('answer'))
+            except UncachedAnswer as answer:
+                response, response_time, viz_code = answer.response, answer.response_time, None
+            # A hit of get_response's st.cache_data layer never enters the function, so it is counted here
+            response_hit = computed_answers() == computed
+            record_cache('response', response_hit)
+            if response_hit:
+                QUESTIONS.inc(path='response_cache')
+        st.session_state.history.append({"question": question, "response": response, "time": response_time, "viz_code": viz_code})
 
 # Display chat history and visualizations
+if 'render_timings' not in st.session_state:
+    st.session_state.render_timings = []
 if st.session_state.history:
+    render_start = time.perf_counter()
+    history = st.session_state.history
+    first_full = len(history) - HISTORY_FULL_RENDER_COUNT
     st.markdown("<div class='chat-container'>", unsafe_allow_html=True)
-    for i, chat in enumerate(st.session_state.history):
-        # Display the question and response header
-        render_chat_message(chat['question'], chat['response'], chat['time'], i)
-        
-        # Process and display the enhanced content with proper markdown rendering
-        enhanced_response = enhance_response_presentation(chat['response'])
-        # If response contains an HTML table snippet, render it via components.html
-        if "<div" in enhanced_response and "<table" in enhanced_response:
-            # Split out any markdown before the table
-            pre, html_part = enhanced_response.split("<div", 1)
-            table_html = "<div" + html_part
-            # Extract complete div block containing the table
-            close_idx = table_html.find("</div>")
-            if close_idx != -1:
-                close_idx += len("</div>")
-                table_block = table_html[:close_idx]
-                rest = table_html[close_idx:]
-            else:
-                table_block = table_html
-                rest = ""
-            # Render any leading markdown (e.g., headers)
-            if pre.strip():
-                st.markdown(pre, unsafe_allow_html=True)
-            # Render the scrollable table
-            components.html(table_block, height=450, scrolling=True)
-            # Render following content (e.g., insights)
-            if rest.strip():
-                st.markdown(rest, unsafe_allow_html=True)
+    for i, chat in enumerate(history):
+        if i < first_full:
+            # Older entries stay collapsed; their table and map are built only when loaded
+            if 'summary' not in chat:
+                chat['summary'] = summarize_response(chat['response'])
+            summary, row_count = chat['summary']
+            render_collapsed_chat_message(chat['question'], summary, row_count, chat['time'], i,
+                                          lambda: render_history_entry(chat, i))
         else:
-            st.markdown(enhanced_response, unsafe_allow_html=True)
-        
-        # Execute and display the visualization with a connecting element
-        if chat['viz_code'] or True:  # Always try to generate visualization
-            st.markdown("### Supporting Visualization")
-            fig = execute_viz_code(chat['viz_code'], chat['response'])
-            if fig:
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("No specific visualization could be generated for this response.")
+            # Display the question and response header
+            render_chat_message(chat['question'], chat['response'], chat['time'], i)
+            render_history_entry(chat, i)
     st.markdown("</div>", unsafe_allow_html=True)
+    render_seconds = time.perf_counter() - render_start
+    STAGE_LATENCY.observe(render_seconds, stage='render_history')
+    st.session_state.render_timings.append((len(history), render_seconds))
+    del st.session_state.render_timings[:-RENDER_TIMINGS_KEPT]
+if SHOW_ADMIN_TOOLS:
+    render_rerun_timings(st.session_state.render_timings)
+    render_session_memory(st.session_state.artifacts.usage(), history_text_bytes(st.session_state.history), process_rss_bytes())
 
 # Render dashboard metrics
 render_dashboard_metrics()
\ No newline at end of file
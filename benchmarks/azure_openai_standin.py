@@ -0,0 +1,293 @@
+"""
+Local stand-in for the Azure OpenAI chat-completions API.
+
+Serves POST /openai/deployments/<deployment>/chat/completions with the
+request/response shapes AzureChatOpenAI uses, including tool calls, and
+plays a scripted planner instead of a model:
+
+- with get_events available and not yet called, it parses the question with
+  utils.intent and calls get_events with the matching arguments
+- after get_events returns, it calls submit_events with the rows (or the
+  result handle) when that tool is offered, otherwise it answers with the
+  events JSON and a Technical Insights section
+- requests without tools (insight phrasing) get three short insight lines
+- anything else gets a plain-text answer
+
+Latency is simulated as base latency plus prompt and completion token
+processing at configurable rates (tokens estimated as 4 characters each),
+with optional jitter and injected server errors.
+
+Usage:
+    python -m benchmarks.azure_openai_standin [--port 8089] [--latency-ms 400] [--tokens-per-second 80]
+    OPENAI_API_BASE=http://127.0.0.1:8089 OPENAI_API_KEY=test streamlit run app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from utils.intent import parse_intent
+
+
+class StandinConfig:
+    """Latency and failure model of the stand-in."""
+
+    def __init__(self, latency_ms: float = 400, tokens_per_second: float = 80,
+                 prompt_tokens_per_second: float = 20000, jitter: float = 0.1,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def delay(self, prompt_tokens: int, completion_tokens: int) -> float:
+        seconds = (self.latency_ms / 1000 + prompt_tokens / self.prompt_tokens_per_second
+                   + completion_tokens / self.tokens_per_second)
+        with self.lock:
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, seconds * factor)
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            return self.random.random() < self.error_rate
+
+
+def _tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _question(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get('role') == 'user':
+            content = message.get('content') or ''
+            if isinstance(content, list):
+                content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+            found = re.findall(r'Question:\s*(.+)', content)
+            return found[-1].strip() if found else content.strip()
+    return ''
+
+
+def _tool_results(messages: List[Dict[str, Any]]) -> List[tuple]:
+    """(tool name, output) for every tool message, in order."""
+    names = {}
+    results = []
+    for message in messages:
+        for call in message.get('tool_calls') or []:
+            names[call.get('id')] = call.get('function', {}).get('name')
+        if message.get('role') == 'tool':
+            results.append((names.get(message.get('tool_call_id')), message.get('content') or ''))
+    return results
+
+
+def _event_args(question: str) -> Optional[Dict[str, Any]]:
+    intent = parse_intent(question)
+    text = question.lower()
+    event_type = intent['event_type']
+    if event_type is None:
+        mentions = [t for t, words in (('heat', ('heat',)), ('cold', ('cold', 'freeze', 'snap'))) if any(w in text for w in words)]
+        if len(mentions) == 2 or re.search(r'\bevents?\b', text):
+            event_type = 'both'
+    if event_type is None:
+        return None
+    args: Dict[str, Any] = {'event_type': event_type, 'order_by': intent['order']}
+    if intent['region_ids']:
+        args['region_ids'] = intent['region_ids']
+    if intent['start_year'] is not None:
+        args['start_year'] = intent['start_year']
+    if intent['end_year'] is not None:
+        args['end_year'] = intent['end_year']
+    if intent['n']:
+        args['limit'] = intent['n']
+    return args
+
+
+def plan_reply(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Decide the assistant message for a chat-completions request.
+
+    Returns:
+        dict: {'content': str | None, 'tool_calls': list | None}
+    """
+    messages = body.get('messages') or []
+    tools = {t.get('function', {}).get('name') for t in body.get('tools') or []}
+    question = _question(messages)
+    results = _tool_results(messages)
+
+    if not tools:
+        return {'content': "1. Event temperatures cluster near the regional extremes.\n"
+                           "2. Spatial coverage varies widely between events.\n"
+                           "3. Recent decades contain a similar share of severe events.", 'tool_calls': None}
+
+    event_results = [output for name, output in results if name == 'get_events']
+    if 'get_events' in tools and not event_results:
+        args = _event_args(question)
+        if args is not None:
+            return {'content': None, 'tool_calls': [('get_events', args)]}
+        return {'content': "This question is not about heat wave or cold snap events, so no events were queried.",
+                'tool_calls': None}
+
+    if event_results:
+        output = event_results[-1]
+        handle = re.search(r'result_handle="?(r[0-9a-f]{8})', output)
+        data = None
+        if handle is None:
+            try:
+                data = json.loads(output).get('data')
+            except (ValueError, AttributeError):
+                data = None
+        if 'submit_events' in tools:
+            if handle is not None:
+                args = _event_args(question) or {}
+                event_type = args.get('event_type')
+                submit = {'result_handle': handle.group(1), 'insights': []}
+                if event_type in ('heat', 'cold'):
+                    submit['event_type'] = event_type
+                return {'content': None, 'tool_calls': [('submit_events', submit)]}
+            if data is not None:
+                return {'content': None, 'tool_calls': [('submit_events', {'data': data, 'insights': []})]}
+        if data is not None:
+            payload = json.dumps({'data': data}, indent=2)
+            return {'content': f"```json\n{payload}\n```\n\n### Technical Insights:\n1. Events listed above.",
+                    'tool_calls': None}
+        return {'content': f"The event lookup returned: {output[:200]}", 'tool_calls': None}
+
+    return {'content': "I could not find events for this question.", 'tool_calls': None}
+
+
+def completion_response(body: Dict[str, Any], reply: Dict[str, Any], model: str) -> Dict[str, Any]:
+    """Wrap a planned reply in the chat.completion response shape."""
+    prompt_tokens = sum(_tokens(json.dumps(m)) for m in body.get('messages') or [])
+    message: Dict[str, Any] = {'role': 'assistant', 'content': reply['content']}
+    completion_text = reply['content'] or ''
+    if reply['tool_calls']:
+        message['tool_calls'] = []
+        for name, args in reply['tool_calls']:
+            arguments = json.dumps(args)
+            completion_text += arguments
+            message['tool_calls'].append({'id': 'call_' + uuid.uuid4().hex[:12], 'type': 'function',
+                                          'function': {'name': name, 'arguments': arguments}})
+    completion_tokens = _tokens(completion_text)
+    return {
+        'id': 'chatcmpl-' + uuid.uuid4().hex[:12],
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'message': message,
+                     'finish_reason': 'tool_calls' if reply['tool_calls'] else 'stop'}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens},
+    }
+
+
+def stream_chunks(response: Dict[str, Any], chunk_tokens: int = 16) -> List[Dict[str, Any]]:
+    """Split a chat.completion response into chat.completion.chunk deltas."""
+    base = {'id': response['id'], 'object': 'chat.completion.chunk', 'created': response['created'],
+            'model': response['model']}
+    choice = response['choices'][0]
+    message = choice['message']
+    step = chunk_tokens * 4
+    chunks = [{**base, 'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}]}]
+    content = message.get('content') or ''
+    for i in range(0, len(content), step):
+        chunks.append({**base, 'choices': [{'index': 0, 'delta': {'content': content[i:i + step]}, 'finish_reason': None}]})
+    for index, call in enumerate(message.get('tool_calls') or []):
+        arguments = call['function']['arguments']
+        head = {'index': index, 'id': call['id'], 'type': 'function',
+                'function': {'name': call['function']['name'], 'arguments': ''}}
+        chunks.append({**base, 'choices': [{'index': 0, 'delta': {'tool_calls': [head]}, 'finish_reason': None}]})
+        for i in range(0, len(arguments), step):
+            part = {'index': index, 'function': {'arguments': arguments[i:i + step]}}
+            chunks.append({**base, 'choices': [{'index': 0, 'delta': {'tool_calls': [part]}, 'finish_reason': None}]})
+    chunks.append({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': choice['finish_reason']}]})
+    return chunks
+
+
+class _Handler(BaseHTTPRequestHandler):
+    config: StandinConfig = StandinConfig()
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        match = re.match(r'^/openai/deployments/([^/]+)/chat/completions', self.path)
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if not match:
+            self._send(404, {'error': {'code': '404', 'message': 'Resource not found'}})
+            return
+        response = completion_response(body, plan_reply(body), match.group(1))
+        usage = response['usage']
+        if self.config.should_fail():
+            time.sleep(self.config.delay(usage['prompt_tokens'], 0))
+            self._send(500, {'error': {'code': 'InternalServerError', 'message': 'Injected stand-in failure'}})
+            return
+        if not body.get('stream'):
+            time.sleep(self.config.delay(usage['prompt_tokens'], usage['completion_tokens']))
+            self._send(200, response)
+            return
+        # Streaming: time to first token, then chunks at the configured token rate
+        time.sleep(self.config.delay(usage['prompt_tokens'], 0))
+        chunks = stream_chunks(response)
+        per_chunk = self.config.delay(0, usage['completion_tokens']) - self.config.delay(0, 0)
+        per_chunk = max(per_chunk, 0.0) / max(len(chunks), 1)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in chunks:
+            self._write_chunk(b'data: ' + json.dumps(chunk).encode('utf-8') + b'\n\n')
+            if per_chunk:
+                time.sleep(per_chunk)
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def _send(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_in_background(config: Optional[StandinConfig] = None, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Start the stand-in on a daemon thread; port 0 picks a free port."""
+    handler = type('StandinHandler', (_Handler,), {'config': config or StandinConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=400)
+    parser.add_argument('--tokens-per-second', type=float, default=80)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    config = StandinConfig(args.latency_ms, args.tokens_per_second, jitter=args.jitter, error_rate=args.error_rate)
+    handler = type('StandinHandler', (_Handler,), {'config': config})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Azure OpenAI stand-in listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
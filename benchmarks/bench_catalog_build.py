@@ -0,0 +1,145 @@
+"""
+Benchmark a full catalog rebuild from a memory-mapped county temperature cube.
+
+A cube with every county in data/geojson-counties-fips.json and --years of
+synthetic daily tmax/tmin is written block by block (never held in memory),
+counties are assigned to NERC subregions, and catalog.build.detect_cube_events
+is timed for heat waves and cold snaps at each --workers count, each build in
+a fresh interpreter. Peak resident memory is reported for the parent and the
+largest worker; it includes mapped cube pages, which are shared, reclaimable
+page cache rather than process heap.
+
+Usage:
+    python -m benchmarks.bench_catalog_build [--years 70] [--workers 1 2 4] [--cube DIR]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from benchmarks.bench_detection import synthetic_temperatures
+from catalog.build import detect_cube_events
+from catalog.cube import create_cube, open_cube
+from catalog.detection import BLOCK_LOCATIONS, region_weight_matrix
+from config.config import COUNTIES_GEOJSON_PATH, STRING_ID_TO_SUBNAME
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def county_ids(path: str = COUNTIES_GEOJSON_PATH):
+    with open(path) as f:
+        return [str(feature['id']) for feature in json.load(f)['features']]
+
+
+def write_synthetic_cube(path: str, locations, years: int, seed: int = 7):
+    days = int(years * 365.25)
+    cube = create_cube(path, locations, '1950-01-01', days)
+    tmax_out, tmin_out = cube.variable('tmax', 'r+'), cube.variable('tmin', 'r+')
+    for i, lo in enumerate(range(0, len(locations), BLOCK_LOCATIONS)):
+        hi = min(lo + BLOCK_LOCATIONS, len(locations))
+        tmax_out[lo:hi], tmin_out[lo:hi] = synthetic_temperatures(hi - lo, days, seed + i)
+    tmax_out.flush()
+    tmin_out.flush()
+    return open_cube(path)
+
+
+class _RSSSampler(threading.Thread):
+    """Peak RSS of this process and of its largest child, sampled while a build runs.
+
+    getrusage is not used: ru_maxrss carries over a parent's peak across fork/exec.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.parent_mb = self.worker_mb = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = psutil.Process()
+        while not self._stop_event.is_set():
+            try:
+                self.parent_mb = max(self.parent_mb, me.memory_info().rss / 2**20)
+                for child in me.children(recursive=True):
+                    self.worker_mb = max(self.worker_mb, child.memory_info().rss / 2**20)
+            except psutil.Error:
+                pass
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def synthetic_region_weights(cube, seed: int):
+    """Weights assigning each cube location to one random NERC subregion."""
+    region_ids = list(STRING_ID_TO_SUBNAME)
+    labels = np.random.default_rng(seed).choice(region_ids, len(cube.locations))
+    return region_weight_matrix(labels, region_ids)
+
+
+def measure(cube_path: str, event_type: str, workers: int, seed: int):
+    """Build one catalog in this process and print its timing and peak memory as JSON."""
+    weights, region_ids = synthetic_region_weights(open_cube(cube_path), seed)
+    sampler = _RSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    catalog, events, _ = detect_cube_events(cube_path, 'tmax' if event_type == 'heat' else 'tmin', event_type,
+                                            weights, region_ids, workers=workers)
+    seconds = time.perf_counter() - start
+    sampler.stop()
+    print(json.dumps({'seconds': seconds, 'events': len(events), 'rows': len(catalog),
+                      'parent_mb': sampler.parent_mb, 'worker_mb': sampler.worker_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--years', type=int, default=70)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument('--cube', help='existing cube directory to reuse (a temporary one is built otherwise)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--measure', metavar='EVENT_TYPE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.cube, args.measure, args.workers[0], args.seed)
+        return
+
+    workdir = None
+    if args.cube and os.path.exists(args.cube):
+        cube = open_cube(args.cube)
+    else:
+        workdir = None if args.cube else tempfile.mkdtemp(prefix='gridcopilot-cube-')
+        path = args.cube or workdir
+        start = time.perf_counter()
+        cube = write_synthetic_cube(path, county_ids(), args.years, args.seed)
+        print(f"cube written in {time.perf_counter() - start:.1f} s")
+    size_mb = len(cube.locations) * cube.days * 4 * len(cube.variables) / 2**20
+    print(f"{len(cube.locations)} locations x {cube.days} days, {size_mb:.0f} MB of float32 at {cube.path}")
+
+    print(f"\n{'workers':>7} {'type':<5} {'seconds':>8} {'loc events':>10} {'catalog rows':>12} "
+          f"{'parent RSS MB':>13} {'worker RSS MB':>13}")
+    try:
+        for workers in args.workers:
+            for event_type in ('heat', 'cold'):
+                # A fresh interpreter per build, so peak memory is the build's own
+                out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_catalog_build', '--cube', cube.path,
+                                      '--measure', event_type, '--workers', str(workers), '--seed', str(args.seed)],
+                                     cwd=_ROOT, capture_output=True, text=True, check=True)
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{workers:>7} {event_type:<5} {r['seconds']:>8.2f} {r['events']:>10} {r['rows']:>12} "
+                      f"{r['parent_mb']:>13.0f} {r['worker_mb']:>13.0f}")
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark an incremental catalog update against a full rebuild.
+
+A synthetic county cube (see bench_catalog_build) is written with its last
+--season days held back. Heat wave and cold snap catalogs are built and
+written to a SQLite event table, the held-back season is appended with
+catalog.cube.append_days, and catalog.incremental.update_catalog is timed
+against rebuilding the whole catalog with the same frozen thresholds. The
+updated catalog is checked against the rebuild.
+
+Usage:
+    python -m benchmarks.bench_catalog_update [--years 70] [--season 92] [--workers 1]
+"""
+import os
+
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from benchmarks.bench_catalog_build import synthetic_region_weights, county_ids, write_synthetic_cube
+from catalog.build import detect_cube_events
+from catalog.cube import append_days, open_cube
+from catalog.detection import CATALOG_COLUMNS
+from catalog.incremental import EVENT_VARIABLES, build_catalog, load_state, update_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--years', type=int, default=70)
+    parser.add_argument('--season', type=int, default=92, help='days appended after the initial build')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gridcopilot-update-')
+    try:
+        path = os.path.join(workdir, 'cube')
+        cube = write_synthetic_cube(path, county_ids(), args.years, args.seed)
+        held_back = {name: np.array(cube.variable(name)[:, -args.season:]) for name in cube.variables}
+        cube.meta['days'] -= args.season
+        cube.save_meta()
+        weights, region_ids = synthetic_region_weights(cube, args.seed)
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'events.db')}")
+        print(f"{len(cube.locations)} locations x {cube.days} days, appending {args.season} days")
+
+        print(f"\n{'type':<5} {'build s':>8} {'update s':>8} {'rebuild s':>9} {'speedup':>7} "
+              f"{'inserted':>8} {'updated':>7} {'deleted':>7} {'identical':>9}")
+        build_seconds = {}
+        for event_type in EVENT_VARIABLES:
+            start = time.perf_counter()
+            build_catalog(path, event_type, weights, region_ids, engine=engine, workers=args.workers)
+            build_seconds[event_type] = time.perf_counter() - start
+        append_days(open_cube(path), held_back)
+
+        for event_type, variable in EVENT_VARIABLES.items():
+            thresholds = load_state(path, event_type)['thresholds']
+            start = time.perf_counter()
+            result = update_catalog(path, event_type, weights, region_ids, engine=engine)
+            update_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            rebuilt, _, _ = detect_cube_events(path, variable, event_type, weights, region_ids,
+                                               workers=args.workers, thresholds=thresholds)
+            rebuild_seconds = time.perf_counter() - start
+            columns = [c for c in CATALOG_COLUMNS if c != 'event_ID']
+            identical = result['catalog'][columns].equals(rebuilt[columns])
+            print(f"{event_type:<5} {build_seconds[event_type]:>8.2f} {update_seconds:>8.2f} {rebuild_seconds:>9.2f} "
+                  f"{rebuild_seconds / update_seconds:>6.0f}x {len(result['inserted']):>8} "
+                  f"{len(result['updated']):>7} {len(result['deleted']):>7} {str(identical):>9}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
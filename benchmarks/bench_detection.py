@@ -0,0 +1,113 @@
+"""
+Benchmark Definition 6 event detection on a synthetic county x day record.
+
+Synthetic daily maximum/minimum temperatures (seasonal cycle by latitude
+plus AR(1) anomalies) are generated for --locations counties over --years
+years and assigned to the 16 NERC subregions. The vectorized engine in
+catalog.detection is timed per stage (thresholds, location events, regional
+aggregation) for heat waves and cold snaps, and its location events are
+checked against a straightforward per-day reference implementation on the
+first --check locations.
+
+Usage:
+    python -m benchmarks.bench_detection [--locations 3100] [--years 70] [--check 50]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog.detection import (MIN_RUN_DAYS, detect_location_events, detection_thresholds, region_daily_coverage,
+                               region_events, region_weight_matrix)
+from config.config import STRING_ID_TO_SUBNAME
+
+
+def synthetic_temperatures(locations: int, days: int, seed: int = 7):
+    """(tmax, tmin) float32 arrays of shape (locations, days) in °F."""
+    rng = np.random.default_rng(seed)
+    latitude = rng.uniform(25, 49, locations).astype(np.float32)
+    season = np.sin(2 * np.pi * (np.arange(days) - 105) / 365.25).astype(np.float32)
+    tmax = np.empty((locations, days), np.float32)
+    anomaly = np.zeros(locations, np.float32)
+    noise = rng.standard_normal((days, locations), dtype=np.float32) * np.float32(4.5)
+    for day in range(days):
+        anomaly = np.float32(0.8) * anomaly + noise[day]
+        tmax[:, day] = anomaly
+    tmax += 88 - (latitude[:, None] - 37) * 1.3 + (22 + (latitude[:, None] - 25) * 0.4) * season[None, :] - 14
+    tmin = tmax - 20 + rng.standard_normal((locations, days), dtype=np.float32) * 3
+    return tmax, tmin
+
+
+def reference_location_events(series: np.ndarray, t1: float, t2: float, min_run: int = MIN_RUN_DAYS):
+    """
+    Per-day Definition 6 events of one heat-oriented series, as (first day, last day) pairs.
+
+    Each run of at least min_run days above T1 that is not already in an event is extended
+    one day at a time, forward and then backward, while the day is above T2, the mean stays
+    above T1 and the previous event is not reached.
+    """
+    events, previous_end, day, days = [], 0, 0, len(series)
+    while day < days:
+        if not series[day] > t1:
+            day += 1
+            continue
+        core_end = day
+        while core_end < days and series[core_end] > t1:
+            core_end += 1
+        if core_end - day >= min_run and day >= previous_end:
+            start, end = day, core_end
+            while end < days and series[end] > t2 and series[start:end + 1].mean(dtype=np.float64) > t1:
+                end += 1
+            while start > previous_end and series[start - 1] > t2 and series[start - 1:end].mean(dtype=np.float64) > t1:
+                start -= 1
+            events.append((start, end - 1))
+            previous_end = end
+        day = core_end
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--locations', type=int, default=3100)
+    parser.add_argument('--years', type=int, default=70)
+    parser.add_argument('--check', type=int, default=50, help='locations checked against the reference')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    dates = pd.date_range('1950-01-01', periods=int(args.years * 365.25), freq='D')
+    start = time.perf_counter()
+    tmax, tmin = synthetic_temperatures(args.locations, len(dates), args.seed)
+    print(f"{args.locations} locations x {len(dates)} days ({tmax.nbytes / 2**20:.0f} MB per variable), "
+          f"generated in {time.perf_counter() - start:.1f} s")
+    region_ids = list(STRING_ID_TO_SUBNAME)
+    labels = np.random.default_rng(args.seed).choice(region_ids, args.locations)
+    weights, region_ids = region_weight_matrix(labels, region_ids)
+
+    print(f"\n{'type':<5} {'thresholds s':>12} {'locations s':>11} {'regions s':>9} {'Mcells/s':>9} "
+          f"{'loc events':>10} {'catalog rows':>12}")
+    for event_type, temps in (('heat', tmax), ('cold', tmin)):
+        t0 = time.perf_counter()
+        thresholds = detection_thresholds(temps, event_type)
+        t1 = time.perf_counter()
+        events = detect_location_events(temps, event_type, thresholds)
+        t2 = time.perf_counter()
+        coverage, weighted = region_daily_coverage(temps, events, weights)
+        catalog = region_events(coverage, weighted, dates, region_ids)
+        t3 = time.perf_counter()
+        print(f"{event_type:<5} {t1 - t0:>12.2f} {t2 - t1:>11.2f} {t3 - t2:>9.2f} "
+              f"{temps.size / (t3 - t0) / 1e6:>9.1f} {len(events):>10} {len(catalog):>12}")
+
+        sign = 1 if event_type == 'heat' else -1
+        mismatched = 0
+        for loc in range(min(args.check, args.locations)):
+            expected = reference_location_events(sign * temps[loc], sign * thresholds[0][loc],
+                                                  sign * thresholds[1][loc])
+            got = events[events['location'] == loc]
+            mismatched += expected != list(zip(got['start_day'], got['end_day']))
+        print(f"      reference check: {min(args.check, args.locations) - mismatched}/"
+              f"{min(args.check, args.locations)} locations identical")
+
+
+if __name__ == '__main__':
+    main()
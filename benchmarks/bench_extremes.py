@@ -0,0 +1,75 @@
+"""
+Benchmark return-level statistics: batched GEV fits vs one fit per region.
+
+Annual extremes for --regions synthetic regions over --years years are drawn
+from known GEV distributions, with --missing of the years left without an
+event. They are fitted in one batched L-moment call and region by region,
+and the parameters are compared with each other and with the truth. Then
+return levels are answered from a synthetic SQLite event database, first
+with fitting and then from the cached parameters.
+
+Usage:
+    python -m benchmarks.bench_extremes [--regions 2000] [--years 75]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine
+
+from benchmarks.load_test import build_local_database
+from utils.extremes import fit_gev, return_levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--regions', type=int, default=2000, help='synthetic series fitted at once')
+    parser.add_argument('--years', type=int, default=75)
+    parser.add_argument('--missing', type=float, default=0.1, help='share of years without an event')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    xi = rng.uniform(95, 110, args.regions)
+    alpha = rng.uniform(1, 4, args.regions)
+    k = rng.uniform(-0.1, 0.3, args.regions)
+    u = rng.random((args.regions, args.years))
+    samples = xi[:, None] + alpha[:, None] * (1 - (-np.log(u)) ** k[:, None]) / k[:, None]
+    samples[rng.random(samples.shape) < args.missing] = np.nan
+
+    start = time.perf_counter()
+    batched = fit_gev(samples)
+    batched_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    looped = [fit_gev(row[None, ~np.isnan(row)]) for row in samples]
+    looped_seconds = time.perf_counter() - start
+    difference = max(np.nanmax(np.abs(batched[name] - np.concatenate([fit[name] for fit in looped])))
+                     for name in ('xi', 'alpha', 'k'))
+    print(f"{args.regions} series x {args.years} years: batched {batched_seconds * 1000:.1f} ms, "
+          f"per series {looped_seconds * 1000:.1f} ms ({looped_seconds / batched_seconds:.0f}x), "
+          f"max parameter difference {difference:.1e}")
+    print(f"median absolute error vs the true parameters: xi {np.median(np.abs(batched['xi'] - xi)):.2f}, "
+          f"alpha {np.median(np.abs(batched['alpha'] - alpha)):.2f}, k {np.median(np.abs(batched['k'] - k)):.3f}")
+
+    workdir = tempfile.mkdtemp(prefix='gridcopilot-extremes-')
+    try:
+        path = os.path.join(workdir, 'events.db')
+        build_local_database(path, 3.0, args.seed)
+        engine = create_engine(f"sqlite:///{path}")
+        start = time.perf_counter()
+        levels = return_levels(engine, 'both')
+        first_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        return_levels(engine, 'heat', (50,), ['17'])
+        warm_seconds = time.perf_counter() - start
+        print(f"\nreturn levels for every region and both event types: {first_seconds * 1000:.0f} ms with fitting "
+              f"({len(levels)} records), {warm_seconds * 1000:.2f} ms from cached parameters")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
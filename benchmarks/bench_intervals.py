@@ -0,0 +1,84 @@
+"""
+Benchmark concurrent-event queries: interval index vs SQL date-range self-joins.
+
+A synthetic SQLite event database (the load test's) is queried for
+--days random "events active on day D" lookups and for co-occurrence of
+heat waves across three regions. Each query runs once through the interval
+index and once as SQL, and the results are compared. Every event of a
+cluster must also span the cluster's common window.
+
+Usage:
+    python -m benchmarks.bench_intervals [--events-per-region-year 3] [--days 200]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from benchmarks.load_test import build_local_database
+from utils.intervals import active_events, event_index
+
+ACTIVE_SQL = text("SELECT start_date, NERC_ID FROM heat_wave_metadata WHERE start_date <= :day AND end_date >= :day")
+# Events of the three regions that overlap an event of another of them
+PAIR_SQL = text("""
+    SELECT DISTINCT a.start_date, a.NERC_ID FROM heat_wave_metadata a
+    JOIN heat_wave_metadata b ON b.NERC_ID IN ('17', '18', '8') AND b.NERC_ID <> a.NERC_ID
+        AND b.start_date <= a.end_date AND b.end_date >= a.start_date
+    WHERE a.NERC_ID IN ('17', '18', '8')
+""")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events-per-region-year', type=float, default=3.0)
+    parser.add_argument('--days', type=int, default=200, help='random "active on" days to query')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gridcopilot-intervals-')
+    try:
+        path = os.path.join(workdir, 'events.db')
+        build_local_database(path, args.events_per_region_year, args.seed)
+        engine = create_engine(f"sqlite:///{path}")
+
+        start = time.perf_counter()
+        index = event_index(engine, 'heat')
+        print(f"{len(index)} heat wave events indexed in {(time.perf_counter() - start) * 1000:.0f} ms (once per process)")
+
+        rng = np.random.default_rng(args.seed)
+        days = np.datetime_as_string(np.datetime64('1950-06-01') + rng.integers(0, 74 * 365, args.days)).tolist()
+        start = time.perf_counter()
+        indexed = [{(r['DS'], r['ID']) for r in active_events(engine, 'heat', day)} for day in days]
+        index_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            joined = [{tuple(row) for row in conn.execute(ACTIVE_SQL, {'day': day})} for day in days]
+        sql_seconds = time.perf_counter() - start
+        print(f"active on {args.days} days: index {index_seconds / args.days * 1000:.2f} ms/query, "
+              f"SQL scan {sql_seconds / args.days * 1000:.2f} ms/query; identical: {indexed == joined}")
+
+        start = time.perf_counter()
+        positions, cluster, windows = index.clusters(['17', '18', '8'], min_regions=2)
+        clusters = index.records(positions, cluster, (windows[0][cluster], windows[1][cluster]))
+        index_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            pairs = {tuple(row) for row in conn.execute(PAIR_SQL)}
+        sql_seconds = time.perf_counter() - start
+        in_clusters = {(r['DS'], r['ID']) for r in clusters}
+        simultaneous = all(r['DS'] <= r['cluster_start'] <= r['cluster_end'] <= r['DE'] for r in clusters)
+        print(f"co-occurrence across 3 regions: index {index_seconds * 1000:.1f} ms "
+              f"({len({r['cluster'] for r in clusters})} clusters, {len(in_clusters)} events), "
+              f"SQL self-join {sql_seconds * 1000:.1f} ms ({len(pairs)} overlapping events); "
+              f"every overlapping event is clustered: {pairs <= in_clusters}, "
+              f"every event spans its cluster window: {simultaneous}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark event-payload parsing: free-text JSON repair vs structured output.
+
+Free-text path: the model writes JSON in its message and the app recovers it
+with extract_json_from_response/robust_json_parse. Structured path: the model
+returns the event list as submit_events function-call arguments, which are
+decoded with json.loads and validated into EventRecord objects. Both paths are
+fed the same malformed model output (the arguments string carries the same
+comment, trailing comma, truncation or quoting as the message), so failures of
+the structured path are first-pass failures the model is asked to correct.
+
+Usage:
+    python -m benchmarks.bench_json_parsing [--corpus corpus.jsonl] [--cases 200]
+
+A corpus is a JSONL file with one recorded answer per line:
+    {"response": "<free-text answer>", "tool_args": "<raw function-call arguments>", "expected": 42}
+"tool_args" (the arguments string as returned by the API, or a decoded object)
+and "expected" are optional. Without --corpus a synthetic corpus
+reproducing the malformations seen in practice (comments, trailing commas,
+truncation, missing fences) is generated with a fixed seed.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from utils.response_formatter import extract_json_from_response
+from models.tools import validate_event_payload
+
+MALFORMATIONS = ('clean', 'no_fence', 'comment', 'trailing_comma', 'truncated', 'string_numbers')
+
+
+def random_events(rng, n):
+    """Synthetic compact event records (DS/DE/T/SC/ID/Type), shared by the rendering benchmarks."""
+    events = []
+    for _ in range(n):
+        year = rng.randint(1950, 2023)
+        month = rng.choice([1, 2, 7, 8])
+        day = rng.randint(1, 25)
+        is_heat = month in (7, 8)
+        events.append({
+            'DS': f'{year}-{month:02d}-{day:02d}',
+            'DE': f'{year}-{month:02d}-{day + 3:02d}',
+            'T': round(rng.uniform(95, 112) if is_heat else rng.uniform(-20, 15), 1),
+            'SC': round(rng.uniform(1, 100), 1),
+            'ID': rng.choice(['1', '3', '8', '15', '17', '18', '20']),
+            'Type': 'heat' if is_heat else 'cold',
+        })
+    return events
+
+
+def _malform(body, kind, events):
+    """Apply one malformation to a JSON document."""
+    if kind == 'comment':
+        return body.replace('"data": [', '"data": [ // events sorted by severity', 1)
+    if kind == 'trailing_comma':
+        return body.replace('}\n  ]', '},\n  ]')
+    if kind == 'truncated':
+        return body[:int(len(body) * 0.8)]
+    if kind == 'string_numbers':
+        for e in events:
+            body = body.replace(f'"T": {e["T"]},', f'"T": "{e["T"]}",', 1)
+    return body
+
+
+def synthetic_corpus(cases, seed=7):
+    """Generate recorded-answer-like cases with a mix of malformations."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(cases):
+        events = random_events(rng, rng.choice([5, 10, 50, 200, 600]))
+        kind = MALFORMATIONS[i % len(MALFORMATIONS)]
+        body = _malform(json.dumps({'data': events}, indent=2), kind, events)
+        insights = "### Technical Insights:\n1. Trend.\n2. Coverage.\n3. Frequency."
+        if kind == 'no_fence':
+            response = f"Here are the results:\n{body}\n\n{insights}"
+        else:
+            response = f"```json\n{body}\n```\n\n{insights}"
+        # Function-call arguments are not fenced; otherwise they carry the same malformation
+        arguments = json.dumps({'data': events, 'insights': ['Trend.', 'Coverage.', 'Frequency.']}, indent=2)
+        corpus.append({
+            'response': response,
+            'tool_args': _malform(arguments, kind, events),
+            'expected': len(events),
+            'kind': kind,
+        })
+    return corpus
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _time_path(cases, parse):
+    failures = 0
+    durations = []
+    for case in cases:
+        start = time.perf_counter()
+        try:
+            records = parse(case)
+        except Exception:
+            records = None
+        durations.append((time.perf_counter() - start) * 1000)
+        expected = case.get('expected')
+        if records is None or (expected is not None and len(records) != expected):
+            failures += 1
+    return failures, durations
+
+
+def parse_free_text(case):
+    data = extract_json_from_response(case['response'])
+    if not (isinstance(data, dict) and isinstance(data.get('data'), list)):
+        return None
+    return data['data']
+
+
+def parse_structured(case):
+    # Function-call arguments arrive as a JSON string from the API
+    raw = case['tool_args'] if isinstance(case['tool_args'], str) else json.dumps(case['tool_args'])
+    return validate_event_payload(json.loads(raw))
+
+
+def _report(name, total, failures, durations):
+    durations = sorted(durations)
+    p95 = durations[int(0.95 * (len(durations) - 1))] if durations else 0.0
+    print(f"{name:<12} cases={total:<5} failures={failures:<5} "
+          f"mean={statistics.mean(durations) if durations else 0:.3f}ms p95={p95:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--corpus', help='JSONL corpus of recorded answers')
+    parser.add_argument('--cases', type=int, default=200, help='synthetic corpus size')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.cases)
+    failures, durations = _time_path(corpus, parse_free_text)
+    _report('free-text', len(corpus), failures, durations)
+
+    structured = [c for c in corpus if c.get('tool_args')]
+    if structured:
+        failures, durations = _time_path(structured, parse_structured)
+        _report('structured', len(structured), failures, durations)
+
+    if not args.corpus:
+        print("\nfailures by malformation:   free-text  structured")
+        for kind in MALFORMATIONS:
+            cases = [c for c in corpus if c['kind'] == kind]
+            free_text, _ = _time_path(cases, parse_free_text)
+            structured, _ = _time_path(cases, parse_structured)
+            print(f"  {kind:<25} {free_text:>3}/{len(cases):<6} {structured:>3}/{len(cases)}")
+
+
+if __name__ == '__main__':
+    main()
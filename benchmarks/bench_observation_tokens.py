@@ -0,0 +1,79 @@
+"""
+Benchmark tokens per question: raw sql_db_query observations vs compact ones.
+
+For each result size the script reports
+- observation tokens: what the query tool feeds back into every later LLM call
+  (default tool: Python repr of row tuples, as SQLDatabase.run returns with
+  psycopg2 date objects; compact tool: header + typed rows, or summary +
+  handle above OBSERVATION_ROW_THRESHOLD)
+- answer tokens: what the model has to generate to return the rows (all rows
+  as JSON vs a submit_events call with result_handle)
+- prompt tokens per question for a typical 3-call agent run (schema lookup,
+  query, final answer), where the observation is resent on the final call
+
+Usage:
+    python -m benchmarks.bench_observation_tokens [--sizes 10 50 200 600]
+
+Token counts use tiktoken's o200k_base encoding (gpt-4.1) when it is
+available locally, otherwise an estimate of 4 characters per token.
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+
+from utils.observations import format_observation
+
+COLUMNS = ['start_date', 'end_date', 'temperature', 'spatial_coverage', 'NERC_ID']
+
+# Prompt tokens sent on every call regardless of results (system prompt,
+# question, tool schemas); a rough constant so totals are comparable
+BASE_PROMPT_TOKENS = 2500
+
+
+def _token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding('o200k_base')
+        return (lambda text: len(encoding.encode(text))), 'tiktoken o200k_base'
+    except Exception:
+        return (lambda text: (len(text) + 3) // 4), 'estimate (4 chars/token)'
+
+
+def _rows(n, seed=3):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        start = date(rng.randint(1950, 2023), 7, 1) + timedelta(days=rng.randint(0, 60))
+        rows.append((start, start + timedelta(days=rng.randint(2, 9)),
+                     rng.uniform(95, 112), rng.uniform(1, 100), str(rng.choice([3, 8, 17, 18, 20]))))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200, 600])
+    args = parser.parse_args()
+    count, method = _token_counter()
+    print(f"token counting: {method}\n")
+    print(f"{'rows':>5} | {'obs raw':>8} {'obs compact':>12} | {'answer raw':>10} {'answer handle':>13} | "
+          f"{'prompt/q raw':>12} {'prompt/q compact':>16}")
+    for n in args.sizes:
+        rows = _rows(n)
+        raw_obs = str(rows)
+        compact_obs = format_observation(COLUMNS, rows)
+        records = [{'DS': r[0].isoformat(), 'DE': r[1].isoformat(), 'T': round(r[2], 1),
+                    'SC': round(r[3], 1), 'ID': r[4], 'Type': 'heat'} for r in rows]
+        raw_answer = json.dumps({'data': records, 'insights': ['...'] * 3})
+        handle_answer = json.dumps({'result_handle': 'r0123abcd', 'event_type': 'heat', 'insights': ['...'] * 3})
+        if 'result_handle' not in compact_obs:
+            handle_answer = raw_answer
+        # Calls: schema lookup, query, final answer (observation resent on the last call)
+        prompt_raw = 3 * BASE_PROMPT_TOKENS + count(raw_obs)
+        prompt_compact = 3 * BASE_PROMPT_TOKENS + count(compact_obs)
+        print(f"{n:>5} | {count(raw_obs):>8} {count(compact_obs):>12} | {count(raw_answer):>10} "
+              f"{count(handle_answer):>13} | {prompt_raw:>12} {prompt_compact:>16}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark bulk point-in-region lookup at asset-list scale.
+
+--points random lat/lon points over the contiguous US are assigned to NERC
+subregions and counties with catalog.points.locate_points (the load test's
+stand-in region grid is used when NERC_GEOJSON_PATH does not exist). Index
+build and lookup are timed separately. A per-point loop over every polygon
+(the approach without a spatial index) is timed on the first --check points,
+extrapolated to the full list, and its answers are compared.
+
+Usage:
+    python -m benchmarks.bench_point_lookup [--points 100000] [--check 500]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from shapely.geometry import Point
+
+from benchmarks.load_test import build_region_geojson
+from catalog.points import load_layer, locate_points
+from catalog.spatial import load_geometries
+from config.config import COUNTIES_GEOJSON_PATH, NERC_GEOJSON_PATH
+
+
+def naive_lookup(lats, lons, ids, geometries):
+    """First polygon containing each point, testing every polygon per point."""
+    out = []
+    for lat, lon in zip(lats, lons):
+        point = Point(lon, lat)
+        out.append(next((fid for fid, geom in zip(ids, geometries) if geom.intersects(point)), None))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--points', type=int, default=100_000)
+    parser.add_argument('--check', type=int, default=500, help='points also located with the per-point loop')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gridcopilot-points-')
+    try:
+        regions_path = NERC_GEOJSON_PATH
+        if not os.path.exists(regions_path):
+            regions_path = os.path.join(workdir, 'regions.json')
+            build_region_geojson(regions_path)
+            print("NERC GeoJSON not found; using the load test's stand-in region grid")
+        rng = np.random.default_rng(args.seed)
+        lats = rng.uniform(24.5, 49.5, args.points)
+        lons = rng.uniform(-125.0, -66.5, args.points)
+
+        start = time.perf_counter()
+        load_layer(regions_path, 'ID')
+        load_layer(COUNTIES_GEOJSON_PATH)
+        index_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        located = locate_points(lats, lons, regions_path, COUNTIES_GEOJSON_PATH)
+        lookup_seconds = time.perf_counter() - start
+        print(f"{args.points} points: index built in {index_seconds:.2f} s (once per process), "
+              f"lookup {lookup_seconds:.2f} s ({args.points / lookup_seconds:,.0f} points/s)")
+        print(f"in a subregion: {located['NERC_ID'].notna().mean():.1%}, in a county: {located['FIPS'].notna().mean():.1%}")
+
+        check = min(args.check, args.points)
+        county_ids, counties = load_geometries(COUNTIES_GEOJSON_PATH)
+        region_ids, regions = load_geometries(regions_path, 'ID')
+        start = time.perf_counter()
+        naive_fips = naive_lookup(lats[:check], lons[:check], county_ids, counties)
+        naive_nerc = naive_lookup(lats[:check], lons[:check], region_ids, regions)
+        naive_seconds = (time.perf_counter() - start) / check * args.points
+        agree = (np.array(naive_fips, dtype=object) == located['FIPS'].to_numpy()[:check]).mean()
+        agree_nerc = (np.array(naive_nerc, dtype=object) == located['NERC_ID'].to_numpy()[:check]).mean()
+        print(f"per-point loop: ~{naive_seconds:.0f} s for {args.points} points "
+              f"({naive_seconds / lookup_seconds:.0f}x slower); agreement on {check} points: "
+              f"county {agree:.1%}, subregion {agree_nerc:.1%}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Record agent sessions and replay them as a deterministic regression benchmark.
+
+Record mode answers each question through get_response against the
+configured Azure OpenAI endpoint and database (or the local stand-in, see
+benchmarks.azure_openai_standin), appending every chat completion and SQL
+result to the trace. Replay mode re-runs the recorded questions offline:
+chat completions and SQL results come from the trace (matched by request
+hash), caches and stored query plans are bypassed, and each final response
+must match the recorded one. The visualization path (event JSON parsing and
+the choropleth figure, when the GeoJSON is available) is timed per answer.
+
+--export-corpus writes the recorded answers in the corpus format of
+benchmarks.bench_json_parsing (raw agent output plus submit_events args).
+
+Usage:
+    python -m benchmarks.bench_replay --trace trace.jsonl.gz --record questions.txt
+    python -m benchmarks.bench_replay --trace trace.jsonl.gz [--repeat 3]
+    python -m benchmarks.bench_replay --trace trace.jsonl.gz --export-corpus corpus.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+
+def _answers(path):
+    from utils.agent_trace import read_trace
+    return [e for e in read_trace(path) if e.get('kind') == 'answer']
+
+
+def export_corpus(trace_path, out_path):
+    """Write recorded answers as bench_json_parsing corpus lines; returns the count."""
+    count = 0
+    with open(out_path, 'w') as f:
+        for answer in _answers(trace_path):
+            case = {'question': answer['question'], 'response': answer['output']}
+            tool_args = answer.get('tool_args')
+            if tool_args:
+                case['tool_args'] = tool_args
+                if isinstance(tool_args.get('data'), list) and tool_args['data']:
+                    case['expected'] = len(tool_args['data'])
+            f.write(json.dumps(case) + '\n')
+            count += 1
+    return count
+
+
+def _ask(question, prompt):
+    import streamlit as st
+    from models.llm_service import UncachedAnswer, get_response
+    from utils.cache_backend import invalidate_namespace
+    from utils.session_memory import LRUDict
+    # Every run goes through the full pipeline, not the answer or SQL caches
+    st.session_state.qa_cache = LRUDict(64)
+    for namespace in ('answer', 'events', 'sql'):
+        invalidate_namespace(namespace)
+    start = time.perf_counter()
+    try:
+        response, _, _ = get_response(question, prompt)
+    except UncachedAnswer as answer:
+        response = answer.response
+    return response, time.perf_counter() - start
+
+
+def _time_visualization(response):
+    from utils.visualization import GEOJSON_AVAILABLE, create_animated_choropleth_from_data, parse_temperature_json
+    start = time.perf_counter()
+    is_temp_data, df, event_type = parse_temperature_json(response)
+    if is_temp_data and GEOJSON_AVAILABLE:
+        create_animated_choropleth_from_data(df, event_type)
+    return is_temp_data, time.perf_counter() - start
+
+
+def _load_prompt():
+    from config.config import BASE_PROMPT_PATH, STRUCTURED_OUTPUT_ENABLED, STRUCTURED_PROMPT_PATH
+    with open(STRUCTURED_PROMPT_PATH if STRUCTURED_OUTPUT_ENABLED else BASE_PROMPT_PATH) as f:
+        return f.read()
+
+
+def record(questions_path):
+    with open(questions_path) as f:
+        questions = [line.strip() for line in f if line.strip()]
+    prompt = _load_prompt()
+    print(f"{'seconds':>8}  question")
+    for question in questions:
+        _, seconds = _ask(question, prompt)
+        print(f"{seconds:>8.2f}  {question}")
+
+
+def replay(trace_path, repeat):
+    prompt = _load_prompt()
+    answers = _answers(trace_path)
+    mismatches = 0
+    print(f"{'answer ms':>10} {'viz ms':>8} {'same':>5}  question")
+    for answer in answers:
+        times, viz_times, same = [], [], True
+        for _ in range(repeat):
+            response, seconds = _ask(answer['question'], prompt)
+            times.append(seconds)
+            same = same and response == answer['response']
+            _, viz_seconds = _time_visualization(response)
+            viz_times.append(viz_seconds)
+        mismatches += not same
+        print(f"{statistics.median(times) * 1000:>10.1f} {statistics.median(viz_times) * 1000:>8.1f} "
+              f"{'yes' if same else 'NO':>5}  {answer['question']}")
+    print(f"\n{len(answers)} recorded answers, {mismatches} differ from the recording")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--trace', required=True, help='trace file (gzip JSON lines)')
+    parser.add_argument('--record', metavar='QUESTIONS', help='record answers to the questions in this file')
+    parser.add_argument('--export-corpus', metavar='OUT', help='write recorded answers as a JSONL corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='replays per question (median reported)')
+    args = parser.parse_args()
+
+    if args.export_corpus:
+        print(f"{export_corpus(args.trace, args.export_corpus)} answers written to {args.export_corpus}")
+        return
+    # Configuration is read at import time, so select the trace mode first
+    os.environ.update({
+        'AGENT_TRACE_MODE': 'record' if args.record else 'replay',
+        'AGENT_TRACE_PATH': args.trace,
+        'QUERY_MEMORY_ENABLED': 'false',
+        'METRICS_PORT': '0',
+    })
+    if args.record:
+        record(args.record)
+        return
+    # Replays take every query result from the trace; no database is needed
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    sys.exit(1 if replay(args.trace, args.repeat) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the county x NERC subregion area-weight matrix and coverage aggregation.
+
+The weights are built from data/geojson-counties-fips.json and the NERC
+subregion GeoJSON (the load test's stand-in grid of rectangles when
+NERC_GEOJSON_PATH does not exist), then loaded back from the .npz cache.
+Random per-county daily event flags over --days days are aggregated to
+per-region coverage with the sparse product and with the equivalent dense
+matrix product, and the results are compared.
+
+Usage:
+    python -m benchmarks.bench_spatial [--days 25567] [--event-share 0.05]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.load_test import build_region_geojson
+from catalog.spatial import county_region_weights, region_coverage
+from config.config import COUNTIES_GEOJSON_PATH, NERC_GEOJSON_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--days', type=int, default=25567)
+    parser.add_argument('--event-share', type=float, default=0.05, help='share of county-days flagged')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gridcopilot-spatial-')
+    try:
+        regions_path = NERC_GEOJSON_PATH
+        if not os.path.exists(regions_path):
+            regions_path = os.path.join(workdir, 'regions.json')
+            build_region_geojson(regions_path)
+            print("NERC GeoJSON not found; using the load test's stand-in region grid")
+        cache_path = os.path.join(workdir, 'weights.npz')
+
+        start = time.perf_counter()
+        weights, county_ids, region_ids = county_region_weights(COUNTIES_GEOJSON_PATH, regions_path, cache_path)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        county_region_weights(COUNTIES_GEOJSON_PATH, regions_path, cache_path)
+        load_seconds = time.perf_counter() - start
+        counties, regions = weights.shape
+        print(f"{counties} counties x {regions} regions: {weights.nnz} nonzero weights "
+              f"({weights.nnz / (counties * regions):.1%} dense), {os.path.getsize(cache_path) / 1024:.0f} KB on disk")
+        print(f"built in {build_seconds:.2f} s (STRtree + intersections), loaded from cache in {load_seconds * 1000:.1f} ms")
+
+        flags = np.random.default_rng(args.seed).random((counties, args.days)) < args.event_share
+        start = time.perf_counter()
+        sparse = region_coverage(weights, flags)
+        sparse_seconds = time.perf_counter() - start
+        dense_weights = weights.toarray().astype(np.float32)
+        start = time.perf_counter()
+        dense = dense_weights.T @ flags.astype(np.float32)
+        dense_seconds = time.perf_counter() - start
+        print(f"\ncoverage of {counties} x {args.days} flags: sparse {sparse_seconds:.2f} s, dense {dense_seconds:.2f} s, "
+              f"max difference {np.abs(sparse - dense).max():.2e}")
+        print(f"weights memory: sparse {(weights.indptr.nbytes + weights.indices.nbytes + weights.data.nbytes) / 1024:.0f} KB, "
+              f"dense {weights.toarray().nbytes / 1024:.0f} KB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
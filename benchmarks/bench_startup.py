@@ -0,0 +1,86 @@
+"""
+Benchmark cold-start import time and per-module import cost.
+
+Each stage is timed in a fresh interpreter (best of --repeat runs):
+- landing: modules app.py imports before the landing page renders
+- app: plus the modules imported once the user is authenticated
+- agent: plus the LangChain agent stack built for the first agent question
+- eager: everything imported up front, as app.py did before lazy loading
+
+A `python -X importtime` run of the eager set then reports the most
+expensive top-level packages (self time summed over submodules) and the
+cumulative import time of the app's own modules.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeat 3] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+LANDING_MODULES = ['streamlit', 'config.config', 'ui.styles', 'ui.components', 'ui.auth', 'utils.warmup']
+APP_MODULES = LANDING_MODULES + [
+    'models.llm_service', 'utils.response_formatter', 'models.query_memory', 'utils.refinement',
+    'utils.visualization', 'utils.cache_backend', 'utils.session_memory',
+]
+AGENT_MODULES = APP_MODULES + ['langchain_openai', 'langchain_community.agent_toolkits', 'models.tools']
+EAGER_MODULES = AGENT_MODULES + ['plotly.express', 'shapely.geometry', 'langchain_community.utilities']
+
+STAGES = (('landing', LANDING_MODULES), ('app', APP_MODULES), ('agent', AGENT_MODULES), ('eager', EAGER_MODULES))
+
+PROJECT_PACKAGES = ('config', 'models', 'ui', 'utils')
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_seconds(modules) -> float:
+    code = ("import time; t = time.perf_counter()\n"
+            + ''.join(f"import {m}\n" for m in modules)
+            + "print(time.perf_counter() - t)")
+    out = subprocess.run([sys.executable, '-c', code], cwd=_ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _importtime(modules):
+    """Parse `-X importtime` output into (module, self_us, cumulative_us) rows."""
+    code = ''.join(f"import {m}\n" for m in modules)
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=_ROOT,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    print(f"{'stage':<8} {'modules':>7} {'import ms':>10}")
+    for stage, modules in STAGES:
+        best = min(_import_seconds(modules) for _ in range(args.repeat))
+        print(f"{stage:<8} {len(modules):>7} {best * 1000:>10.0f}")
+
+    rows = _importtime(EAGER_MODULES)
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split('.')[0]] += self_us
+    print(f"\nTop {args.top} packages by import self time (eager set)")
+    for package, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {package:<28} {us / 1000:>8.0f} ms")
+
+    print("\nProject modules (cumulative import time, first import in the eager set)")
+    for name, _, cumulative_us in rows:
+        if '.' in name and name.split('.')[0] in PROJECT_PACKAGES:
+            print(f"  {name:<28} {cumulative_us / 1000:>8.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark a Definition 6 parameter sweep against separate catalog builds.
+
+Synthetic county temperatures (see bench_detection) are swept over a grid of
+T1 percentiles, T2 percentiles and minimum run lengths with
+catalog.sweep.sweep_events, and the same grid is built one catalog at a time
+with catalog.detection.detect_events. The per-region summaries of both are
+checked to be identical.
+
+Usage:
+    python -m benchmarks.bench_sweep [--locations 3100] [--years 70] [--t1 95 97.5 99] [--min-runs 2 3 5]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_detection import synthetic_temperatures
+from catalog.detection import T2_PERCENTILE, detect_events, region_weight_matrix
+from catalog.sweep import parameter_grid, summarize_catalog, sweep_events
+from config.config import STRING_ID_TO_SUBNAME
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--locations', type=int, default=3100)
+    parser.add_argument('--years', type=int, default=70)
+    parser.add_argument('--t1', type=float, nargs='+', default=[95.0, 97.5, 99.0])
+    parser.add_argument('--t2', type=float, nargs='+', default=[T2_PERCENTILE])
+    parser.add_argument('--min-runs', type=int, nargs='+', default=[2, 3, 5])
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    dates = pd.date_range('1950-01-01', periods=int(args.years * 365.25), freq='D')
+    tmax, tmin = synthetic_temperatures(args.locations, len(dates), args.seed)
+    region_ids = list(STRING_ID_TO_SUBNAME)
+    labels = np.random.default_rng(args.seed).choice(region_ids, args.locations)
+    weights, region_ids = region_weight_matrix(labels, region_ids)
+    grid = parameter_grid(args.t1, args.t2, args.min_runs)
+    print(f"{args.locations} locations x {len(dates)} days, {len(grid)} parameter sets")
+
+    sweeps = {}
+    print(f"\n{'type':<5} {'sweep s':>8} {'separate s':>10} {'speedup':>7} {'identical':>9}")
+    for event_type, temps in (('heat', tmax), ('cold', tmin)):
+        start = time.perf_counter()
+        sweep = sweep_events(temps, dates, weights, region_ids, event_type, args.t1, args.t2, args.min_runs)
+        sweep_seconds = time.perf_counter() - start
+        sweeps[event_type] = sweep
+
+        start = time.perf_counter()
+        separate = []
+        for t1, t2, min_run in grid:
+            catalog = detect_events(temps, dates, weights, region_ids, event_type, min_run=min_run,
+                                    t1_percentile=t1, t2_percentile=t2)
+            separate.append(summarize_catalog(catalog, event_type, region_ids))
+        separate_seconds = time.perf_counter() - start
+
+        identical = sweep.drop(columns=['t1_percentile', 't2_percentile', 'min_run']).equals(
+            pd.concat(separate, ignore_index=True))
+        print(f"{event_type:<5} {sweep_seconds:>8.2f} {separate_seconds:>10.2f} "
+              f"{separate_seconds / sweep_seconds:>6.1f}x {str(identical):>9}")
+
+    print("\nHeat wave events per parameter set (all regions):")
+    print(sweeps['heat'].groupby(['t1_percentile', 't2_percentile', 'min_run'])['events'].sum().unstack('min_run'))
+
+
+if __name__ == '__main__':
+    main()
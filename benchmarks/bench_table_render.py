@@ -0,0 +1,59 @@
+"""
+Benchmark results-table build time and payload size: HTML path vs Arrow grid.
+
+HTML path: format_json_response_as_table builds an HTML string that is sent
+to the browser through components.html. Grid path: build_events_frame builds
+a typed DataFrame that Streamlit serializes to Arrow IPC for st.dataframe.
+
+Usage:
+    python -m benchmarks.bench_table_render [--sizes 50 600 5000] [--repeat 5]
+"""
+import argparse
+import json
+import random
+import time
+
+import pyarrow as pa
+
+from benchmarks.bench_json_parsing import random_events
+from utils.response_formatter import build_events_frame, format_json_response_as_table
+
+
+def _arrow_bytes(frame) -> int:
+    """Size of the Arrow IPC stream Streamlit would ship for a DataFrame."""
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def _best_of(repeat, fn):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 600, 5000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} | {'html ms':>8} {'html KB':>8} | {'grid ms':>8} {'arrow ms':>9} {'arrow KB':>9}")
+    for n in args.sizes:
+        events = random_events(random.Random(n), n)
+        response = f"```json\n{json.dumps({'data': events}, indent=2)}\n```\n\n### Technical Insights:\n1. x"
+        html_ms, html = _best_of(args.repeat, lambda: format_json_response_as_table(response))
+        grid_ms, frame = _best_of(args.repeat, lambda: build_events_frame(response))
+        arrow_ms, arrow_size = _best_of(args.repeat, lambda: _arrow_bytes(frame))
+        print(f"{n:>6} | {html_ms:>8.2f} {len(html.encode()) / 1024:>8.1f} | {grid_ms:>8.2f} "
+              f"{arrow_ms:>9.2f} {arrow_size / 1024:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Concurrent-user load test against a local Azure OpenAI stand-in and database.
+
+Each simulated planner is a Streamlit AppTest session running app.py itself
+(authentication, follow-up refinement, caches, agent, table and map
+rendering), so requests take the same code paths as in production. Each
+session runs in its own worker process; sessions share the stand-in, the
+database and the SQLite cache backend, as app replicas would. Sessions
+ask questions from a weighted mix of event lookups, follow-ups and off-topic
+questions. Chat completions go to benchmarks.azure_openai_standin with
+configurable latency and token rate. Events come from a synthetic SQLite
+copy of the event metadata tables, and maps use stand-in region boundaries.
+
+For each concurrency level the script reports throughput, p50/p95/p99
+question latency (full script rerun, as a user would wait) and error rate.
+
+Usage:
+    python -m benchmarks.load_test [--levels 1 2 4 8] [--questions 6] [--latency-ms 400]
+        [--tokens-per-second 80] [--error-rate 0] [--cold]
+"""
+import argparse
+import json
+import os
+import multiprocessing
+import queue
+import random
+import sqlite3
+import tempfile
+import socket
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds every session of a level has to start (imports and the first app run)
+SESSION_START_TIMEOUT = 300
+
+REGIONS = ['PJM', 'ERCOT', 'MRO US', 'SPP', 'NEW YORK', 'FRCC', 'NEW ENGLAND', 'CA-MX US', 'SOUTHEASTERN', 'NWPP']
+REGION_IDS = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '15', '17', '18', '20']
+
+# (weight, template) pairs; follow-ups refine the session's previous answer
+QUESTION_MIX = [
+    (0.30, "What are the {n} worst heat waves in {region}?"),
+    (0.15, "What are the {n} worst cold snaps in {region} after {year}?"),
+    (0.10, "What are all historical heatwaves in {region}?"),
+    (0.10, "What's the spatial extent of {n} worst heatwave in {region}?"),
+    (0.20, "only after {year}"),
+    (0.05, "sort by spatial coverage"),
+    (0.10, "How is peak load forecast in {region}?"),
+]
+
+
+def build_local_database(path: str, events_per_region_year: float = 0.6, seed: int = 7):
+    """
+    Create a synthetic SQLite copy of heat_wave_metadata and cold_wave_metadata.
+
+    Args:
+        path (str): SQLite file to create
+        events_per_region_year (float): Mean events per region and year and type
+        seed (int): Random seed
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    for table, month, base, spread in (('heat_wave_metadata', 7, 99.0, 8.0), ('cold_wave_metadata', 1, 5.0, 12.0)):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} (start_date TEXT, end_date TEXT, temperature REAL, duration INTEGER, "
+                     f"NERC_ID TEXT, spatial_coverage REAL, event_ID INTEGER)")
+        rows = []
+        for region in REGION_IDS:
+            for year in range(1950, 2024):
+                for _ in range(np.random.default_rng(rng.randint(0, 2**31)).poisson(events_per_region_year)):
+                    start = date(year, month, 1) + timedelta(days=rng.randint(0, 55))
+                    duration = rng.randint(3, 12)
+                    rows.append((start.isoformat(), (start + timedelta(days=duration - 1)).isoformat(),
+                                 round(base + rng.gauss(0, spread / 3), 1), duration, region,
+                                 round(rng.uniform(1, 100), 1), len(rows) + 1))
+        conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute(f"CREATE INDEX idx_{table}_region ON {table} (NERC_ID, start_date)")
+    conn.commit()
+    conn.close()
+
+
+def build_region_geojson(path: str):
+    """Write rectangular stand-in boundaries for the NERC subregions on a 4x4 grid over CONUS."""
+    features = []
+    for i, region in enumerate(REGION_IDS):
+        west, south = -125 + (i % 4) * 14.5, 25 + (i // 4) * 6
+        ring = [[west, south], [west + 14.5, south], [west + 14.5, south + 6], [west, south + 6], [west, south]]
+        features.append({'type': 'Feature', 'properties': {'ID': region},
+                         'geometry': {'type': 'Polygon', 'coordinates': [ring]}})
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+
+def sample_question(rng: random.Random) -> str:
+    weights = [w for w, _ in QUESTION_MIX]
+    template = rng.choices([t for _, t in QUESTION_MIX], weights=weights)[0]
+    return template.format(n=rng.choice([3, 5, 10]), region=rng.choice(REGIONS), year=rng.choice([1990, 2000, 2010]))
+
+
+def _new_session():
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(_ROOT, 'app.py'), default_timeout=300)
+    at.session_state['authenticated'] = True
+    at.session_state['show_examples_popup'] = False
+    at.run()
+    return at
+
+
+def _ask(at, question: str):
+    """Ask one question in a session; returns (seconds, error message or None)."""
+    at.text_input(key='input').input(question)
+    at.button[0].click()
+    start = time.perf_counter()
+    try:
+        at.run()
+    except Exception as e:
+        return time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        return elapsed, at.exception[0].value
+    errors = [e.value for e in at.error]
+    history = at.session_state['history'] if 'history' in at.session_state else []
+    if errors or (history and history[-1]['response'].startswith("I'm sorry, I encountered an error")):
+        return elapsed, (errors or ['error response'])[0]
+    return elapsed, None
+
+
+def _session_worker(index: int, questions: int, seed: int, ready, go, results):
+    # Agent executors print their chain; keep the report readable
+    sys.stdout = open(os.devnull, 'w')
+    at = _new_session()
+    rng = random.Random(seed * 1000 + index)
+    ready.put(index)
+    go.wait()
+    latencies, errors = [], []
+    for _ in range(questions):
+        elapsed, error = _ask(at, sample_question(rng))
+        latencies.append(elapsed)
+        if error:
+            errors.append(str(error))
+    results.put((latencies, errors, time.time()))
+
+
+def _collect(channel, workers, deadline=None):
+    """Next item a worker puts on a queue; fails as soon as a worker dies or the deadline passes."""
+    while True:
+        try:
+            return channel.get(timeout=1)
+        except queue.Empty:
+            # A worker that died never reports
+            if any(w.exitcode not in (None, 0) for w in workers):
+                raise RuntimeError(f"a session worker failed (exit codes {[w.exitcode for w in workers]})")
+            if deadline is not None and time.time() > deadline:
+                raise RuntimeError(f"sessions did not start within {SESSION_START_TIMEOUT:.0f} s")
+
+
+def run_level(concurrency: int, questions_per_session: int, seed: int):
+    """
+    Run `concurrency` sessions in parallel, one worker process each.
+
+    Streamlit's AppTest swaps a process-wide runtime on every run, so sessions
+    cannot share one interpreter here. Workers share the stand-in, the
+    database and the SQLite cache backend, as app replicas would.
+
+    Returns:
+        tuple: (latencies in seconds, error messages, wall seconds)
+
+    Raises:
+        RuntimeError: If a session does not start in time or a worker dies; the level's
+            workers are stopped
+    """
+    ctx = multiprocessing.get_context('spawn')
+    ready, go, results = ctx.Queue(), ctx.Event(), ctx.Queue()
+    workers = [ctx.Process(target=_session_worker, args=(i, questions_per_session, seed, ready, go, results))
+               for i in range(concurrency)]
+    for w in workers:
+        w.start()
+    try:
+        # Every session starts its questions at once, after all have started up
+        deadline = time.time() + SESSION_START_TIMEOUT
+        for _ in workers:
+            _collect(ready, workers, deadline)
+        go.set()
+        start = time.time()
+        latencies, errors, end = [], [], start
+        for _ in workers:
+            worker_latencies, worker_errors, finished = _collect(results, workers)
+            latencies += worker_latencies
+            errors += worker_errors
+            end = max(end, finished)
+    except BaseException:
+        for w in workers:
+            w.terminate()
+        raise
+    finally:
+        for w in workers:
+            w.join()
+    return latencies, errors, end - start
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--questions', type=int, default=6, help='questions per session per level')
+    parser.add_argument('--latency-ms', type=float, default=400)
+    parser.add_argument('--tokens-per-second', type=float, default=80)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--cold', action='store_true', help='disable query plan memory and clear shared caches per level')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='gridcopilot-load-')
+    db_path = os.path.join(workdir, 'events.sqlite')
+    geojson_path = os.path.join(workdir, 'regions.json')
+    build_local_database(db_path)
+    build_region_geojson(geojson_path)
+    port = _free_port()
+    # Configuration is read at import time, so point the app at the local services first
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{db_path}",
+        'OPENAI_API_BASE': f"http://127.0.0.1:{port}",
+        'OPENAI_API_KEY': 'load-test',
+        'NERC_GEOJSON_PATH': geojson_path,
+        'GRIDCOPILOT_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'CACHE_BACKEND': 'sqlite',
+        'QUERY_MEMORY_ENABLED': 'false' if args.cold else os.environ.get('QUERY_MEMORY_ENABLED', 'true'),
+        'METRICS_PORT': '0',
+        'BACKGROUND_WARMUP_ENABLED': 'false',
+    })
+    from benchmarks.azure_openai_standin import StandinConfig, serve_in_background
+    from utils.cache_backend import invalidate_namespace
+    serve_in_background(StandinConfig(args.latency_ms, args.tokens_per_second,
+                                      error_rate=args.error_rate, seed=args.seed), port=port)
+
+    print(f"database: {db_path}")
+    print(f"stand-in: {os.environ['OPENAI_API_BASE']} (latency {args.latency_ms:.0f} ms, "
+          f"{args.tokens_per_second:.0f} tok/s, error rate {args.error_rate:.0%})\n")
+    print(f"{'sessions':>8} {'questions':>9} {'q/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for level in args.levels:
+        if args.cold:
+            for namespace in ('answer', 'events', 'sql', 'figure'):
+                invalidate_namespace(namespace)
+        try:
+            latencies, errors, wall = run_level(level, args.questions, args.seed + level)
+        except RuntimeError as e:
+            print(f"{level:>8} aborted: {e}")
+            continue
+        ms = np.array(latencies) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0, 0, 0)
+        print(f"{level:>8} {len(latencies):>9} {len(latencies) / wall:>7.2f} {p50:>8.0f} {p95:>8.0f} "
+              f"{p99:>8.0f} {len(errors) / max(len(latencies), 1):>7.1%}")
+        for error in sorted(set(errors))[:3]:
+            print(f"{'':>8} error: {str(error)[:120]}")
+
+
+if __name__ == '__main__':
+    main()
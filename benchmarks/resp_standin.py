@@ -0,0 +1,98 @@
+"""
+Local stand-in for a Redis-protocol cache server.
+
+Implements the RESP2 subset used by utils.cache_backend.RedisBackend (PING,
+GET, SET with EX/PX, DEL, AUTH, SELECT) in one process, so several
+`streamlit run app.py` replicas and the load-test harness can share a cache
+without installing Redis. Data lives in memory only.
+
+Usage:
+    python -m benchmarks.resp_standin [--host 127.0.0.1] [--port 6379]
+    CACHE_BACKEND=redis CACHE_URL=redis://127.0.0.1:6379/0 streamlit run app.py
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+_DATA = {}
+_LOCK = threading.Lock()
+
+
+def _bulk(value):
+    return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def _read_command(reader):
+    line = reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        return line.split()
+    parts = []
+    for _ in range(int(line[1:-2])):
+        length = int(reader.readline()[1:-2])
+        parts.append(reader.read(length + 2)[:-2])
+    return parts
+
+
+def _execute(parts):
+    name = parts[0].upper()
+    if name == b'PING':
+        return b'+PONG\r\n'
+    if name in (b'AUTH', b'SELECT'):
+        return b'+OK\r\n'
+    with _LOCK:
+        if name == b'GET':
+            item = _DATA.get(parts[1])
+            if item is not None and item[1] is not None and item[1] < time.time():
+                del _DATA[parts[1]]
+                item = None
+            return _bulk(item[0] if item else None)
+        if name == b'SET':
+            expires_at = None
+            options = [p.upper() for p in parts[3:]]
+            if b'EX' in options:
+                expires_at = time.time() + int(parts[3 + options.index(b'EX') + 1])
+            elif b'PX' in options:
+                expires_at = time.time() + int(parts[3 + options.index(b'PX') + 1]) / 1000
+            _DATA[parts[1]] = (parts[2], expires_at)
+            return b'+OK\r\n'
+        if name == b'DEL':
+            return b':%d\r\n' % sum(_DATA.pop(k, None) is not None for k in parts[1:])
+    return b'-ERR unknown command\r\n'
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            parts = _read_command(self.rfile)
+            if not parts:
+                return
+            self.wfile.write(_execute(parts))
+
+
+class StandinServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_in_background(host: str = '127.0.0.1', port: int = 0) -> StandinServer:
+    """Start a stand-in server on a daemon thread; port 0 picks a free port."""
+    server = StandinServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+    with StandinServer((args.host, args.port), _Handler) as server:
+        print(f"Redis-protocol stand-in listening on {args.host}:{args.port}")
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
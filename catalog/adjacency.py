@@ -0,0 +1,121 @@
+"""
+NERC subregion adjacency graph.
+
+Two subregions are neighbours when their boundaries run together for at
+least MIN_SHARED_BOUNDARY_KM. Boundary digitizations rarely coincide
+exactly, so a boundary counts as shared where it lies within
+GAP_TOLERANCE_KM of the other region; regions that only meet at a corner do
+not qualify. Each edge records the shared boundary length and the
+great-circle distance between the region centroids. The graph is computed
+once with STRtree candidate pairs and vectorized shapely operations. Lengths
+are measured per pair in an equirectangular projection scaled by the cosine
+of the latitude where the two regions meet, which keeps boundary lengths
+within about 1% over a region pair (the equal-area projection used for
+area weights stretches them by up to 50% at US longitudes). The graph is
+cached as JSON next to the other derived geometry and rebuilt when the NERC
+GeoJSON changes.
+"""
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import shapely
+
+from catalog.spatial import load_regions
+from utils.sources import sources_signature
+from config.config import NERC_GEOJSON_PATH, REGION_ADJACENCY_PATH
+
+# Kilometres per unit of the equirectangular projection (one degree of latitude)
+KM_PER_UNIT = 111.195
+GAP_TOLERANCE_KM = 5.0
+MIN_SHARED_BOUNDARY_KM = 25.0
+# Stored with the cached graph; bumped when edges are measured differently
+GRAPH_VERSION = 2
+
+
+def _haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(a))
+
+
+def _equirectangular(geometries: np.ndarray, latitudes: np.ndarray) -> np.ndarray:
+    """Project lon/lat geometries to degrees of latitude, scaling longitude by the cosine of each one's latitude."""
+    _, index = shapely.get_coordinates(geometries, return_index=True)
+    scale = np.cos(np.radians(latitudes))[index]
+    return shapely.transform(geometries, lambda coords: np.column_stack([coords[:, 0] * scale, coords[:, 1]]))
+
+
+def compute_adjacency(region_ids: List[str], regions: np.ndarray) -> List[Dict]:
+    """
+    Neighbouring region pairs of a set of region geometries.
+
+    Args:
+        region_ids (list): Region IDs
+        regions (np.ndarray): Region polygons (lon/lat)
+
+    Returns:
+        list: Edges {'a', 'b', 'shared_boundary_km', 'centroid_distance_km'} with a before b in region order
+    """
+    tolerance = GAP_TOLERANCE_KM / KM_PER_UNIT
+    # Candidate pairs in lon/lat, with the tolerance widened for longitude degrees up to 60° N
+    candidates = shapely.buffer(regions, 2 * tolerance)
+    left, right = shapely.STRtree(candidates).query(candidates, predicate='intersects')
+    pairs = left < right
+    left, right = left[pairs], right[pairs]
+    # Each pair is projected around the middle latitude of the overlap of its bounding boxes
+    bounds = shapely.bounds(regions)
+    latitude = (np.maximum(bounds[left, 1], bounds[right, 1]) + np.minimum(bounds[left, 3], bounds[right, 3])) / 2
+    projected_left, projected_right = _equirectangular(regions[left], latitude), _equirectangular(regions[right], latitude)
+    # Boundary of each region lying within the tolerance of the other, averaged over both sides
+    shared = (shapely.length(shapely.intersection(shapely.boundary(projected_left),
+                                                  shapely.buffer(projected_right, tolerance))) +
+              shapely.length(shapely.intersection(shapely.boundary(projected_right),
+                                                  shapely.buffer(projected_left, tolerance)))) / 2
+    shared_km = shared * KM_PER_UNIT
+    centroids = shapely.centroid(regions)
+    lon, lat = shapely.get_x(centroids), shapely.get_y(centroids)
+    distance_km = _haversine_km(lat[left], lon[left], lat[right], lon[right])
+    return [{'a': region_ids[i], 'b': region_ids[j], 'shared_boundary_km': round(float(s), 1),
+             'centroid_distance_km': round(float(d), 1)}
+            for i, j, s, d in zip(left, right, shared_km, distance_km) if s >= MIN_SHARED_BOUNDARY_KM]
+
+
+def region_adjacency(regions_path: str = NERC_GEOJSON_PATH,
+                     cache_path: Optional[str] = REGION_ADJACENCY_PATH) -> Dict[str, List[Dict]]:
+    """
+    Neighbours of each NERC subregion, from the cache file when it was built from the same GeoJSON
+    with the same GRAPH_VERSION.
+
+    Args:
+        regions_path (str): NERC subregion GeoJSON with an "ID" property
+        cache_path (str): JSON file the graph is stored in (not cached when None)
+
+    Returns:
+        dict: Region ID -> [{'id', 'shared_boundary_km', 'centroid_distance_km'}], longest
+            shared boundary first
+    """
+    sources = sources_signature(regions_path)
+    edges = None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get('sources') == sources and cached.get('version') == GRAPH_VERSION:
+            edges = cached['edges']
+    if edges is None:
+        edges = compute_adjacency(*load_regions(regions_path))
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            with open(f"{cache_path}.tmp", 'w') as f:
+                json.dump({'version': GRAPH_VERSION, 'sources': sources, 'edges': edges}, f, indent=1)
+            os.replace(f"{cache_path}.tmp", cache_path)
+
+    graph: Dict[str, List[Dict]] = {}
+    for edge in edges:
+        for here, there in ((edge['a'], edge['b']), (edge['b'], edge['a'])):
+            graph.setdefault(here, []).append({'id': there, 'shared_boundary_km': edge['shared_boundary_km'],
+                                               'centroid_distance_km': edge['centroid_distance_km']})
+    for neighbours in graph.values():
+        neighbours.sort(key=lambda n: (-n['shared_boundary_km'], n['centroid_distance_km']))
+    return graph
@@ -0,0 +1,100 @@
+"""
+Parallel catalog build over a memory-mapped temperature cube.
+
+Locations are split into contiguous partitions. Each worker process maps its
+partition of the cube read-only (no data is pickled or copied between
+processes), computes thresholds and location events, and reduces them to
+per-region daily coverage sums. The parent merges the partitions' events and
+adds up their coverage before segmenting region events, so memory stays
+bounded by a partition's working set and a (regions, days) accumulator
+while the build scales with the number of cores.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalog.cube import open_cube
+from catalog.detection import (BLOCK_LOCATIONS, LOCATION_EVENT_COLUMNS, MIN_RUN_DAYS, T1_PERCENTILE, T2_PERCENTILE,
+                               detect_location_events, detection_thresholds, region_daily_coverage, region_events)
+
+PARTITION_LOCATIONS = 512
+
+
+def _detect_partition(cube_path, variable, event_type, lo, hi, weights, thresholds, min_run,
+                      t1_percentile, t2_percentile, block):
+    """Worker: events, thresholds and regional coverage sums of locations lo..hi-1."""
+    temps = open_cube(cube_path).variable(variable)[lo:hi]
+    if thresholds is None:
+        thresholds = detection_thresholds(temps, event_type, t1_percentile, t2_percentile, block=block)
+    events = detect_location_events(temps, event_type, thresholds, min_run, block=block)
+    coverage, weighted = region_daily_coverage(temps, events, weights, block)
+    events['location'] += lo
+    return events, thresholds, coverage, weighted
+
+
+def detect_cube_events(cube_path: str, variable: str, event_type: str, weights, region_ids: Sequence[str],
+                       workers: Optional[int] = None, partition: int = PARTITION_LOCATIONS,
+                       thresholds: Optional[Tuple[np.ndarray, np.ndarray]] = None, min_run: int = MIN_RUN_DAYS,
+                       t1_percentile: float = T1_PERCENTILE, t2_percentile: float = T2_PERCENTILE,
+                       min_coverage: float = 0.0, block: int = BLOCK_LOCATIONS):
+    """
+    Detect Definition 6 events for every location of a cube and build the region catalog.
+
+    Args:
+        cube_path (str): Cube directory
+        variable (str): 'tmax' for heat waves, 'tmin' for cold snaps
+        event_type (str): 'heat' or 'cold'
+        weights: (locations, regions) weights from region_weight_matrix or county_region_weights
+        region_ids (list): Region ID of each weights column
+        workers (int): Worker processes (CPU count by default; 1 runs in-process)
+        partition (int): Locations per worker task
+        thresholds (tuple): Per-location (T1, T2) to use instead of computing them (frozen climatology)
+        min_run (int): Minimum consecutive days beyond T1
+        t1_percentile (float): Heat-side T1 percentile when thresholds are computed
+        t2_percentile (float): Heat-side T2 percentile when thresholds are computed
+        min_coverage (float): Minimum share of a region for a day to count as a region event day
+        block (int): Locations per detection block within a worker
+
+    Returns:
+        tuple: (catalog, location_events, thresholds)
+    """
+    cube = open_cube(cube_path)
+    n = len(cube.locations)
+    bounds = [(lo, min(lo + partition, n)) for lo in range(0, n, partition)]
+    tasks = [(cube_path, variable, event_type, lo, hi, weights[lo:hi],
+              None if thresholds is None else (thresholds[0][lo:hi], thresholds[1][lo:hi]),
+              min_run, t1_percentile, t2_percentile, block) for lo, hi in bounds]
+    workers = min(workers or os.cpu_count() or 1, len(tasks)) or 1
+
+    coverage = weighted = None
+    events, t1, t2 = [], [], []
+
+    def merge(result):
+        nonlocal coverage, weighted
+        part_events, part_thresholds, part_coverage, part_weighted = result
+        events.append(part_events)
+        t1.append(part_thresholds[0])
+        t2.append(part_thresholds[1])
+        coverage = part_coverage if coverage is None else coverage + part_coverage
+        weighted = part_weighted if weighted is None else weighted + part_weighted
+
+    if workers == 1:
+        for task in tasks:
+            merge(_detect_partition(*task))
+    else:
+        # Spawned workers map the cube themselves; only partition bounds and weights are sent
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            for result in pool.map(_detect_partition, *zip(*tasks)):
+                merge(result)
+
+    location_events = (pd.concat(events, ignore_index=True) if events
+                       else pd.DataFrame(columns=LOCATION_EVENT_COLUMNS))
+    if coverage is None:
+        coverage = weighted = np.zeros((len(region_ids), cube.days))
+    catalog = region_events(coverage, weighted, cube.dates, region_ids, min_coverage)
+    thresholds = (np.concatenate(t1), np.concatenate(t2)) if t1 else (np.empty(0), np.empty(0))
+    return catalog, location_events, thresholds
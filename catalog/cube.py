@@ -0,0 +1,168 @@
+"""
+Memory-mapped daily temperature cube.
+
+A cube is a directory with one raw little-endian float32 file per variable
+(tmax.f32, tmin.f32) laid out location-major as (locations, capacity days),
+plus cube.json holding the location IDs, the first date, the number of
+valid days and the day capacity. Each location's series is contiguous, so a
+range of locations is one contiguous slab: worker processes map it
+read-only without copying, and pages are shared through the OS page cache
+instead of living in each process's heap. Spare day capacity lets new
+seasons be appended in place.
+"""
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+META_FILE = 'cube.json'
+DTYPE = np.dtype('<f4')
+VARIABLES = ('tmax', 'tmin')
+# Spare days allocated beyond the initial record for later appends
+DEFAULT_HEADROOM_DAYS = 3660
+
+
+class TemperatureCube:
+    """A (location, day) float32 cube on disk."""
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+
+    @property
+    def locations(self) -> List[str]:
+        return self.meta['locations']
+
+    @property
+    def variables(self) -> List[str]:
+        return self.meta['variables']
+
+    @property
+    def days(self) -> int:
+        return self.meta['days']
+
+    @property
+    def capacity(self) -> int:
+        return self.meta['capacity']
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.date_range(self.meta['start_date'], periods=self.days, freq='D')
+
+    def variable_path(self, name: str) -> str:
+        if name not in self.variables:
+            raise KeyError(f"Cube has no variable '{name}' (has {', '.join(self.variables)})")
+        return os.path.join(self.path, f"{name}.f32")
+
+    def variable(self, name: str, mode: str = 'r') -> np.ndarray:
+        """
+        Map a variable as a (locations, days) array without reading it.
+
+        Args:
+            name (str): Variable name, e.g. 'tmax'
+            mode (str): 'r' for read-only, 'r+' to write in place
+
+        Returns:
+            np.ndarray: View of the valid days of the memory map
+        """
+        data = np.memmap(self.variable_path(name), dtype=DTYPE, mode=mode,
+                         shape=(len(self.locations), self.capacity))
+        return data[:, :self.days]
+
+    def save_meta(self):
+        tmp = os.path.join(self.path, f"{META_FILE}.tmp")
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+
+def create_cube(path: str, locations: Sequence[str], start_date, days: int, variables: Sequence[str] = VARIABLES,
+                capacity_days: Optional[int] = None) -> TemperatureCube:
+    """
+    Create an empty cube; fill it in place with cube.variable(name, 'r+')[lo:hi] = block.
+
+    Args:
+        path (str): Cube directory (created if missing)
+        locations (list): Location IDs, e.g. county FIPS codes
+        start_date: Date of the first day
+        days (int): Number of days
+        variables (list): Variable names
+        capacity_days (int): Days allocated per location (days plus headroom by default)
+
+    Returns:
+        TemperatureCube: The new cube
+    """
+    capacity = capacity_days or days + DEFAULT_HEADROOM_DAYS
+    if capacity < days:
+        raise ValueError("capacity_days must be at least days")
+    os.makedirs(path, exist_ok=True)
+    meta = {'locations': [str(loc) for loc in locations], 'variables': list(variables),
+            'start_date': pd.Timestamp(start_date).strftime('%Y-%m-%d'), 'days': int(days), 'capacity': int(capacity)}
+    cube = TemperatureCube(path, meta)
+    for name in variables:
+        # Sized sparsely; untouched capacity takes no disk space on most filesystems
+        with open(os.path.join(path, f"{name}.f32"), 'wb') as f:
+            f.truncate(len(cube.locations) * capacity * DTYPE.itemsize)
+    cube.save_meta()
+    return cube
+
+
+def open_cube(path: str) -> TemperatureCube:
+    """Open an existing cube directory."""
+    with open(os.path.join(path, META_FILE)) as f:
+        return TemperatureCube(path, json.load(f))
+
+
+def _grow(cube: TemperatureCube, capacity: int, block: int = 256):
+    """Rewrite every variable with a larger day capacity, copying blocks of locations."""
+    n = len(cube.locations)
+    for name in cube.variables:
+        path = cube.variable_path(name)
+        tmp = f"{path}.grow"
+        with open(tmp, 'wb') as f:
+            f.truncate(n * capacity * DTYPE.itemsize)
+        src = cube.variable(name)
+        dst = np.memmap(tmp, dtype=DTYPE, mode='r+', shape=(n, capacity))
+        for lo in range(0, n, block):
+            dst[lo:lo + block, :cube.days] = src[lo:lo + block]
+        dst.flush()
+        del src, dst
+        os.replace(tmp, path)
+    cube.meta['capacity'] = int(capacity)
+    cube.save_meta()
+
+
+def append_days(cube: TemperatureCube, arrays: Dict[str, np.ndarray], start_date=None) -> TemperatureCube:
+    """
+    Append new days (e.g. a new season) to every variable of a cube in place.
+
+    Args:
+        cube (TemperatureCube): Cube to extend
+        arrays (dict): Variable name -> (locations, new days) array, for every cube variable
+        start_date: Date of the first new day; must directly follow the last day of the cube
+
+    Returns:
+        TemperatureCube: The extended cube (days updated)
+    """
+    if set(arrays) != set(cube.variables):
+        raise ValueError(f"Expected arrays for {', '.join(cube.variables)}")
+    new_days = {np.shape(a)[1] for a in arrays.values()}
+    if len(new_days) != 1 or any(np.shape(a)[0] != len(cube.locations) for a in arrays.values()):
+        raise ValueError("Arrays must all have shape (locations, new days)")
+    new_days = new_days.pop()
+    expected = pd.Timestamp(cube.meta['start_date']) + pd.Timedelta(days=cube.days)
+    if start_date is not None and pd.Timestamp(start_date) != expected:
+        raise ValueError(f"New data must start on {expected.date()}, got {pd.Timestamp(start_date).date()}")
+    if cube.days + new_days > cube.capacity:
+        _grow(cube, max(cube.days + new_days, cube.capacity) + DEFAULT_HEADROOM_DAYS)
+    for name, values in arrays.items():
+        data = np.memmap(cube.variable_path(name), dtype=DTYPE, mode='r+',
+                         shape=(len(cube.locations), cube.capacity))
+        data[:, cube.days:cube.days + new_days] = values
+        data.flush()
+    # Days become visible only once their data is on disk
+    cube.meta['days'] = cube.days + new_days
+    cube.save_meta()
+    return cube
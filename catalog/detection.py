@@ -0,0 +1,367 @@
+"""
+Vectorized Definition 6 heat wave and cold snap detection.
+
+Definition 6 (see utils.response_formatter.METHODOLOGY_NOTE): per location,
+T1 and T2 are the 97.5th and 81st percentiles of daily maximum temperature.
+An event is a period in which every day is above T2, at least MIN_RUN_DAYS
+consecutive days are above T1 and the mean over the period is above T1.
+Cold snaps apply the same rule to daily minimum temperature below the
+mirrored thresholds (2.5th and 19th percentiles).
+
+Detection runs on a (location, day) array in blocks of locations. Each block
+is flattened with a separator day between locations and segmented with
+run-length encoding, prefix sums and ufunc.reduceat, so there are no per-day
+or per-event Python loops. Each T1 core (MIN_RUN_DAYS or more days above
+T1) is extended forward and then backward, day by day within its run above
+T2, while the event mean stays above T1; cores that end up inside an
+earlier event belong to it. A run above T2 can therefore hold several
+events.
+
+Location events are then aggregated to regions: a region event is a run of
+days on which part of the region is in a location event. Its spatial
+coverage is the peak share of the region's weight in the event and its
+temperature the mean, over event days, of the weighted temperature of the
+locations in the event. Records follow the heat_wave_metadata /
+cold_wave_metadata schema.
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from catalog.sparse import has_weight, transpose_matmul
+
+T1_PERCENTILE = 97.5
+T2_PERCENTILE = 81.0
+MIN_RUN_DAYS = 3
+# Locations per block; bounds working memory to a few arrays of BLOCK_LOCATIONS x days
+BLOCK_LOCATIONS = 256
+
+CATALOG_COLUMNS = ['start_date', 'end_date', 'temperature', 'duration', 'NERC_ID', 'spatial_coverage', 'event_ID']
+LOCATION_EVENT_COLUMNS = ['location', 'start_day', 'end_day', 'duration', 'temperature', 'peak']
+
+
+def _sign(event_type: str) -> float:
+    """+1 for heat waves, -1 for cold snaps (detection runs on sign * temperature)."""
+    if event_type not in ('heat', 'cold'):
+        raise ValueError(f"event_type must be 'heat' or 'cold', got '{event_type}'")
+    return 1.0 if event_type == 'heat' else -1.0
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (exclusive) indices of the True runs of a 1-D boolean array."""
+    edges = np.flatnonzero(np.diff(mask.view(np.int8), prepend=0, append=0))
+    return edges[0::2], edges[1::2]
+
+
+def _segment_max(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Maximum of values[start:end] for each disjoint, ordered segment."""
+    if not len(starts):
+        return np.empty(0, values.dtype)
+    return np.maximum.reduceat(values, np.column_stack([starts, ends]).ravel())[::2]
+
+
+def detection_thresholds(temps: np.ndarray, event_type: str = 'heat', t1_percentile: float = T1_PERCENTILE,
+                         t2_percentile: float = T2_PERCENTILE, baseline: Optional[slice] = None,
+                         block: int = BLOCK_LOCATIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute per-location Definition 6 thresholds.
+
+    Args:
+        temps (np.ndarray): (locations, days) daily maximum (heat) or minimum (cold) temperatures
+        event_type (str): 'heat' or 'cold'
+        t1_percentile (float): Heat-side T1 percentile; cold snaps use 100 - t1_percentile
+        t2_percentile (float): Heat-side T2 percentile; cold snaps use 100 - t2_percentile
+        baseline (slice): Days the climatology is computed from (all days by default)
+        block (int): Locations per block
+
+    Returns:
+        tuple: (T1, T2) float32 arrays of shape (locations,)
+    """
+    if t1_percentile < t2_percentile:
+        raise ValueError("t1_percentile must not be below t2_percentile")
+    sign = _sign(event_type)
+    q = [t1_percentile, t2_percentile] if sign > 0 else [100 - t1_percentile, 100 - t2_percentile]
+    days = baseline if baseline is not None else slice(None)
+    out = np.empty((2, temps.shape[0]), np.float32)
+    for lo in range(0, temps.shape[0], block):
+        x = np.asarray(temps[lo:lo + block, days])
+        percentile = np.nanpercentile if np.isnan(x).any() else np.percentile
+        out[:, lo:lo + block] = percentile(x, q, axis=1)
+    return out[0], out[1]
+
+
+def _block_layout(y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Flatten a block with a separator day after each location; returns (values, prefix sums, width)."""
+    n, days = y.shape
+    width = days + 1
+    # The separator day keeps runs from crossing locations
+    values = np.zeros((n, width), np.float64)
+    values[:, :days] = np.nan_to_num(y, nan=0.0)
+    values = values.ravel()
+    return values, np.concatenate(([0.0], np.cumsum(values))), width
+
+
+def _threshold_runs(y: np.ndarray, threshold: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Flat start and end (exclusive) indices of each location's runs of days above its threshold."""
+    n, days = y.shape
+    above = np.zeros((n, width), bool)
+    above[:, :days] = y > threshold[:, None]
+    return _runs(above.ravel())
+
+
+def _block_events(y: np.ndarray, t1: np.ndarray, t2: np.ndarray, min_run: int):
+    """
+    Definition 6 events of one block of oriented series (higher is more extreme).
+
+    Returns:
+        tuple: (row, start_day, end_day_exclusive, mean, peak) arrays in the oriented units
+    """
+    values, prefix, width = _block_layout(y)
+    row, start, end, mean, peak = _select_events(values, prefix, width, _threshold_runs(y, t2, width),
+                                                 _threshold_runs(y, t1, width), t1, min_run)
+    return row, start - row * width, end - row * width, mean, peak
+
+
+def _ranges(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Owner and position of every index of the ranges [lo, hi), range by range."""
+    lengths = np.maximum(hi - lo, 0)
+    owner = np.repeat(np.arange(len(lo)), lengths)
+    pos = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - lo, lengths)
+    return owner, pos
+
+
+def _select_events(values: np.ndarray, prefix: np.ndarray, width: int, t2_runs, t1_runs, t1: np.ndarray,
+                   min_run: int):
+    """
+    Definition 6 events from a block layout and its T2 and T1 runs.
+
+    Every T1 core (at least min_run days above T1) that is not inside an earlier event is
+    extended day by day, first forward and then backward, while the event mean stays above
+    T1, without leaving its T2 run or reaching into the previous event. A T2 run can hold
+    several events.
+
+    Returns:
+        tuple: (row, flat_start, flat_end_exclusive, mean, peak) arrays in the oriented units
+    """
+    starts, ends = t2_runs
+    s1, e1 = t1_runs
+    core = (e1 - s1) >= min_run
+    if not core.any():
+        empty = np.empty(0, np.int64)
+        return empty, empty, empty, np.empty(0), np.empty(0)
+    # Days above T1 are above T2, so every T1 run lies inside one T2 run
+    cs, ce = s1[core], e1[core]
+    parent = np.searchsorted(starts, cs, side='right') - 1
+    run_start, run_end = starts[parent], ends[parent]
+
+    # Excess over T1 summed from the start of each location's row: the mean of days [a, b)
+    # is above T1 exactly when excess[b] > excess[a]
+    layout = values.reshape(-1, width)
+    excess = np.zeros(layout.shape)
+    np.cumsum(layout[:, :-1] - np.asarray(t1, np.float64)[:, None], axis=1, out=excess[:, 1:])
+    excess = excess.ravel()
+
+    # Forward: the event ends before the first day that would bring the mean from the core start to T1
+    owner, pos = _ranges(ce + 1, run_end + 1)
+    stop = excess[pos] <= excess[cs][owner]
+    owner, pos = owner[stop], pos[stop]
+    first = np.diff(owner, prepend=-1) != 0
+    ev_e = run_end.copy()
+    ev_e[owner[first]] = pos[first] - 1
+
+    # A later core inside an earlier event of its run belongs to that event; events of earlier
+    # runs end before the run starts
+    previous_end = np.r_[-1, np.maximum.accumulate(ev_e)[:-1]]
+    keep = previous_end < cs
+    cs, ev_e = cs[keep], ev_e[keep]
+    lower = np.maximum(run_start[keep], previous_end[keep])
+
+    # Backward: the event starts after the last earlier day that would bring its mean to T1
+    owner, pos = _ranges(lower, cs)
+    stop = excess[pos] >= excess[ev_e][owner]
+    owner, pos = owner[stop], pos[stop]
+    last = np.diff(owner, append=len(cs)) != 0
+    ev_s = lower.copy()
+    ev_s[owner[last]] = pos[last] + 1
+
+    row = ev_s // width
+    mean = (prefix[ev_e] - prefix[ev_s]) / (ev_e - ev_s)
+    peak = _segment_max(values, ev_s, ev_e)
+    return row, ev_s, ev_e, mean, peak
+
+
+def detect_location_events(temps: np.ndarray, event_type: str = 'heat',
+                           thresholds: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                           min_run: int = MIN_RUN_DAYS, t1_percentile: float = T1_PERCENTILE,
+                           t2_percentile: float = T2_PERCENTILE, block: int = BLOCK_LOCATIONS) -> pd.DataFrame:
+    """
+    Detect Definition 6 events at every location.
+
+    Args:
+        temps (np.ndarray): (locations, days) daily maximum (heat) or minimum (cold) temperatures;
+            NaN days break runs
+        event_type (str): 'heat' or 'cold'
+        thresholds (tuple): Per-location (T1, T2); computed from temps when omitted
+        min_run (int): Minimum consecutive days beyond T1
+        t1_percentile (float): Heat-side T1 percentile when thresholds are computed
+        t2_percentile (float): Heat-side T2 percentile when thresholds are computed
+        block (int): Locations per block
+
+    Returns:
+        pd.DataFrame: LOCATION_EVENT_COLUMNS, one row per event, ordered by location and start;
+            end_day is inclusive, temperature is the event mean and peak the most extreme day
+    """
+    sign = _sign(event_type)
+    if thresholds is None:
+        thresholds = detection_thresholds(temps, event_type, t1_percentile, t2_percentile, block=block)
+    t1, t2 = (sign * np.asarray(t, np.float32) for t in thresholds)
+    parts = []
+    for lo in range(0, temps.shape[0], block):
+        y = sign * np.asarray(temps[lo:lo + block], np.float32)
+        row, start, end, mean, peak = _block_events(y, t1[lo:lo + block], t2[lo:lo + block], min_run)
+        parts.append((row + lo, start, end, mean, peak))
+    row, start, end, mean, peak = (np.concatenate(p) for p in zip(*parts)) if parts else ([],) * 5
+    return pd.DataFrame({
+        'location': np.asarray(row, np.int64),
+        'start_day': np.asarray(start, np.int64),
+        'end_day': np.asarray(end, np.int64) - 1,
+        'duration': np.asarray(end, np.int64) - np.asarray(start, np.int64),
+        'temperature': sign * np.asarray(mean, np.float64),
+        'peak': sign * np.asarray(peak, np.float64),
+    }, columns=LOCATION_EVENT_COLUMNS)
+
+
+def region_weight_matrix(location_regions: Sequence, region_ids: Optional[Sequence[str]] = None,
+                         location_weights: Optional[np.ndarray] = None) -> Tuple[np.ndarray, list]:
+    """
+    Build a (locations, regions) weight matrix whose columns each sum to 1.
+
+    Args:
+        location_regions (list): Region ID of each location (None/'' for none)
+        region_ids (list): Region order (sorted IDs present by default)
+        location_weights (np.ndarray): Weight of each location, e.g. area (equal by default)
+
+    Returns:
+        tuple: (weights, region_ids)
+    """
+    labels = np.array(['' if r is None else str(r) for r in location_regions])
+    if region_ids is None:
+        region_ids = sorted(set(labels) - {''}, key=lambda r: (len(r), r))
+    region_ids = [str(r) for r in region_ids]
+    column = {r: i for i, r in enumerate(region_ids)}
+    col = np.array([column.get(label, -1) for label in labels])
+    w = np.ones(len(labels)) if location_weights is None else np.asarray(location_weights, np.float64)
+    weights = np.zeros((len(labels), len(region_ids)))
+    rows = np.flatnonzero(col >= 0)
+    weights[rows, col[rows]] = w[rows]
+    totals = weights.sum(axis=0)
+    weights /= np.where(totals > 0, totals, 1.0)
+    return weights, region_ids
+
+
+def event_day_mask(location_events: pd.DataFrame, lo: int, hi: int, days: int) -> np.ndarray:
+    """(hi - lo, days) boolean mask of the days locations lo..hi-1 are in an event."""
+    rows = location_events['location'].to_numpy()
+    a, b = np.searchsorted(rows, [lo, hi])
+    delta = np.zeros((hi - lo, days + 1), np.int8)
+    loc = rows[a:b] - lo
+    np.add.at(delta, (loc, location_events['start_day'].to_numpy()[a:b]), 1)
+    np.add.at(delta, (loc, location_events['end_day'].to_numpy()[a:b] + 1), -1)
+    return np.cumsum(delta[:, :days], axis=1, dtype=np.int8) > 0
+
+
+def region_daily_coverage(temps: np.ndarray, location_events: pd.DataFrame, weights,
+                          block: int = BLOCK_LOCATIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Daily share of each region in an event and the weighted temperature of that share.
+
+    Args:
+        temps (np.ndarray): (locations, days) temperatures the events were detected on
+        location_events (pd.DataFrame): Output of detect_location_events
+        weights: (locations, regions) weights from region_weight_matrix, dense or SparseWeights
+
+    Returns:
+        tuple: (coverage, weighted_temperature), each (regions, days); coverage is in [0, 1]
+            and weighted_temperature / coverage is the mean temperature of the part in an event
+    """
+    n, days = temps.shape
+    coverage = np.zeros((weights.shape[1], days))
+    weighted = np.zeros((weights.shape[1], days))
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        w = weights[lo:hi]
+        if not has_weight(w):
+            continue
+        mask = event_day_mask(location_events, lo, hi, days)
+        coverage += transpose_matmul(w, mask.astype(np.float32))
+        weighted += transpose_matmul(w, np.where(mask, np.asarray(temps[lo:hi], np.float32), np.float32(0)))
+    return coverage, weighted
+
+
+def region_events(coverage: np.ndarray, weighted: np.ndarray, dates, region_ids: Sequence[str],
+                  min_coverage: float = 0.0) -> pd.DataFrame:
+    """
+    Segment daily regional coverage into catalog records.
+
+    Args:
+        coverage (np.ndarray): (regions, days) share of each region in an event
+        weighted (np.ndarray): (regions, days) weighted temperature of that share
+        dates: Dates of the days (anything pandas.DatetimeIndex accepts)
+        region_ids (list): Region ID of each row
+        min_coverage (float): Days at or below this share of a region are not event days
+
+    Returns:
+        pd.DataFrame: CATALOG_COLUMNS records ordered by region and start date
+    """
+    regions, days = coverage.shape
+    width = days + 1
+    active = np.zeros((regions, width), bool)
+    active[:, :days] = coverage > min_coverage
+    daily_temp = np.zeros((regions, width))
+    np.divide(weighted, coverage, out=daily_temp[:, :days], where=active[:, :days])
+    padded_cov = np.zeros((regions, width))
+    padded_cov[:, :days] = coverage
+
+    s, e = _runs(active.ravel())
+    row = s // width
+    prefix = np.concatenate(([0.0], np.cumsum(daily_temp.ravel())))
+    dates = pd.DatetimeIndex(dates)
+    start_day, end_day = s - row * width, e - row * width
+    return pd.DataFrame({
+        'start_date': dates[start_day].date,
+        'end_date': dates[end_day - 1].date,
+        'temperature': np.round((prefix[e] - prefix[s]) / (e - s), 1),
+        'duration': (e - s).astype(np.int64),
+        'NERC_ID': np.asarray([str(r) for r in region_ids], dtype=object)[row],
+        'spatial_coverage': np.round(_segment_max(padded_cov.ravel(), s, e) * 100, 1),
+        'event_ID': np.arange(1, len(s) + 1, dtype=np.int64),
+    }, columns=CATALOG_COLUMNS)
+
+
+def detect_events(temps: np.ndarray, dates, weights, region_ids: Sequence[str], event_type: str = 'heat',
+                  thresholds: Optional[Tuple[np.ndarray, np.ndarray]] = None, min_run: int = MIN_RUN_DAYS,
+                  t1_percentile: float = T1_PERCENTILE, t2_percentile: float = T2_PERCENTILE,
+                  min_coverage: float = 0.0, block: int = BLOCK_LOCATIONS) -> pd.DataFrame:
+    """
+    Build heat_wave_metadata or cold_wave_metadata records from daily temperatures.
+
+    Args:
+        temps (np.ndarray): (locations, days) daily maximum (heat) or minimum (cold) temperatures
+        dates: Dates of the days
+        weights: (locations, regions) weights from region_weight_matrix
+        region_ids (list): Region ID of each weights column
+        event_type (str): 'heat' or 'cold'
+        thresholds (tuple): Per-location (T1, T2); computed from temps when omitted
+        min_run (int): Minimum consecutive days beyond T1
+        t1_percentile (float): Heat-side T1 percentile when thresholds are computed
+        t2_percentile (float): Heat-side T2 percentile when thresholds are computed
+        min_coverage (float): Minimum share of a region for a day to count as a region event day
+        block (int): Locations per block
+
+    Returns:
+        pd.DataFrame: Catalog records (CATALOG_COLUMNS)
+    """
+    events = detect_location_events(temps, event_type, thresholds, min_run, t1_percentile, t2_percentile, block)
+    coverage, weighted = region_daily_coverage(temps, events, weights, block)
+    return region_events(coverage, weighted, dates, region_ids, min_coverage)
@@ -0,0 +1,319 @@
+"""
+Incremental catalog updates when new days of data arrive.
+
+build_catalog runs a full build and saves the catalog state next to the
+cube: per-location thresholds, location events and catalog rows. After
+catalog.cube.append_days adds a season, update_catalog re-detects only what
+the new days can change. With frozen thresholds, an event can only change if
+its run of days beyond T2 reaches the old end of the record. Each location
+is therefore re-segmented from the start of its trailing T2 run, and region
+events from the first region event that can be affected. Without frozen
+thresholds the climatology moves and every event may change, so the catalog
+is rebuilt and only the differences are written.
+
+Changed rows are upserted into the event table (keyed by region and start
+date; unchanged rows keep their event_ID) and the caches that depend on the
+event tables are invalidated.
+"""
+import json
+import os
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, inspect
+
+from catalog.build import detect_cube_events
+from catalog.cube import open_cube
+from catalog.detection import (BLOCK_LOCATIONS, CATALOG_COLUMNS, LOCATION_EVENT_COLUMNS, MIN_RUN_DAYS, T1_PERCENTILE,
+                               T2_PERCENTILE, _sign, detect_location_events, region_daily_coverage, region_events)
+from utils.cache_backend import invalidate_namespace, sync_namespaces
+from utils.database import EVENT_TABLES, bump_data_version, data_version, get_column, get_event_table
+
+# Cube variable each event type is detected on
+EVENT_VARIABLES = {'heat': 'tmax', 'cold': 'tmin'}
+# Cache namespaces holding results derived from the event tables
+DEPENDENT_CACHE_NAMESPACES = ('events', 'sql', 'answer', 'figure', 'extremes')
+# Catalog columns compared to decide whether a row changed
+VALUE_COLUMNS = ['end_date', 'temperature', 'duration', 'spatial_coverage']
+KEY_COLUMNS = ['NERC_ID', 'start_date']
+
+
+def state_path(cube_path: str, event_type: str) -> str:
+    return os.path.join(cube_path, f"catalog_{event_type}.npz")
+
+
+def save_state(cube_path: str, event_type: str, days: int, thresholds, location_events: pd.DataFrame,
+               catalog: pd.DataFrame, params: Dict[str, Any]):
+    """Write the state an incremental update starts from (atomically)."""
+    start = pd.Timestamp(open_cube(cube_path).meta['start_date'])
+    arrays = {f"event_{c}": location_events[c].to_numpy() for c in LOCATION_EVENT_COLUMNS}
+    for column in CATALOG_COLUMNS:
+        values = catalog[column]
+        if column in ('start_date', 'end_date'):
+            values = (pd.to_datetime(values) - start).dt.days
+        arrays[f"catalog_{column}"] = values.to_numpy().astype(str) if column == 'NERC_ID' else values.to_numpy()
+    path = state_path(cube_path, event_type)
+    with open(f"{path}.tmp", 'wb') as f:
+        np.savez(f, days=days, t1=thresholds[0], t2=thresholds[1], params=np.array(json.dumps(params)), **arrays)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_state(cube_path: str, event_type: str) -> Dict[str, Any]:
+    """Read the saved state: days, thresholds, location_events, catalog and params."""
+    start = pd.Timestamp(open_cube(cube_path).meta['start_date'])
+    with np.load(state_path(cube_path, event_type)) as data:
+        catalog = pd.DataFrame({c: data[f"catalog_{c}"] for c in CATALOG_COLUMNS}, columns=CATALOG_COLUMNS)
+        for column in ('start_date', 'end_date'):
+            catalog[column] = (start + pd.to_timedelta(catalog[column], unit='D')).dt.date
+        catalog['NERC_ID'] = catalog['NERC_ID'].astype(object)
+        return {
+            'days': int(data['days']),
+            'thresholds': (data['t1'], data['t2']),
+            'location_events': pd.DataFrame({c: data[f"event_{c}"] for c in LOCATION_EVENT_COLUMNS}),
+            'catalog': catalog,
+            'params': json.loads(str(data['params'])),
+        }
+
+
+def _trailing_run_start(temps: np.ndarray, t2: np.ndarray, days: int, sign: float,
+                        lookback: int = 366, block: int = BLOCK_LOCATIONS) -> np.ndarray:
+    """First day of each location's run beyond T2 that reaches day `days` - 1 (`days` if none does)."""
+    starts = np.empty(temps.shape[0], np.int64)
+    for lo in range(0, temps.shape[0], block):
+        hi = min(lo + block, temps.shape[0])
+        window = lookback
+        while True:
+            w0 = max(days - window, 0)
+            beyond = sign * np.asarray(temps[lo:hi, w0:days], np.float32) > sign * t2[lo:hi, None]
+            reversed_beyond = beyond[:, ::-1]
+            # Length of the trailing run = position of the first day (from the end) not beyond T2
+            run = np.where(reversed_beyond.all(axis=1), days - w0, np.argmin(reversed_beyond, axis=1))
+            if w0 == 0 or (run < days - w0).all():
+                break
+            window *= 2
+        starts[lo:hi] = days - run
+    return starts
+
+
+def _clip_events(location_events: pd.DataFrame, first_day: int) -> pd.DataFrame:
+    """Location events overlapping days >= first_day, with days counted from first_day."""
+    clipped = location_events[location_events['end_day'] >= first_day].copy()
+    clipped['start_day'] = np.maximum(clipped['start_day'] - first_day, 0)
+    clipped['end_day'] -= first_day
+    return clipped
+
+
+def _assign_ids(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Give new rows the event_ID of the old row with the same key, and fresh IDs otherwise."""
+    ids = old.set_index(KEY_COLUMNS)['event_ID']
+    matched = pd.MultiIndex.from_frame(new[KEY_COLUMNS]).map(lambda key: ids.get(key, np.nan))
+    new = new.copy()
+    new['event_ID'] = np.asarray(matched, np.float64)
+    fresh = new['event_ID'].isna().to_numpy()
+    next_id = int(old['event_ID'].max()) + 1 if len(old) else 1
+    new.loc[fresh, 'event_ID'] = np.arange(next_id, next_id + fresh.sum())
+    new['event_ID'] = new['event_ID'].astype(np.int64)
+    return new
+
+
+def catalog_changes(old: pd.DataFrame, new: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Compare two catalogs keyed by region and start date.
+
+    Returns:
+        dict: 'inserted' and 'updated' rows of new (updated rows carry the old event_ID)
+            and 'deleted' rows of old
+    """
+    merged = old.merge(new, on=KEY_COLUMNS, how='outer', suffixes=('_old', ''), indicator=True)
+    both = merged['_merge'] == 'both'
+    changed = np.zeros(len(merged), bool)
+    for column in VALUE_COLUMNS:
+        changed |= (merged[f"{column}_old"] != merged[column]).to_numpy()
+    columns = CATALOG_COLUMNS
+    deleted = merged[merged['_merge'] == 'left_only'].rename(columns={f"{c}_old": c for c in VALUE_COLUMNS})
+    return {
+        'inserted': merged.loc[merged['_merge'] == 'right_only', columns],
+        'updated': merged.loc[both & changed, columns],
+        'deleted': deleted.assign(event_ID=deleted['event_ID_old'])[columns],
+    }
+
+
+def _coerce(column, value):
+    """Convert a value to the Python type of a database column (e.g. text NERC IDs)."""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type in (int, float, str):
+        return python_type(value)
+    return value
+
+
+def apply_changes(engine, event_type: str, changes: Dict[str, pd.DataFrame]):
+    """Upsert catalog changes into the event table in one transaction."""
+    table = get_event_table(engine, event_type)
+    columns = {name: get_column(table, name) for name in CATALOG_COLUMNS}
+    event_id = columns['event_ID']
+
+    def rows(frame, prefix=''):
+        return [{f"{prefix}{name}": _coerce(columns[name], value) for name, value in record.items()}
+                for record in frame[CATALOG_COLUMNS].to_dict('records')]
+
+    with engine.begin() as conn:
+        if len(changes['deleted']):
+            ids = [int(i) for i in changes['deleted']['event_ID']]
+            conn.execute(table.delete().where(event_id.in_(ids)))
+        if len(changes['updated']):
+            values = {columns[name].name: bindparam(f"b_{name}") for name in CATALOG_COLUMNS if name != 'event_ID'}
+            conn.execute(table.update().where(event_id == bindparam('b_event_ID')).values(values),
+                         rows(changes['updated'], 'b_'))
+        if len(changes['inserted']):
+            conn.execute(table.insert(), [{columns[k].name: v for k, v in row.items()}
+                                          for row in rows(changes['inserted'])])
+
+
+def write_catalog(engine, event_type: str, catalog: pd.DataFrame):
+    """Replace every row of the event table with a catalog (creating the table if missing)."""
+    name = EVENT_TABLES[event_type]
+    if not inspect(engine).has_table(name):
+        catalog.to_sql(name, engine, index=False)
+        return
+    table = get_event_table(engine, event_type)
+    with engine.begin() as conn:
+        conn.execute(table.delete())
+    apply_changes(engine, event_type, {'inserted': catalog, 'updated': catalog.iloc[:0],
+                                       'deleted': catalog.iloc[:0]})
+
+
+def invalidate_dependent_caches(engine=None):
+    """
+    Drop cached answers, event query results and figures derived from the event tables.
+
+    With an engine, the database's data version is bumped too, so app processes that do not
+    share this process's cache backend drop theirs on their next sync_dependent_caches.
+    """
+    if engine is not None:
+        bump_data_version(engine)
+    for namespace in DEPENDENT_CACHE_NAMESPACES:
+        invalidate_namespace(namespace)
+
+
+def sync_dependent_caches(engine) -> bool:
+    """
+    Drop this process's dependent caches if the event tables changed since it last checked.
+
+    Args:
+        engine (Engine): Database holding the event tables
+
+    Returns:
+        bool: Whether the caches were invalidated
+    """
+    return sync_namespaces(DEPENDENT_CACHE_NAMESPACES, data_version(engine))
+
+
+def build_catalog(cube_path: str, event_type: str, weights, region_ids: Sequence[str], engine=None,
+                  workers: Optional[int] = None, min_run: int = MIN_RUN_DAYS, t1_percentile: float = T1_PERCENTILE,
+                  t2_percentile: float = T2_PERCENTILE, min_coverage: float = 0.0) -> pd.DataFrame:
+    """
+    Build a catalog from the whole cube, save its state for updates and optionally write it.
+
+    Args:
+        cube_path (str): Cube directory
+        event_type (str): 'heat' or 'cold'
+        weights: (locations, regions) weights from region_weight_matrix or county_region_weights
+        region_ids (list): Region ID of each weights column
+        engine (Engine): Database to replace the event table in (not written when None)
+        workers (int): Worker processes for detection
+        min_run (int): Minimum consecutive days beyond T1
+        t1_percentile (float): Heat-side T1 percentile
+        t2_percentile (float): Heat-side T2 percentile
+        min_coverage (float): Minimum share of a region for a day to count as a region event day
+
+    Returns:
+        pd.DataFrame: Catalog records
+    """
+    catalog, location_events, thresholds = detect_cube_events(
+        cube_path, EVENT_VARIABLES[event_type], event_type, weights, region_ids, workers=workers,
+        min_run=min_run, t1_percentile=t1_percentile, t2_percentile=t2_percentile, min_coverage=min_coverage)
+    params = {'min_run': min_run, 't1_percentile': t1_percentile, 't2_percentile': t2_percentile,
+              'min_coverage': min_coverage}
+    save_state(cube_path, event_type, open_cube(cube_path).days, thresholds, location_events, catalog, params)
+    if engine is not None:
+        write_catalog(engine, event_type, catalog)
+        invalidate_dependent_caches(engine)
+    return catalog
+
+
+def update_catalog(cube_path: str, event_type: str, weights, region_ids: Sequence[str], engine=None,
+                   freeze_thresholds: bool = True, workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Bring a catalog up to date with days appended to the cube since it was built.
+
+    Args:
+        cube_path (str): Cube directory (with state saved by build_catalog or a previous update)
+        event_type (str): 'heat' or 'cold'
+        weights: (locations, regions) weights used for the build
+        region_ids (list): Region ID of each weights column
+        engine (Engine): Database whose event table receives the changes (not written when None)
+        freeze_thresholds (bool): Keep the saved T1/T2; otherwise recompute them from the whole
+            record, which can change any event
+        workers (int): Worker processes when the catalog is rebuilt
+
+    Returns:
+        dict: 'catalog', the 'inserted'/'updated'/'deleted' rows and 'first_day', the first
+            recomputed date
+    """
+    state = load_state(cube_path, event_type)
+    cube = open_cube(cube_path)
+    params = state['params']
+    old_days, old_catalog = state['days'], state['catalog']
+    if cube.days < old_days:
+        raise ValueError("The cube has fewer days than the saved catalog state")
+
+    if not freeze_thresholds:
+        catalog, location_events, thresholds = detect_cube_events(
+            cube_path, EVENT_VARIABLES[event_type], event_type, weights, region_ids, workers=workers, **params)
+        first_day = 0
+    else:
+        thresholds = state['thresholds']
+        sign = _sign(event_type)
+        temps = cube.variable(EVENT_VARIABLES[event_type])
+        old_events = state['location_events']
+        # Events starting before a location's trailing T2 run at the old end cannot change
+        tail = _trailing_run_start(temps, thresholds[1], old_days, sign)
+        w0 = int(tail.min()) if len(tail) else old_days
+        recent = detect_location_events(temps[:, w0:], event_type, thresholds, params['min_run'])
+        recent[['start_day', 'end_day']] += w0
+        keep_recent = recent['start_day'].to_numpy() >= tail[recent['location'].to_numpy()]
+        keep_old = old_events['start_day'].to_numpy() < tail[old_events['location'].to_numpy()]
+        location_events = (pd.concat([old_events[keep_old], recent[keep_recent]], ignore_index=True)
+                           .sort_values(['location', 'start_day'], kind='stable', ignore_index=True))
+
+        # Region events reaching the recomputed window are re-segmented from their start, and so
+        # is every other region's event straddling that earlier start
+        end_index = (pd.to_datetime(old_catalog['end_date']) - cube.dates[0]).dt.days.to_numpy()
+        start_index = (pd.to_datetime(old_catalog['start_date']) - cube.dates[0]).dt.days.to_numpy()
+        first_day = w0
+        while True:
+            straddling = (start_index < first_day) & (end_index >= first_day - 1)
+            if not straddling.any():
+                break
+            first_day = int(start_index[straddling].min())
+        coverage, weighted = region_daily_coverage(temps[:, first_day:], _clip_events(location_events, first_day),
+                                                   weights)
+        window = region_events(coverage, weighted, cube.dates[first_day:], region_ids, params['min_coverage'])
+        catalog = pd.concat([old_catalog[end_index < first_day], window], ignore_index=True)
+
+    # Catalog order: regions in weights column order, then start date
+    order = {str(r): i for i, r in enumerate(region_ids)}
+    catalog = _assign_ids(old_catalog, catalog)
+    catalog = catalog.iloc[np.lexsort((pd.to_datetime(catalog['start_date']).to_numpy(),
+                                       catalog['NERC_ID'].map(order).to_numpy()))].reset_index(drop=True)
+    changes = catalog_changes(old_catalog, catalog)
+    save_state(cube_path, event_type, cube.days, thresholds, location_events, catalog, params)
+    if engine is not None and any(len(rows) for rows in changes.values()):
+        apply_changes(engine, event_type, changes)
+        invalidate_dependent_caches(engine)
+    return {'catalog': catalog, 'first_day': cube.dates[first_day].date(), **changes}
+
@@ -0,0 +1,148 @@
+"""
+Bulk point-in-region lookup for asset lists.
+
+Assigns lat/lon points (substations, plants) to the NERC subregion and
+county they fall in, so assets can be joined to heat_wave_metadata and
+cold_wave_metadata by NERC_ID. Both polygon sets are held in shapely
+STRtrees over prepared geometries. All points are queried in one vectorized
+call per layer, which filters by bounding box and tests 'intersects' in GEOS
+without a Python loop. Points on a shared border take the first matching
+feature in file order.
+
+Usage:
+    python -m catalog.points assets.csv assets_located.csv [--lat-column lat] [--lon-column lon]
+"""
+import argparse
+import json
+import sys
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from catalog.spatial import load_geometries
+from config.config import COUNTIES_GEOJSON_PATH, NERC_GEOJSON_PATH, STRING_ID_TO_SUBNAME
+
+LAT_COLUMNS = ('lat', 'latitude', 'y')
+LON_COLUMNS = ('lon', 'lng', 'long', 'longitude', 'x')
+
+
+@lru_cache(maxsize=4)
+def load_layer(path: str, id_property: Optional[str] = None) -> Tuple[np.ndarray, shapely.STRtree, Dict[str, str]]:
+    """
+    Load a polygon layer as a spatial index (once per process and path).
+
+    Returns:
+        tuple: (feature IDs, STRtree over the prepared geometries, ID -> feature name)
+    """
+    ids, geometries = load_geometries(path, id_property)
+    shapely.prepare(geometries)
+    names = {}
+    if id_property is None:
+        with open(path) as f:
+            names = {str(feature['id']): feature.get('properties', {}).get('NAME', '')
+                     for feature in json.load(f)['features']}
+    return np.array(ids, dtype=object), shapely.STRtree(geometries), names
+
+
+def _first_match(points: np.ndarray, tree: shapely.STRtree, ids: np.ndarray) -> np.ndarray:
+    """ID of the first feature each point intersects (None when there is none)."""
+    point_index, feature_index = tree.query(points, predicate='intersects')
+    # Lowest feature index per point: sort by (point, feature) and keep each point's first pair
+    order = np.lexsort((feature_index, point_index))
+    point_index, feature_index = point_index[order], feature_index[order]
+    first = np.r_[True, point_index[1:] != point_index[:-1]] if len(point_index) else np.empty(0, bool)
+    out = np.full(len(points), None, dtype=object)
+    out[point_index[first]] = ids[feature_index[first]]
+    return out
+
+
+def locate_points(lats: Sequence[float], lons: Sequence[float], regions_path: str = NERC_GEOJSON_PATH,
+                  counties_path: str = COUNTIES_GEOJSON_PATH) -> pd.DataFrame:
+    """
+    Find the NERC subregion and county of each point.
+
+    Args:
+        lats (list): Latitudes (degrees)
+        lons (list): Longitudes (degrees, negative west)
+        regions_path (str): NERC subregion GeoJSON with an "ID" property
+        counties_path (str): County GeoJSON keyed by FIPS
+
+    Returns:
+        pd.DataFrame: NERC_ID, SUBNAME, FIPS and county columns, one row per point in input
+            order; None where a point is outside every polygon or has no coordinates
+    """
+    lats = np.asarray(lats, np.float64)
+    lons = np.asarray(lons, np.float64)
+    points = shapely.points(lons, lats)
+    region_ids, region_tree, _ = load_layer(regions_path, 'ID')
+    county_ids, county_tree, county_names = load_layer(counties_path)
+    nerc_id = _first_match(points, region_tree, region_ids)
+    fips = _first_match(points, county_tree, county_ids)
+    return pd.DataFrame({
+        'NERC_ID': nerc_id,
+        'SUBNAME': [STRING_ID_TO_SUBNAME.get(rid) if rid is not None else None for rid in nerc_id],
+        'FIPS': fips,
+        'county': [county_names.get(code) if code is not None else None for code in fips],
+    })
+
+
+def _find_column(frame: pd.DataFrame, requested: Optional[str], candidates: Sequence[str]) -> str:
+    if requested:
+        if requested not in frame.columns:
+            raise KeyError(f"Column '{requested}' not found (columns: {', '.join(frame.columns)})")
+        return requested
+    lowered = {str(column).lower(): column for column in frame.columns}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    raise KeyError(f"No column named any of {', '.join(candidates)}; pass it explicitly")
+
+
+def locate_frame(frame: pd.DataFrame, lat_column: Optional[str] = None, lon_column: Optional[str] = None,
+                 **paths) -> pd.DataFrame:
+    """
+    Add NERC_ID, SUBNAME, FIPS and county columns to a table of points.
+
+    Args:
+        frame (pd.DataFrame): Points, e.g. an asset list
+        lat_column (str): Latitude column (lat/latitude/y by default)
+        lon_column (str): Longitude column (lon/lng/long/longitude/x by default)
+        **paths: regions_path / counties_path overrides for locate_points
+
+    Returns:
+        pd.DataFrame: The input with the location columns appended
+    """
+    lat_column = _find_column(frame, lat_column, LAT_COLUMNS)
+    lon_column = _find_column(frame, lon_column, LON_COLUMNS)
+    lats = pd.to_numeric(frame[lat_column], errors='coerce')
+    lons = pd.to_numeric(frame[lon_column], errors='coerce')
+    located = locate_points(lats, lons, **paths)
+    located.index = frame.index
+    return pd.concat([frame.drop(columns=[c for c in located.columns if c in frame.columns]), located], axis=1)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Add the NERC subregion and county of each lat/lon row of a CSV.')
+    parser.add_argument('input', help="CSV with latitude and longitude columns ('-' for stdin)")
+    parser.add_argument('output', nargs='?', default='-', help="output CSV ('-' for stdout, the default)")
+    parser.add_argument('--lat-column')
+    parser.add_argument('--lon-column')
+    parser.add_argument('--regions', default=NERC_GEOJSON_PATH, help='NERC subregion GeoJSON')
+    parser.add_argument('--counties', default=COUNTIES_GEOJSON_PATH, help='county GeoJSON')
+    args = parser.parse_args(argv)
+
+    # Read identifiers (FIPS codes, asset IDs) as text so leading zeros survive
+    frame = pd.read_csv(sys.stdin if args.input == '-' else args.input, dtype=str, keep_default_na=False)
+    located = locate_frame(frame, args.lat_column, args.lon_column, regions_path=args.regions,
+                           counties_path=args.counties)
+    located.to_csv(sys.stdout if args.output == '-' else args.output, index=False)
+    missing = located['NERC_ID'].isna().sum()
+    if missing:
+        print(f"{missing} of {len(located)} points are outside every NERC subregion", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
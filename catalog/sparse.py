@@ -0,0 +1,105 @@
+"""
+Compressed sparse row weights for location-to-region aggregation.
+
+County x region weights are almost all zero: a county lies in one or two
+NERC subregions. SparseWeights stores only the nonzero entries in CSR form
+(indptr, indices, data), slices by blocks of locations like the dense
+(locations, regions) matrices it replaces, and aggregates location series
+to regions with one sparse product: each region is a BLAS-backed weighted
+sum of only the rows of its own locations.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+class SparseWeights:
+    """A (locations, regions) CSR matrix."""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape: Tuple[int, int]):
+        self.indptr = np.asarray(indptr, np.int64)
+        self.indices = np.asarray(indices, np.int64)
+        self.data = np.asarray(data, np.float64)
+        self.shape = (int(shape[0]), int(shape[1]))
+        if len(self.indptr) != self.shape[0] + 1 or len(self.indices) != len(self.data):
+            raise ValueError(f"Inconsistent CSR arrays for shape {self.shape}")
+        self._by_region = None
+
+    @classmethod
+    def from_coo(cls, rows, cols, values, shape: Tuple[int, int]) -> 'SparseWeights':
+        """Build from (row, column, value) triplets; duplicates are summed."""
+        rows, cols = np.asarray(rows, np.int64), np.asarray(cols, np.int64)
+        values = np.asarray(values, np.float64)
+        order = np.lexsort((cols, rows))
+        rows, cols, values = rows[order], cols[order], values[order]
+        first = np.r_[True, (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])] if len(rows) else np.empty(0, bool)
+        starts = np.flatnonzero(first)
+        values = np.add.reduceat(values, starts) if len(starts) else values
+        rows, cols = rows[starts], cols[starts]
+        indptr = np.zeros(shape[0] + 1, np.int64)
+        np.add.at(indptr, rows + 1, 1)
+        return cls(np.cumsum(indptr), cols, values, shape)
+
+    @classmethod
+    def from_dense(cls, dense) -> 'SparseWeights':
+        dense = np.asarray(dense)
+        rows, cols = np.nonzero(dense)
+        return cls.from_coo(rows, cols, dense[rows, cols], dense.shape)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, rows: slice) -> 'SparseWeights':
+        """Rows lo:hi as a SparseWeights (slices with step 1 only)."""
+        if not isinstance(rows, slice) or rows.step not in (None, 1):
+            raise TypeError("SparseWeights supports contiguous row slices only")
+        lo, hi, _ = rows.indices(self.shape[0])
+        hi = max(lo, hi)
+        a, b = self.indptr[lo], self.indptr[hi]
+        return SparseWeights(self.indptr[lo:hi + 1] - a, self.indices[a:b], self.data[a:b], (hi - lo, self.shape[1]))
+
+    def toarray(self) -> np.ndarray:
+        dense = np.zeros(self.shape)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        dense[rows, self.indices] = self.data
+        return dense
+
+    def transpose_matmul(self, x: np.ndarray) -> np.ndarray:
+        """
+        Aggregate location rows to regions: weights.T @ x.
+
+        Args:
+            x (np.ndarray): (locations, ...) values, e.g. daily event flags
+
+        Returns:
+            np.ndarray: (regions, ...) weighted sums
+        """
+        x = np.asarray(x)
+        out = np.zeros((self.shape[1],) + x.shape[1:], np.result_type(x.dtype, np.float32))
+        if not self.nnz:
+            return out
+        if self._by_region is None:
+            # Entries grouped by region: each region is a weighted sum of a few gathered rows
+            order = np.argsort(self.indices, kind='stable')
+            rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))[order]
+            cols = self.indices[order]
+            bounds = np.flatnonzero(np.r_[True, cols[1:] != cols[:-1], True])
+            self._by_region = [(cols[a], rows[a:b], self.data[order][a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        for region, rows, data in self._by_region:
+            out[region] = np.tensordot(data.astype(out.dtype), x.take(rows, axis=0), axes=(0, 0))
+        return out
+
+
+def transpose_matmul(weights, x: np.ndarray) -> np.ndarray:
+    """weights.T @ x for dense (locations, regions) arrays and SparseWeights alike."""
+    if isinstance(weights, SparseWeights):
+        return weights.transpose_matmul(x)
+    return np.asarray(weights, np.float32).T @ x
+
+
+def has_weight(weights) -> bool:
+    """Whether a block of weights has any nonzero entry."""
+    if isinstance(weights, SparseWeights):
+        return bool(np.any(weights.data))
+    return bool(np.asarray(weights).any())
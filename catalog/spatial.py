@@ -0,0 +1,146 @@
+"""
+County x NERC subregion area weights.
+
+Each weight is the share of a region's county-covered area that lies in a
+county: area(county ∩ region) / Σ area(county' ∩ region), so offshore or
+cross-border parts of a region boundary do not count. Each column of the
+matrix sums to 1, like region_weight_matrix, and weights.T @ flags turns
+per-county daily event flags into the fraction of each region affected, which
+is what the spatial_coverage column reports. Areas are measured in the
+sinusoidal projection (equal-area, so no projection library is needed).
+Candidate county/region pairs come from a shapely STRtree query, and all
+pair intersections are computed in one vectorized shapely call. The matrix
+is stored as SparseWeights in an .npz file together with the signature
+(path, size, content hash) of both GeoJSON files, and rebuilt when it differs.
+"""
+import json
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from catalog.sparse import SparseWeights
+from utils.sources import sources_signature
+from config.config import COUNTIES_GEOJSON_PATH, COUNTY_REGION_WEIGHTS_PATH, NERC_GEOJSON_PATH, STRING_ID_TO_SUBNAME
+
+
+def _equal_area(geometries: np.ndarray) -> np.ndarray:
+    """Project lon/lat geometries to the sinusoidal projection (degrees of latitude as units)."""
+    def sinusoidal(coords):
+        return np.column_stack([coords[:, 0] * np.cos(np.radians(coords[:, 1])), coords[:, 1]])
+    return shapely.transform(geometries, sinusoidal)
+
+
+def load_geometries(path: str, id_property: Optional[str] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    Read GeoJSON features as valid shapely geometries.
+
+    Args:
+        path (str): GeoJSON file
+        id_property (str): Property holding the feature ID (the feature 'id' when None)
+
+    Returns:
+        tuple: (ids, geometries)
+    """
+    with open(path) as f:
+        features = [f for f in json.load(f)['features'] if f.get('geometry')]
+    ids = [str(f['id'] if id_property is None else f['properties'][id_property]) for f in features]
+    geometries = shapely.make_valid(np.array([shape(f['geometry']) for f in features], dtype=object))
+    return ids, geometries
+
+
+def load_regions(path: str = NERC_GEOJSON_PATH) -> Tuple[List[str], np.ndarray]:
+    """NERC subregion geometries, one (merged) geometry per ID in STRING_ID_TO_SUBNAME order."""
+    region_ids, regions = load_geometries(path, 'ID')
+    order = {rid: i for i, rid in enumerate(STRING_ID_TO_SUBNAME)}
+    unique_ids = sorted(set(region_ids), key=lambda r: (order.get(r, len(order)), len(r), r))
+    labels = np.array(region_ids)
+    merged = np.array([shapely.union_all(regions[labels == rid]) for rid in unique_ids], dtype=object)
+    return unique_ids, merged
+
+
+def area_weights(county_geometries: np.ndarray, region_geometries: np.ndarray) -> SparseWeights:
+    """
+    Share of each region's county-covered area in each county.
+
+    Args:
+        county_geometries (np.ndarray): County polygons (lon/lat)
+        region_geometries (np.ndarray): Region polygons (lon/lat)
+
+    Returns:
+        SparseWeights: (counties, regions) weights; each column sums to 1 (0 for regions no county overlaps)
+    """
+    counties = _equal_area(county_geometries)
+    regions = _equal_area(region_geometries)
+    region_index, county_index = shapely.STRtree(counties).query(regions, predicate='intersects')
+    overlap = shapely.area(shapely.intersection(counties[county_index], regions[region_index]))
+    keep = overlap > 0
+    region_index, county_index, overlap = region_index[keep], county_index[keep], overlap[keep]
+    covered = np.bincount(region_index, overlap, minlength=len(regions))
+    shares = overlap / covered[region_index]
+    return SparseWeights.from_coo(county_index, region_index, shares, (len(counties), len(regions)))
+
+
+def save_weights(path: str, weights: SparseWeights, county_ids: Sequence[str], region_ids: Sequence[str],
+                 sources: str = ''):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.tmp", 'wb') as f:
+        np.savez(f, indptr=weights.indptr, indices=weights.indices, data=weights.data,
+                 shape=np.array(weights.shape), county_ids=np.array(county_ids), region_ids=np.array(region_ids),
+                 sources=np.array(sources))
+    os.replace(f"{path}.tmp", path)
+
+
+def load_weights(path: str) -> Tuple[SparseWeights, List[str], List[str]]:
+    with np.load(path) as data:
+        weights = SparseWeights(data['indptr'], data['indices'], data['data'], tuple(data['shape']))
+        return weights, data['county_ids'].tolist(), data['region_ids'].tolist()
+
+
+def weights_sources(path: str) -> Optional[str]:
+    """Source signature stored with a weights file, None if missing or unreadable."""
+    try:
+        with np.load(path) as data:
+            return str(data['sources']) if 'sources' in data.files else None
+    except (OSError, ValueError):
+        return None
+
+
+def county_region_weights(counties_path: str = COUNTIES_GEOJSON_PATH, regions_path: str = NERC_GEOJSON_PATH,
+                          cache_path: Optional[str] = COUNTY_REGION_WEIGHTS_PATH):
+    """
+    County x NERC subregion area weights, from the cache file when it was built from the same files.
+
+    Args:
+        counties_path (str): County GeoJSON keyed by FIPS (feature id)
+        regions_path (str): NERC subregion GeoJSON with an "ID" property
+        cache_path (str): .npz file the matrix is stored in (not cached when None)
+
+    Returns:
+        tuple: (weights, county_ids, region_ids); region IDs follow STRING_ID_TO_SUBNAME order
+    """
+    sources = sources_signature(counties_path, regions_path)
+    if cache_path and os.path.exists(cache_path) and weights_sources(cache_path) == sources:
+        return load_weights(cache_path)
+    county_ids, counties = load_geometries(counties_path)
+    region_ids, regions = load_regions(regions_path)
+    weights = area_weights(counties, regions)
+    if cache_path:
+        save_weights(cache_path, weights, county_ids, region_ids, sources)
+    return weights, county_ids, region_ids
+
+
+def region_coverage(weights: SparseWeights, flags: np.ndarray) -> np.ndarray:
+    """
+    Fraction of each region in an event on each day.
+
+    Args:
+        weights (SparseWeights): (counties, regions) area weights
+        flags (np.ndarray): (counties, days) daily event flags (bool or 0/1)
+
+    Returns:
+        np.ndarray: (regions, days) coverage in [0, 1]; multiply by 100 for spatial_coverage
+    """
+    return weights.transpose_matmul(np.asarray(flags, np.float32))
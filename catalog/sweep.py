@@ -0,0 +1,120 @@
+"""
+Definition 6 threshold sensitivity sweeps in one pass over the data.
+
+A sweep evaluates a grid of T1 percentiles, T2 percentiles and minimum run
+lengths without building each catalog separately. Each block of locations is
+read once. One partial sort yields every requested percentile, the flattened
+layout and prefix sums are shared by all parameter sets, T2 runs are encoded
+once per T2 value and T1 runs once per T1 value (the same T1 runs serve every
+T2 and minimum run length). Only the core filter and event selection run per
+parameter set. Region coverage for all parameter sets is accumulated in the
+same block loop, and every catalog is reduced to per-region counts and
+severities.
+"""
+from itertools import product
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from catalog.detection import (BLOCK_LOCATIONS, MIN_RUN_DAYS, T1_PERCENTILE, T2_PERCENTILE, _block_layout,
+                               _select_events, _sign, _threshold_runs, region_events)
+from catalog.sparse import has_weight, transpose_matmul
+
+SWEEP_COLUMNS = ['t1_percentile', 't2_percentile', 'min_run', 'NERC_ID', 'events', 'event_days', 'mean_duration',
+                 'max_duration', 'mean_temperature', 'extreme_temperature', 'mean_coverage', 'max_coverage']
+
+
+def parameter_grid(t1_percentiles: Sequence[float] = (T1_PERCENTILE,),
+                   t2_percentiles: Sequence[float] = (T2_PERCENTILE,), min_runs: Sequence[int] = (MIN_RUN_DAYS,)):
+    """Valid (t1_percentile, t2_percentile, min_run) combinations, T1 never below T2."""
+    return [(float(t1), float(t2), int(run)) for t1, t2, run in product(t1_percentiles, t2_percentiles, min_runs)
+            if t1 >= t2]
+
+
+def _span_mask(starts: np.ndarray, ends: np.ndarray, size: int) -> np.ndarray:
+    """Flat boolean mask of the disjoint spans [start, end)."""
+    delta = np.zeros(size + 1, np.int8)
+    delta[starts] = 1
+    delta[ends] -= 1
+    return np.cumsum(delta[:size], dtype=np.int8) > 0
+
+
+def summarize_catalog(catalog: pd.DataFrame, event_type: str, region_ids: Sequence[str]) -> pd.DataFrame:
+    """Per-region event count, event days, durations, temperatures and coverage of a catalog."""
+    extreme = 'max' if _sign(event_type) > 0 else 'min'
+    summary = catalog.groupby('NERC_ID', sort=False).agg(
+        events=('duration', 'size'), event_days=('duration', 'sum'), mean_duration=('duration', 'mean'),
+        max_duration=('duration', 'max'), mean_temperature=('temperature', 'mean'),
+        extreme_temperature=('temperature', extreme), mean_coverage=('spatial_coverage', 'mean'),
+        max_coverage=('spatial_coverage', 'max'))
+    summary = summary.reindex([str(r) for r in region_ids])
+    summary[['events', 'event_days']] = summary[['events', 'event_days']].fillna(0).astype(np.int64)
+    summary[['max_duration']] = summary[['max_duration']].fillna(0).astype(np.int64)
+    return summary.rename_axis('NERC_ID').reset_index()
+
+
+def sweep_events(temps: np.ndarray, dates, weights, region_ids: Sequence[str], event_type: str = 'heat',
+                 t1_percentiles: Sequence[float] = (95.0, T1_PERCENTILE, 99.0),
+                 t2_percentiles: Sequence[float] = (T2_PERCENTILE,), min_runs: Sequence[int] = (2, MIN_RUN_DAYS, 5),
+                 min_coverage: float = 0.0, block: int = BLOCK_LOCATIONS) -> pd.DataFrame:
+    """
+    Evaluate a grid of Definition 6 parameters over the same temperatures.
+
+    Args:
+        temps (np.ndarray): (locations, days) daily maximum (heat) or minimum (cold) temperatures;
+            a cube variable map works without loading it
+        dates: Dates of the days
+        weights: (locations, regions) weights from region_weight_matrix or county_region_weights
+        region_ids (list): Region ID of each weights column
+        event_type (str): 'heat' or 'cold'
+        t1_percentiles (list): Heat-side T1 percentiles
+        t2_percentiles (list): Heat-side T2 percentiles
+        min_runs (list): Minimum consecutive days beyond T1
+        min_coverage (float): Minimum share of a region for a day to count as a region event day
+        block (int): Locations per block
+
+    Returns:
+        pd.DataFrame: SWEEP_COLUMNS, one row per parameter set and region; each parameter set
+            gives the same catalog as detect_events with those parameters
+    """
+    sign = _sign(event_type)
+    grid = parameter_grid(t1_percentiles, t2_percentiles, min_runs)
+    if not grid:
+        raise ValueError("No parameter set has t1_percentile >= t2_percentile")
+    t1_values = sorted({t1 for t1, _, _ in grid})
+    t2_values = sorted({t2 for _, t2, _ in grid})
+    levels = sorted(set(t1_values) | set(t2_values))
+    q = levels if sign > 0 else [100 - p for p in levels]
+
+    n, days = temps.shape
+    coverage = np.zeros((len(grid), weights.shape[1], days))
+    weighted = np.zeros((len(grid), weights.shape[1], days))
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        w = weights[lo:hi]
+        if not has_weight(w):
+            continue
+        raw = np.asarray(temps[lo:hi], np.float32)
+        percentile = np.nanpercentile if np.isnan(raw).any() else np.percentile
+        thresholds = dict(zip(levels, sign * percentile(raw, q, axis=1).astype(np.float32)))
+        y = sign * raw
+        values, prefix, width = _block_layout(y)
+        t2_runs = {t2: _threshold_runs(y, thresholds[t2], width) for t2 in t2_values}
+        t1_runs = {t1: _threshold_runs(y, thresholds[t1], width) for t1 in t1_values}
+        for i, (t1, t2, min_run) in enumerate(grid):
+            _, start, end, _, _ = _select_events(values, prefix, width, t2_runs[t2], t1_runs[t1], thresholds[t1],
+                                                 min_run)
+            mask = _span_mask(start, end, (hi - lo) * width).reshape(hi - lo, width)[:, :days]
+            coverage[i] += transpose_matmul(w, mask.astype(np.float32))
+            weighted[i] += transpose_matmul(w, np.where(mask, raw, np.float32(0)))
+
+    summaries = []
+    for i, (t1, t2, min_run) in enumerate(grid):
+        catalog = region_events(coverage[i], weighted[i], dates, region_ids, min_coverage)
+        summary = summarize_catalog(catalog, event_type, region_ids)
+        summary.insert(0, 't1_percentile', t1)
+        summary.insert(1, 't2_percentile', t2)
+        summary.insert(2, 'min_run', min_run)
+        summaries.append(summary)
+    return pd.concat(summaries, ignore_index=True)[SWEEP_COLUMNS]
@@ -11,7 +11,8 @@ DB_PASSWORD = os.environ.get('DB_PASSWORD', '')
 encoded_password = urllib.parse.quote_plus(DB_PASSWORD)
 
 # Create PostgreSQL connection string
-DB_CONNECTION_STRING = f'postgresql+psycopg2://{DB_USER}:{encoded_password}@{DB_HOST}:5432/{DB_NAME}'
+# DATABASE_URL overrides it with any SQLAlchemy URL (e.g. a local SQLite file for load tests)
+DB_CONNECTION_STRING = os.environ.get('DATABASE_URL') or f'postgresql+psycopg2://{DB_USER}:{encoded_password}@{DB_HOST}:5432/{DB_NAME}'
 
 
 
@@ -24,11 +25,149 @@ OPENAI_API_BASE = os.environ.get('OPENAI_API_BASE', 'https://policyai-openai-wes
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4.1')
 
+# Agent configuration
+# Upper bound on rows returned by a single event query (mirrors the SQL agent top_k)
+EVENT_QUERY_MAX_ROWS = int(os.environ.get('EVENT_QUERY_MAX_ROWS', '600'))
+
+# Local cache/state directory (query plan memory and other on-disk caches)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('GRIDCOPILOT_CACHE_DIR', os.path.join(PROJECT_ROOT, '.cache'))
+
+# Model tiers: comma-separated deployments from smallest/fastest to largest (OPENAI_MODEL alone
+# by default). Simple questions start on the first tier and escalate to larger ones on failure
+# or low confidence; outcomes per question shape and tier are kept in MODEL_ROUTER_PATH
+MODEL_TIERS = [m.strip() for m in os.environ.get('MODEL_TIERS', OPENAI_MODEL).split(',') if m.strip()] or [OPENAI_MODEL]
+MODEL_ROUTER_PATH = os.environ.get('MODEL_ROUTER_PATH', os.path.join(CACHE_DIR, 'model_router.sqlite'))
+# A tier is skipped for a question shape once it has this many attempts below this success rate
+MODEL_ROUTER_MIN_ATTEMPTS = int(os.environ.get('MODEL_ROUTER_MIN_ATTEMPTS', '5'))
+MODEL_ROUTER_MIN_SUCCESS_RATE = float(os.environ.get('MODEL_ROUTER_MIN_SUCCESS_RATE', '0.8'))
+
+# Question-to-SQL plan memory: reuse SQL from earlier successful agent runs
+QUERY_MEMORY_ENABLED = os.environ.get('QUERY_MEMORY_ENABLED', 'true').lower() == 'true'
+QUERY_MEMORY_PATH = os.environ.get('QUERY_MEMORY_PATH', os.path.join(CACHE_DIR, 'query_memory.sqlite'))
+
+# Answer follow-ups ("only after 2010", "sort by coverage") locally from the previous result
+FOLLOWUP_REFINEMENT_ENABLED = os.environ.get('FOLLOWUP_REFINEMENT_ENABLED', 'true').lower() == 'true'
+
+# Show admin panels (stored query plans, etc.) in the sidebar
+SHOW_ADMIN_TOOLS = os.environ.get('SHOW_ADMIN_TOOLS', 'false').lower() == 'true'
+
+# Return event lists through the submit_events function call instead of free-text JSON
+STRUCTURED_OUTPUT_ENABLED = os.environ.get('STRUCTURED_OUTPUT_ENABLED', 'true').lower() == 'true'
+
+# Agent observations: results above this many rows are summarized behind a handle
+OBSERVATION_ROW_THRESHOLD = int(os.environ.get('OBSERVATION_ROW_THRESHOLD', '40'))
+OBSERVATION_PREVIEW_ROWS = int(os.environ.get('OBSERVATION_PREVIEW_ROWS', '10'))
+RESULT_STORE_MAX_ENTRIES = int(os.environ.get('RESULT_STORE_MAX_ENTRIES', '64'))
+
+# Per-session memory: byte budget for derived frames/figures (least recently used
+# are spilled to disk compressed, or dropped, and rebuilt on demand) and bounds
+# on the per-session and process-wide answer caches
+SESSION_MEMORY_BUDGET_MB = float(os.environ.get('SESSION_MEMORY_BUDGET_MB', '64'))
+SESSION_SPILL_ENABLED = os.environ.get('SESSION_SPILL_ENABLED', 'true').lower() == 'true'
+QA_CACHE_MAX_ENTRIES = int(os.environ.get('QA_CACHE_MAX_ENTRIES', '32'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+
+# Cache backend shared by the answer, SQL result and figure caches: 'memory'
+# (per process), 'sqlite' (file shared by replicas on a host) or 'redis'
+# (Redis-protocol server at CACHE_URL shared by all replicas)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory').lower()
+CACHE_URL = os.environ.get('CACHE_URL', 'redis://localhost:6379/0')
+CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', os.path.join(CACHE_DIR, 'shared_cache.sqlite'))
+CACHE_MEMORY_MAX_MB = float(os.environ.get('CACHE_MEMORY_MAX_MB', '256'))
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'gridcopilot:v1')
+
+# Agent session traces: 'record' captures every chat completion and SQL result
+# to AGENT_TRACE_PATH, 'replay' answers them from the trace (matched by request
+# hash) so the pipeline re-runs offline with identical behaviour, 'off' disables
+AGENT_TRACE_MODE = os.environ.get('AGENT_TRACE_MODE', 'off').lower()
+AGENT_TRACE_PATH = os.environ.get('AGENT_TRACE_PATH', os.path.join(CACHE_DIR, 'agent_trace.jsonl.gz'))
+
+# Metrics exposition: HTTP /metrics on METRICS_HOST:METRICS_PORT (0 disables) and/or
+# a Prometheus textfile written every METRICS_FILE_INTERVAL_SECONDS ('' disables)
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9464'))
+METRICS_FILE = os.environ.get('METRICS_FILE', '')
+METRICS_FILE_INTERVAL_SECONDS = float(os.environ.get('METRICS_FILE_INTERVAL_SECONDS', '15'))
+
+# Technical Insights: 'llm' computes statistics locally and has a short LLM call
+# phrase them, 'template' uses fixed templates (no LLM), 'agent' lets the agent
+# derive insights itself
+INSIGHTS_MODE = os.environ.get('INSIGHTS_MODE', 'llm').lower()
+
 # Prompt paths
 PROMPT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prompts')
 BASE_PROMPT_PATH = os.path.join(PROMPT_DIR, 'base_prompt.txt')
+STRUCTURED_PROMPT_PATH = os.path.join(PROMPT_DIR, 'structured_prompt.txt')
+
+# NERC subregion mapping of string ID to SUBNAME
+STRING_ID_TO_SUBNAME = {
+    "1": "AZ-NM-SNV",
+    "2": "CA-MX US",
+    "3": "ERCOT",
+    "4": "FRCC",
+    "5": "NEW ENGLAND",
+    "6": "NWPP",
+    "7": "RMPA",
+    "8": "SPP",
+    "9": "DELTA",
+    "10": "SOUTHEASTERN",
+    "11": "CENTRAL",
+    "12": "VACAR",
+    "15": "NEW YORK",
+    "17": "RFC",
+    "18": "MRO US",
+    "20": "GATEWAY"
+}
+
+# NERC subregion boundaries (GeoJSON with an "ID" property per feature)
+NERC_GEOJSON_PATH = os.environ.get('NERC_GEOJSON_PATH', "/Users/chat200/Downloads/NERC_regions_subregions 2.json")
+# US county boundaries keyed by 5-digit FIPS (feature id)
+COUNTIES_GEOJSON_PATH = os.environ.get('COUNTIES_GEOJSON_PATH', os.path.join(PROJECT_ROOT, 'data', 'geojson-counties-fips.json'))
+# Precomputed county x NERC subregion area weights (rebuilt when either GeoJSON changes)
+COUNTY_REGION_WEIGHTS_PATH = os.environ.get('COUNTY_REGION_WEIGHTS_PATH', os.path.join(CACHE_DIR, 'county_region_weights.npz'))
+# NERC subregion adjacency graph (shared boundary length, centroid distance), rebuilt
+# when the NERC GeoJSON changes
+REGION_ADJACENCY_PATH = os.environ.get('REGION_ADJACENCY_PATH', os.path.join(CACHE_DIR, 'region_adjacency.json'))
+# Maps: 'region' (animated NERC subregion choropleth) or 'county' (county choropleth
+# zoomed to the answer's subregions). County geometry is simplified once with
+# COUNTY_SIMPLIFY_TOLERANCE (degrees, shared borders kept aligned), rounded to
+# COUNTY_COORD_DECIMALS and cached on disk
+MAP_LEVEL = os.environ.get('MAP_LEVEL', 'region').lower()
+COUNTY_SIMPLIFY_TOLERANCE = float(os.environ.get('COUNTY_SIMPLIFY_TOLERANCE', '0.01'))
+COUNTY_COORD_DECIMALS = int(os.environ.get('COUNTY_COORD_DECIMALS', '3'))
+
+# Common names planners use for NERC subregions (see prompts/base_prompt.txt)
+REGION_ALIASES = {
+    "DESERT SOUTHWEST": "1",
+    "CALIFORNIA": "2",
+    "TEXAS": "3",
+    "FLORIDA": "4",
+    "PACIFIC NORTHWEST": "6",
+    "NORTHWEST POWER POOL": "6",
+    "ROCKIES": "7",
+    "SOUTHWEST POWER POOL": "8",
+    "MISO SOUTH": "9",
+    "MID ATLANTIC": "12",
+    "NEWYORK": "15",
+    "PJM": "17",
+    "MIDWEST": "18",
+    "MRO": "18",
+}
 
 # UI Constants
+# Results table: 'grid' (virtualized Arrow-backed st.dataframe) or 'html' (static HTML table)
+TABLE_RENDER_MODE = os.environ.get('TABLE_RENDER_MODE', 'grid').lower()
+
+# Import heavy modules (pandas, plotly, LangChain) in a background thread while
+# the landing page is shown
+BACKGROUND_WARMUP_ENABLED = os.environ.get('BACKGROUND_WARMUP_ENABLED', 'true').lower() == 'true'
+# Number of most recent history entries rendered in full; older ones are collapsed
+# to a summary and their table/map built only when expanded
+HISTORY_FULL_RENDER_COUNT = int(os.environ.get('HISTORY_FULL_RENDER_COUNT', '2'))
+# Number of recent rerun timings kept for the admin view
+RENDER_TIMINGS_KEPT = int(os.environ.get('RENDER_TIMINGS_KEPT', '50'))
 APP_TITLE = "GridCoPilot"
 APP_ICON = "⚡"
 
@@ -1,66 +1,344 @@
 import streamlit as st
+import threading
 import time
-from langchain_openai import AzureChatOpenAI
-from langchain_community.agent_toolkits import create_sql_agent
+from functools import lru_cache
 
+from models.query_memory import answer_from_memory, remember_plan
+from models.router import confident, record_outcome, route
+from utils.agent_trace import flush_trace, get_trace, record_answer
+from utils.cache_backend import cache_get, cache_set
+from utils.metrics import LLM_CALLS, MODEL_ANSWERS, MODEL_LATENCY, QUESTIONS, QUESTIONS_IN_FLIGHT, STAGE_LATENCY, record_cache
 from utils.database import create_sql_database
-from config.config import OPENAI_API_BASE, OPENAI_API_KEY, OPENAI_MODEL
+from utils.intent import parse_intent
+from utils.extremes import DEFAULT_RETURN_PERIODS, return_level_insights, return_levels
+from utils.intervals import answer_from_intervals
+from utils.analytics import compute_event_facts, phrase_insights, template_insights
+from utils.response_formatter import build_event_response, extract_json_from_response, replace_insights
+from utils.visualization import parse_temperature_json
+from config.config import STRING_ID_TO_SUBNAME, OPENAI_API_BASE, OPENAI_API_KEY, OPENAI_MODEL, MODEL_TIERS, EVENT_QUERY_MAX_ROWS, QUERY_MEMORY_ENABLED, STRUCTURED_OUTPUT_ENABLED, INSIGHTS_MODE, RESPONSE_CACHE_MAX_ENTRIES
+
+# Prompt wording for the insights part of the answer, per INSIGHTS_MODE
+INSIGHT_INSTRUCTIONS = {
+    'agent': ('Provide technical insights from the results obtained: at least three points analyzing key aspects '
+              'of the results (e.g., temperature trends, spatial coverage changes, event frequency). In a '
+              'free-text answer, put them after the JSON in a section titled "### Technical Insights:" as '
+              'numbered bullet points.'),
+    'local': ('Do not write technical insights (leave insights empty); they are computed from the returned '
+              'events by the application.'),
+}
+
+# Appended to an answer no model tier was confident in
+LOW_CONFIDENCE_NOTE = ("\n\n> ⚠️ Low-confidence answer: no model returned a complete result, so this answer "
+                       "was not cached. Asking again retries it.")
+
+
+# Counts the get_response calls each thread actually ran. Streamlit runs a script (and any
+# st.cache_data computation) in the session's thread, so an unchanged count means a cache hit
+_computed = threading.local()
+
+
+def computed_answers() -> int:
+    """Number of get_response calls that ran in this thread rather than being served by st.cache_data."""
+    return getattr(_computed, 'count', 0)
+
+
+class UncachedAnswer(Exception):
+    """
+    An answer that must not be cached (an error or a low-confidence answer).
+
+    Raised out of get_response so st.cache_data does not keep it; callers show
+    .response instead.
+    """
+
+    def __init__(self, response, response_time):
+        super().__init__(response)
+        self.response = response
+        self.response_time = response_time
 
 @st.cache_resource
-def get_llm():
+def get_llm(deployment=OPENAI_MODEL):
     """
-    Initialize and cache the LLM instance.
+    Initialize and cache the LLM instance of a deployment.
     
+    Args:
+        deployment (str): Azure OpenAI deployment (one of MODEL_TIERS)
+        
     Returns:
         AzureChatOpenAI: Configured Azure OpenAI LLM instance
     """
+    # Imported here so startup does not pay for langchain_openai until an LLM is needed
+    from langchain_openai import AzureChatOpenAI
+    trace = get_trace()
     return AzureChatOpenAI(
         azure_endpoint=OPENAI_API_BASE,
-        azure_deployment=OPENAI_MODEL,
+        azure_deployment=deployment,
         api_version="2024-12-01-preview",
         api_key=OPENAI_API_KEY,  # type: ignore
+        # Chat completions are recorded or replayed when AGENT_TRACE_MODE is set
+        http_client=trace.http_client() if trace is not None else None,
     )
 
 @st.cache_resource
-def setup_agent(_llm):
+def get_database():
+    """
+    Create and cache the database connection shared by the agent and direct queries.
+
+    Returns:
+        SQLDatabase: Database connection
+    """
+    return create_sql_database()
+
+@st.cache_resource
+def setup_agent(_llm, deployment=OPENAI_MODEL):
     """
-    Set up and cache the SQL agent.
+    Set up and cache the SQL agent of a model tier.
     
     Args:
         _llm (ChatOpenAI): LLM instance
+        deployment (str): Deployment of _llm; the agent is cached per deployment
         
     Returns:
         Agent: Configured SQL agent
     """
-    db = create_sql_database()
-    return create_sql_agent(_llm, db=db, agent_type="openai-tools", verbose=True, top_k=600)
+    from langchain_community.agent_toolkits import create_sql_agent
+    from models.tools import (CompactSQLDatabaseToolkit, create_concurrent_events_tool, create_event_query_tool,
+                              create_return_level_tool, create_submit_events_tool, finish_on_submit)
 
-@st.cache_data(show_spinner=False)
-def get_response(question, _agent_executor, prompt):
+    db = get_database()
+    # Large results can only be summarized behind a handle when submit_events
+    # is available to return them in full
+    toolkit = CompactSQLDatabaseToolkit(db=db, llm=_llm, allow_handle=STRUCTURED_OUTPUT_ENABLED)
+    tools = [create_event_query_tool(db, allow_handle=STRUCTURED_OUTPUT_ENABLED),
+             create_concurrent_events_tool(db, allow_handle=STRUCTURED_OUTPUT_ENABLED),
+             create_return_level_tool(db)]
+    if STRUCTURED_OUTPUT_ENABLED:
+        tools.append(create_submit_events_tool())
+    agent_executor = create_sql_agent(
+        _llm,
+        toolkit=toolkit,
+        agent_type="openai-tools",
+        verbose=True,
+        top_k=EVENT_QUERY_MAX_ROWS,
+        extra_tools=tools,
+        # Intermediate steps are needed to capture reusable query plans
+        agent_executor_kwargs={"return_intermediate_steps": True},
+    )
+    # An accepted submit_events call ends the run; rejected ones go back to the model
+    return finish_on_submit(agent_executor) if STRUCTURED_OUTPUT_ENABLED else agent_executor
+
+def add_local_insights(response, question):
+    """
+    Replace the Technical Insights of an event answer with locally computed ones.
+    
+    Statistics come from utils.analytics; in 'llm' mode a short LLM call only
+    phrases the fact sheet, otherwise templates are used without an LLM ('agent'
+    mode reaches here only for answers that did not come from the agent).
+    
+    Args:
+        response (str): Answer containing the events JSON
+        question (str): The question, for phrasing context
+        
+    Returns:
+        str: Response with the Technical Insights section replaced
+    """
+    is_temp_data, df, _ = parse_temperature_json(response)
+    if not is_temp_data or df is None:
+        return response
+    with STAGE_LATENCY.time(stage='insights'):
+        facts = compute_event_facts(df)
+        if INSIGHTS_MODE != 'llm':
+            insights = template_insights(facts)
+        else:
+            LLM_CALLS.inc(purpose='insights')
+            # Phrasing a fact sheet is a simple task: use the smallest tier
+            insights = phrase_insights(facts, get_llm(MODEL_TIERS[0]), question)
+    return replace_insights(response, insights)
+
+def submitted_events(intermediate_steps):
+    """Arguments of the agent's last submit_events call, if any."""
+    for action, _ in reversed(intermediate_steps or []):
+        if getattr(action, 'tool', None) == 'submit_events':
+            return action.tool_input
+    return None
+
+@lru_cache(maxsize=None)
+def llm_call_counter():
+    """
+    Callback handler counting the agent's chat completion calls in the metrics.
+    
+    Built lazily so langchain_core is not imported at startup.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMCallCounter(BaseCallbackHandler):
+        def on_llm_start(self, serialized, prompts, **kwargs):
+            LLM_CALLS.inc(purpose='agent')
+
+        def on_chat_model_start(self, serialized, messages, **kwargs):
+            LLM_CALLS.inc(purpose='agent')
+
+    return LLMCallCounter()
+
+@st.cache_data(show_spinner=False, max_entries=RESPONSE_CACHE_MAX_ENTRIES)
+def get_response(question, prompt, generation='0'):
     """
     Get a response to a question, with caching.
     
+    The SQL agent (and its database reflection) is only built when a question
+    is not answered from a cache or a stored query plan.
+    
     Args:
         question (str): The question to ask
-        _agent_executor (Agent): The agent to use
         prompt (str): The prompt template
+        generation (str): Generation of the 'answer' cache namespace; passing it keeps this
+            process-level cache from serving answers from before an event table update
         
     Returns:
         tuple: (response, response_time, visualization_code)
+
+    Raises:
+        UncachedAnswer: For errors and low-confidence answers, which are not cached
     """
-    if question in st.session_state.qa_cache:
-        return st.session_state.qa_cache[question], 0, None
+    _computed.count = computed_answers() + 1
+    try:
+        with QUESTIONS_IN_FLIGHT.track_in_progress(), STAGE_LATENCY.time(stage='answer'):
+            return _answer_question(question, prompt, generation)
+    finally:
+        flush_trace()
+
+def with_region_context(question, intent):
+    """Append neighbouring regions resolved from the region graph, so the agent does not guess them."""
+    if not intent.get('neighbor_ids'):
+        return question
+    named = intent['region_ids'][:len(intent['region_ids']) - len(intent['neighbor_ids'])]
+    def describe(ids):
+        return ', '.join(f"{rid} ({STRING_ID_TO_SUBNAME.get(rid, rid)})" for rid in ids)
+    return (f"{question}\n(Neighbouring regions of {describe(named)} from the NERC region map: "
+            f"{describe(intent['neighbor_ids'])}. Query region_ids {intent['region_ids']}.)")
+
+def _answer_question(question, prompt, generation='0'):
+    """Answer from the session cache, shared cache, a stored plan or the agent (in that order)."""
+    # Session answers are keyed by the 'answer' generation, so none survives an event table update
+    session_key = (generation, question)
+    in_session = session_key in st.session_state.qa_cache
+    record_cache('session_answer', in_session)
+    if in_session:
+        QUESTIONS.inc(path='session_cache')
+        response, viz_code = st.session_state.qa_cache[session_key]
+        return response, 0, viz_code
+
+    # Answers shared across app replicas through the configured cache backend
+    answer_key = f"{' '.join(question.lower().split())}|{INSIGHTS_MODE}|{prompt}"
+    shared = cache_get('answer', answer_key)
+    if shared is not None:
+        QUESTIONS.inc(path='shared_cache')
+        st.session_state.qa_cache[session_key] = (shared, None)
+        return shared, 0, None
     
     start_time = time.time()
+    intent = parse_intent(question)
+
+    # Simultaneity questions are answered from the in-memory interval index
+    if intent['exact'] and intent['kind'] in ('concurrent', 'active'):
+        try:
+            with STAGE_LATENCY.time(stage='intervals'):
+                events = answer_from_intervals(intent, get_database()._engine)
+        except Exception:
+            events = None
+        if events is not None:
+            QUESTIONS.inc(path='intervals')
+            # No agent runs on this path, so insights are always computed locally
+            response = add_local_insights(build_event_response(events, []), question)
+            st.session_state.qa_cache[session_key] = (response, None)
+            cache_set('answer', answer_key, response)
+            return response, time.time() - start_time, None
+
+    # "1-in-N year" questions are answered from the cached extreme-value fits
+    if intent['exact'] and intent['kind'] == 'return_level':
+        try:
+            with STAGE_LATENCY.time(stage='extremes'):
+                levels = return_levels(get_database()._engine, intent['event_type'],
+                                       [intent['return_period']] if intent['return_period'] else DEFAULT_RETURN_PERIODS,
+                                       intent['region_ids'] or None)
+        except Exception:
+            levels = None
+        if levels:
+            QUESTIONS.inc(path='extremes')
+            response = build_event_response(levels, return_level_insights(levels))
+            st.session_state.qa_cache[session_key] = (response, None)
+            cache_set('answer', answer_key, response)
+            return response, time.time() - start_time, None
+
+    # Answer directly from a stored query plan when the question's shape is known
+    if QUERY_MEMORY_ENABLED and intent['exact']:
+        try:
+            with STAGE_LATENCY.time(stage='query_plan'):
+                events = answer_from_memory(intent, get_database()._engine)
+        except Exception:
+            events = None
+        record_cache('query_plan', events is not None)
+        if events is not None:
+            QUESTIONS.inc(path='query_plan')
+            # No agent runs on this path, so insights are always computed locally
+            response = add_local_insights(build_event_response(events, []), question)
+            st.session_state.qa_cache[session_key] = (response, None)
+            cache_set('answer', answer_key, response)
+            return response, time.time() - start_time, None
     
-    # Use the synchronous invoke method instead of async
+    # Run the agent on the routed model tier, escalating to larger tiers on failure or low confidence
+    instruction = INSIGHT_INSTRUCTIONS['agent' if INSIGHTS_MODE == 'agent' else 'local']
+    result, error, success = None, None, False
+    for deployment in route(intent, question):
+        tier_start = time.time()
+        try:
+            agent_executor = setup_agent(get_llm(deployment), deployment)
+            with STAGE_LATENCY.time(stage='agent'), MODEL_LATENCY.time(tier=deployment):
+                attempt = agent_executor.invoke(prompt.format(question=with_region_context(question, intent),
+                                                              insights_instruction=instruction),
+                                                config={'callbacks': [llm_call_counter()]})
+        except Exception as e:
+            attempt, error = None, e
+        success = attempt is not None and confident(attempt['output'], intent)
+        # A low-confidence answer is kept in case no larger tier does better
+        result = attempt if attempt is not None else result
+        MODEL_ANSWERS.inc(tier=deployment, outcome='success' if success else 'error' if attempt is None else 'low_confidence')
+        try:
+            record_outcome(intent, question, deployment, success, time.time() - tier_start)
+        except Exception:
+            pass
+        if success:
+            break
+
     try:
-        result = _agent_executor.invoke(prompt.format(question=question))
+        if result is None:
+            raise error
         response = result['output']
+        if INSIGHTS_MODE != 'agent':
+            response = add_local_insights(response, question)
     except Exception as e:
         # show error and fallback message
         st.error(f"Error getting response: {e}")
-        response = "I'm sorry, I encountered an error while processing your question. Please try again."
+        QUESTIONS.inc(path='error')
+        raise UncachedAnswer("I'm sorry, I encountered an error while processing your question. Please try again.",
+                             time.time() - start_time)
+
+    # Only an answer the last tier tried was confident in is cached, recorded and reused
+    if not success:
+        QUESTIONS.inc(path='low_confidence')
+        raise UncachedAnswer(response + LOW_CONFIDENCE_NOTE, time.time() - start_time)
+
+    QUESTIONS.inc(path='agent')
+    cache_set('answer', answer_key, response)
+    record_answer(question, result['output'], response, submitted_events(result.get('intermediate_steps')))
+
+    # Store the query plan of a successful event answer for reuse
+    if QUERY_MEMORY_ENABLED and intent['exact']:
+        data = extract_json_from_response(response)
+        if isinstance(data, dict) and data.get('data'):
+            try:
+                remember_plan(intent, result.get('intermediate_steps'), question)
+            except Exception:
+                pass
     
     end_time = time.time()
     response_time = end_time - start_time
@@ -71,6 +349,6 @@ def get_response(question, _agent_executor, prompt):
     viz_code = None
     
     # Cache the new response
-    st.session_state.qa_cache[question] = (response, viz_code)
+    st.session_state.qa_cache[session_key] = (response, viz_code)
     
-    return response, response_time, viz_code
\ No newline at end of file
+    return response, response_time, viz_code
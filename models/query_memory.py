@@ -0,0 +1,310 @@
+"""
+Question-to-SQL plan memory.
+
+When the agent answers an event question correctly, the SQL (or get_events
+call) it used is captured from the agent trace, its slot values (regions,
+N, years) are replaced with placeholders, and the result is stored under the
+question's intent shape. A later question with the same shape is answered by
+binding its own slot values into the stored plan and executing it directly,
+without any LLM turns.
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.agent_trace import traced_sql
+from utils.database import query_events, records_from_rows
+from utils.intent import intent_shape
+from utils.metrics import SQL_LATENCY, SQL_QUERIES
+from utils.regions import resolve_region_ids
+from config.config import QUERY_MEMORY_PATH, EVENT_QUERY_MAX_ROWS
+
+PLAN_SQL = 'sql'
+PLAN_TOOL = 'get_events'
+SQL_QUERY_TOOL = 'sql_db_query'
+# Region filters whose values are slots: "NERC_ID = '17'" or "h.NERC_ID IN (17, '18')"
+REGION_FILTER = re.compile(r"""\bNERC_ID["`\]]?\s*(?:=\s*(['"]?[\w.-]+['"]?)|IN\s*\(([^)]*)\))""", re.IGNORECASE)
+# One (optionally quoted) value of a region filter
+REGION_VALUE = re.compile(r"""(['"]?)([\w.-]+)\1""")
+
+
+def slot_values(intent: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Placeholder values for an intent.
+
+    Year slots come with +/-1 variants because "after 2000" may be written as
+    "> 2000" or ">= '2001-01-01'" depending on how the agent phrased the SQL.
+    """
+    values: Dict[str, Any] = {f'region_{i}': rid for i, rid in enumerate(intent['region_ids'])}
+    if intent['n'] is not None:
+        values['n'] = intent['n']
+    start, end = intent['start_year'], intent['end_year']
+    if start is not None and start == end:
+        values.update(year=start, year_m1=start - 1, year_p1=start + 1)
+    else:
+        if start is not None:
+            values.update(start_year=start, start_year_m1=start - 1)
+        if end is not None:
+            values.update(end_year=end, end_year_p1=end + 1)
+    return values
+
+
+def templatize_sql(sql: str, intent: Dict[str, Any]) -> Optional[str]:
+    """
+    Replace the intent's slot values in a SQL statement with placeholders.
+
+    Returns:
+        str | None: Template for str.format, or None if a slot value does not
+        appear in the SQL (the query would not generalize) or is ambiguous
+    """
+    values = slot_values(intent)
+    template = sql.replace('{', '{{').replace('}', '}}')
+
+    if 'n' in values:
+        template, count = re.subn(rf"(\bLIMIT\s+){values['n']}\b", r'\g<1>{n}', template, flags=re.IGNORECASE)
+        if count != 1:
+            return None
+
+    # Region IDs are only replaced inside NERC_ID filters, so equal literals elsewhere
+    # (e.g. the 1 of ROUND(temperature, 1)) stay as they are
+    region_slots = {str(values[k]): k for k in values if k.startswith('region_')}
+    found = set()
+
+    def replace_value(match):
+        slot = region_slots.get(match.group(2))
+        if slot is None:
+            return match.group(0)
+        found.add(slot)
+        return f"{match.group(1)}{{{slot}}}{match.group(1)}"
+
+    def replace_filter(match):
+        group = 1 if match.group(1) is not None else 2
+        start, end = match.start(group) - match.start(0), match.end(group) - match.start(0)
+        text = match.group(0)
+        return text[:start] + REGION_VALUE.sub(replace_value, text[start:end]) + text[end:]
+
+    template = REGION_FILTER.sub(replace_filter, template)
+    if len(found) != len(region_slots):
+        return None
+
+    year_groups = [('year', 'year_m1', 'year_p1'), ('start_year', 'start_year_m1'), ('end_year', 'end_year_p1')]
+    for group in year_groups:
+        if group[0] not in values:
+            continue
+        found = 0
+        for slot in group:
+            pattern = rf'(?<!\d){values[slot]}(?!\d)'
+            template, count = re.subn(pattern, f'{{{slot}}}', template)
+            found += count
+        if found == 0:
+            return None
+
+    # Round-trip check: binding the original values must reproduce the SQL
+    try:
+        if template.format(**values) != sql:
+            return None
+    except (KeyError, IndexError, ValueError):
+        return None
+    return template
+
+
+def templatize_tool_args(args: Dict[str, Any], intent: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Replace the intent's slot values in get_events arguments with '$slot' markers."""
+    template = dict(args)
+    regions = [str(r) for r in (args.get('region_ids') or [])]
+    if intent['region_ids']:
+        try:
+            if resolve_region_ids(regions) != intent['region_ids']:
+                return None
+        except ValueError:
+            return None
+        template['region_ids'] = '$regions'
+    elif regions:
+        return None
+    # A plan ranking by another column would answer a different question
+    if args.get('order_by', 'severity') != intent.get('order', 'severity'):
+        return None
+    if intent['n'] is not None:
+        if args.get('limit') != intent['n']:
+            return None
+        template['limit'] = '$n'
+    start, end = intent['start_year'], intent['end_year']
+    for key, value in (('start_year', start), ('end_year', end)):
+        if value is None:
+            continue
+        if args.get(key) != value:
+            return None
+        template[key] = '$year' if start == end else f'${key}'
+    return template
+
+
+def bind_tool_args(template: Dict[str, Any], intent: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill '$slot' markers in a get_events argument template."""
+    markers = {
+        '$regions': intent['region_ids'],
+        '$n': intent['n'],
+        '$year': intent['start_year'],
+        '$start_year': intent['start_year'],
+        '$end_year': intent['end_year'],
+    }
+    return {k: markers.get(v, v) if isinstance(v, str) else v for k, v in template.items()}
+
+
+def extract_plan(intermediate_steps, intent: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    Find the query that produced the answer in an agent trace and templatize it.
+
+    Args:
+        intermediate_steps (list): (AgentAction, observation) pairs from the agent
+        intent (dict): Parsed intent of the question
+
+    Returns:
+        tuple | None: (plan kind, template text)
+    """
+    for action, observation in reversed(intermediate_steps or []):
+        tool = getattr(action, 'tool', None)
+        if tool not in (SQL_QUERY_TOOL, PLAN_TOOL):
+            continue
+        text = str(observation)
+        if not text.strip() or text.startswith('Error') or 'Unknown NERC region' in text:
+            continue
+        tool_input = getattr(action, 'tool_input', None)
+        if tool == PLAN_TOOL:
+            if not isinstance(tool_input, dict):
+                return None
+            template = templatize_tool_args(tool_input, intent)
+            return (PLAN_TOOL, json.dumps(template)) if template else None
+        sql = tool_input.get('query') if isinstance(tool_input, dict) else tool_input
+        if not isinstance(sql, str) or not sql.lstrip().lower().startswith(('select', 'with')):
+            return None
+        template = templatize_sql(sql, intent)
+        return (PLAN_SQL, template) if template else None
+    return None
+
+
+def _connect(path: str = QUERY_MEMORY_PATH) -> sqlite3.Connection:
+    """Open the plan store, creating it if needed."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS query_plans (
+            intent_shape TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            template TEXT NOT NULL,
+            example_question TEXT,
+            created_at REAL,
+            last_used_at REAL,
+            hit_count INTEGER DEFAULT 0
+        )
+    """)
+    return conn
+
+
+def remember_plan(intent: Dict[str, Any], intermediate_steps, question: str,
+                  path: str = QUERY_MEMORY_PATH) -> bool:
+    """
+    Store the plan from a successful agent run under the question's intent shape.
+
+    Returns:
+        bool: True if a plan was stored
+    """
+    if not intent.get('exact'):
+        return False
+    plan = extract_plan(intermediate_steps, intent)
+    if plan is None:
+        return False
+    kind, template = plan
+    with _connect(path) as conn:
+        conn.execute(
+            """INSERT INTO query_plans (intent_shape, kind, template, example_question, created_at, hit_count)
+               VALUES (?, ?, ?, ?, ?, 0)
+               ON CONFLICT(intent_shape) DO UPDATE SET kind=excluded.kind, template=excluded.template,
+                   example_question=excluded.example_question""",
+            (intent_shape(intent), kind, template, question, time.time()),
+        )
+    return True
+
+
+def lookup_plan(intent: Dict[str, Any], path: str = QUERY_MEMORY_PATH) -> Optional[Dict[str, Any]]:
+    """Return the stored plan for an intent's shape, if any."""
+    if not intent.get('exact') or not os.path.exists(path):
+        return None
+    with _connect(path) as conn:
+        row = conn.execute("SELECT * FROM query_plans WHERE intent_shape = ?", (intent_shape(intent),)).fetchone()
+    return dict(row) if row else None
+
+
+def record_hit(shape: str, path: str = QUERY_MEMORY_PATH):
+    """Increment the hit count of a plan."""
+    with _connect(path) as conn:
+        conn.execute("UPDATE query_plans SET hit_count = hit_count + 1, last_used_at = ? WHERE intent_shape = ?",
+                     (time.time(), shape))
+
+
+def forget_plan(shape: str, path: str = QUERY_MEMORY_PATH):
+    """Delete a plan (e.g. after it failed to execute)."""
+    with _connect(path) as conn:
+        conn.execute("DELETE FROM query_plans WHERE intent_shape = ?", (shape,))
+
+
+def list_plans(path: str = QUERY_MEMORY_PATH) -> List[Dict[str, Any]]:
+    """List stored plans, most used first."""
+    if not os.path.exists(path):
+        return []
+    with _connect(path) as conn:
+        rows = conn.execute("SELECT * FROM query_plans ORDER BY hit_count DESC, created_at DESC").fetchall()
+    return [dict(r) for r in rows]
+
+
+def execute_plan(plan: Dict[str, Any], intent: Dict[str, Any], engine) -> Optional[List[Dict[str, Any]]]:
+    """
+    Bind an intent's slot values into a stored plan and execute it.
+
+    Returns:
+        list | None: Compact event records, or None if the plan could not be executed
+    """
+    event_type = intent['event_type']
+    if plan['kind'] == PLAN_TOOL:
+        args = bind_tool_args(json.loads(plan['template']), intent)
+        return query_events(
+            engine, args.get('event_type', event_type), args.get('region_ids'),
+            args.get('start_year'), args.get('end_year'), args.get('order_by', 'severity'),
+            limit=args.get('limit') or EVENT_QUERY_MAX_ROWS,
+        )
+    sql = plan['template'].format(**slot_values(intent))
+    return traced_sql('query_plan', sql, lambda: _run_plan_sql(engine, sql, event_type))
+
+
+def _run_plan_sql(engine, sql: str, event_type: str) -> Optional[List[Dict[str, Any]]]:
+    SQL_QUERIES.inc(source='query_plan')
+    with engine.connect() as conn, SQL_LATENCY.time(source='query_plan'):
+        result = conn.exec_driver_sql(sql)
+        return records_from_rows(list(result.keys()), result.fetchall(), event_type)
+
+
+def answer_from_memory(intent: Dict[str, Any], engine,
+                       path: str = QUERY_MEMORY_PATH) -> Optional[List[Dict[str, Any]]]:
+    """
+    Answer a question from a stored plan if one matches its intent shape.
+
+    Plans that fail to execute are forgotten so the agent re-derives them.
+
+    Returns:
+        list | None: Compact event records, or None if no plan applies
+    """
+    plan = lookup_plan(intent, path)
+    if plan is None:
+        return None
+    try:
+        records = execute_plan(plan, intent, engine)
+    except Exception:
+        records = None
+    if records is None:
+        forget_plan(plan['intent_shape'], path)
+        return None
+    record_hit(plan['intent_shape'], path)
+    return records
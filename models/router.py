@@ -0,0 +1,156 @@
+"""
+Tiered model routing for agent runs.
+
+MODEL_TIERS lists the chat deployments from smallest to largest. Each
+question is classified from its parsed intent. Simple slot-only retrievals
+start on the smallest tier and open-ended analysis starts on the largest.
+Other questions start in between, but try smaller tiers until those have a
+track record for the question's shape. Outcomes are recorded per question
+shape and tier. A shape that has succeeded reliably on a smaller tier starts
+there, and a tier that keeps failing for a shape is skipped. A run that
+fails or returns a low-confidence answer is retried on the next larger tier.
+"""
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from utils.intent import intent_shape
+from utils.response_formatter import extract_json_from_response
+from config.config import MODEL_TIERS, MODEL_ROUTER_PATH, MODEL_ROUTER_MIN_ATTEMPTS, MODEL_ROUTER_MIN_SUCCESS_RATE
+
+# Questions asking for analysis rather than retrieval go to the largest tier
+COMPLEX_PATTERN = re.compile(r"\b(?:why|explain|compare|comparison|correlat\w*|relationship|impact|cause\w*|"
+                             r"predict\w*|forecast\w*|recommend\w*|should|how does|how do|what if)\b")
+# Agent outputs that mean it gave up (iteration or time limit)
+STOPPED_MARKERS = ('Agent stopped due to',)
+
+
+def classify(intent: Dict[str, Any], question: str) -> str:
+    """
+    Complexity of a question.
+
+    Returns:
+        str: 'simple' (only recognised slots, e.g. "worst 5 heat waves in RFC"), 'complex'
+        (analysis wording, or neither an event type nor a region) or 'moderate'
+    """
+    if COMPLEX_PATTERN.search(question.lower()):
+        return 'complex'
+    if intent['event_type'] is not None and intent['exact']:
+        return 'simple'
+    if intent['event_type'] is None and not intent['region_ids']:
+        return 'complex'
+    return 'moderate'
+
+
+def route_key(intent: Dict[str, Any], question: str) -> str:
+    """Key that outcomes are recorded under: the intent shape plus the question's complexity."""
+    return f"{intent_shape(intent)}|{classify(intent, question)}"
+
+
+def _connect(path: str = MODEL_ROUTER_PATH) -> sqlite3.Connection:
+    """Open the outcome store, creating it if needed."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tier_outcomes (
+            route_key TEXT NOT NULL,
+            tier TEXT NOT NULL,
+            attempts INTEGER DEFAULT 0,
+            successes INTEGER DEFAULT 0,
+            total_seconds REAL DEFAULT 0,
+            last_used_at REAL,
+            PRIMARY KEY (route_key, tier)
+        )
+    """)
+    return conn
+
+
+def _outcomes(key: str, path: str = MODEL_ROUTER_PATH) -> Dict[str, Dict[str, Any]]:
+    """Recorded outcomes of a route key, by tier."""
+    if not os.path.exists(path):
+        return {}
+    with _connect(path) as conn:
+        rows = conn.execute("SELECT * FROM tier_outcomes WHERE route_key = ?", (key,)).fetchall()
+    return {row['tier']: dict(row) for row in rows}
+
+
+def _reliable(outcome: Optional[Dict[str, Any]]) -> Optional[bool]:
+    """True/False once a tier has enough attempts for a shape, None before that."""
+    if not outcome or outcome['attempts'] < MODEL_ROUTER_MIN_ATTEMPTS:
+        return None
+    return outcome['successes'] / outcome['attempts'] >= MODEL_ROUTER_MIN_SUCCESS_RATE
+
+
+def route(intent: Dict[str, Any], question: str, tiers: Sequence[str] = MODEL_TIERS,
+          path: str = MODEL_ROUTER_PATH) -> List[str]:
+    """
+    Deployments to try for a question, in escalation order.
+
+    Args:
+        intent (dict): Parsed intent (utils.intent.parse_intent)
+        question (str): The question
+        tiers (list): Deployments from smallest to largest
+        path (str): Outcome store
+
+    Returns:
+        list: Deployments, smallest first; always ends with the largest tier
+    """
+    tiers = list(tiers)
+    last = len(tiers) - 1
+    complexity = classify(intent, question)
+    start = {'simple': 0, 'moderate': len(tiers) // 2, 'complex': last}[complexity]
+    try:
+        outcomes = _outcomes(route_key(intent, question), path)
+    except sqlite3.Error:
+        outcomes = {}
+    # Start lower where a smaller tier has proven reliable for this kind of question. Moderate
+    # questions also try smaller tiers without a verdict yet, so their statistics accumulate
+    for i in range(start):
+        verdict = _reliable(outcomes.get(tiers[i]))
+        if verdict or (verdict is None and complexity == 'moderate'):
+            start = i
+            break
+    plan = [tier for tier in tiers[start:last] if _reliable(outcomes.get(tier)) is not False]
+    return plan + [tiers[last]]
+
+
+def confident(response: str, intent: Dict[str, Any]) -> bool:
+    """
+    Whether an agent answer can be returned without escalating.
+
+    Event questions need a parseable events JSON block; any answer needs text and must
+    not come from an agent that stopped early.
+    """
+    if not response or not response.strip() or any(marker in response for marker in STOPPED_MARKERS):
+        return False
+    if intent['event_type'] is not None:
+        data = extract_json_from_response(response)
+        return isinstance(data, dict) and isinstance(data.get('data'), list)
+    return True
+
+
+def record_outcome(intent: Dict[str, Any], question: str, tier: str, success: bool, seconds: float,
+                   path: str = MODEL_ROUTER_PATH):
+    """Add one agent run to the outcome statistics of its route key and tier."""
+    with _connect(path) as conn:
+        conn.execute(
+            """INSERT INTO tier_outcomes (route_key, tier, attempts, successes, total_seconds, last_used_at)
+               VALUES (?, ?, 1, ?, ?, ?)
+               ON CONFLICT(route_key, tier) DO UPDATE SET attempts = attempts + 1,
+                   successes = successes + excluded.successes, total_seconds = total_seconds + excluded.total_seconds,
+                   last_used_at = excluded.last_used_at""",
+            (route_key(intent, question), tier, int(success), float(seconds), time.time()),
+        )
+
+
+def list_outcomes(path: str = MODEL_ROUTER_PATH) -> List[Dict[str, Any]]:
+    """Outcome statistics per route key and tier, most attempted first."""
+    if not os.path.exists(path):
+        return []
+    with _connect(path) as conn:
+        rows = conn.execute("SELECT *, successes * 1.0 / attempts AS success_rate, total_seconds / attempts "
+                            "AS mean_seconds FROM tier_outcomes ORDER BY attempts DESC").fetchall()
+    return [dict(r) for r in rows]
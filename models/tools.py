@@ -0,0 +1,436 @@
+"""
+Structured tools exposed to the SQL agent alongside the generic SQL toolkit.
+"""
+import json
+from datetime import date
+from typing import Any, Dict, List, Literal, Optional
+
+from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from langchain_community.tools.sql_database.tool import (InfoSQLDatabaseTool, ListSQLDatabaseTool,
+                                                              QuerySQLDataBaseTool)
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentFinish
+from langchain_core.pydantic_v1 import BaseModel, Field, validator
+from langchain_core.tools import StructuredTool, ToolException
+
+from utils.agent_trace import traced_sql
+from utils.cache_backend import cache_get, cache_set
+from utils.metrics import SQL_LATENCY, SQL_QUERIES
+from utils.database import ORDERABLE_COLUMNS, query_events, records_from_rows
+from utils.extremes import DEFAULT_RETURN_PERIODS, return_levels
+from utils.intervals import CLUSTER_ORDERS, DEFAULT_CLUSTER_LIMIT, active_events, concurrent_events
+from utils.observations import format_observation, get_result, result_columns_and_rows
+from utils.regions import resolve_region_id, resolve_region_ids
+from utils.response_formatter import build_event_response
+from config.config import EVENT_QUERY_MAX_ROWS, OBSERVATION_ROW_THRESHOLD
+
+COMPACT_COLUMNS = ('DS', 'DE', 'T', 'SC', 'ID', 'Type')
+CLUSTER_COLUMNS = COMPACT_COLUMNS + ('cluster', 'cluster_start', 'cluster_end')
+
+
+class CompactQuerySQLDataBaseTool(QuerySQLDataBaseTool):
+    """sql_db_query returning compact observations instead of Python reprs."""
+    allow_handle: bool = True
+
+    def _run(self, query, run_manager=None):
+        key = f"{self.db._engine.url}|{' '.join(query.split())}"
+        result = traced_sql('agent_sql', ' '.join(query.split()), lambda: self._query(key, query))
+        if 'error' in result:
+            return f"Error: {result['error']}"
+        if result['columns'] is None:
+            return ""
+        return format_observation(result['columns'], result['rows'], allow_handle=self.allow_handle)
+
+    def _query(self, key, query):
+        """Execute (or fetch from the SQL cache) a query as {'columns', 'rows'} or {'error'}."""
+        hit = cache_get('sql', key)
+        if hit is not None:
+            return hit
+        SQL_QUERIES.inc(source='agent_sql')
+        try:
+            with SQL_LATENCY.time(source='agent_sql'):
+                result = self.db.run(query, fetch='cursor')
+                # Statements that return no rows come back as [] rather than a cursor
+                if isinstance(result, list) or not result.returns_rows:
+                    return {'columns': None, 'rows': []}
+                columns, rows = result_columns_and_rows(result)
+        except Exception as e:
+            # Any failure goes back to the model as an "Error: ..." observation
+            return {'error': str(e)}
+        cache_set('sql', key, {'columns': columns, 'rows': rows})
+        return {'columns': columns, 'rows': rows}
+
+
+class TracedInfoSQLDatabaseTool(InfoSQLDatabaseTool):
+    """sql_db_schema whose schema and sample rows are recorded/replayed with agent traces."""
+
+    def _run(self, table_names, run_manager=None):
+        return traced_sql('agent_schema', table_names, lambda: self.db.get_table_info_no_throw(
+            [t.strip() for t in table_names.split(",")]))
+
+
+class TracedListSQLDatabaseTool(ListSQLDatabaseTool):
+    """sql_db_list_tables recorded/replayed with agent traces, so replays need no database."""
+
+    def _run(self, tool_input="", run_manager=None):
+        return traced_sql('agent_tables', '', lambda: ", ".join(self.db.get_usable_table_names()))
+
+
+class CompactSQLDatabaseToolkit(SQLDatabaseToolkit):
+    """SQL toolkit whose query tool returns compact observations (schema and query results are traced)."""
+    allow_handle: bool = True
+
+    def get_tools(self):
+        tools = super().get_tools()
+        for i, tool in enumerate(tools):
+            if isinstance(tool, QuerySQLDataBaseTool):
+                tools[i] = CompactQuerySQLDataBaseTool(
+                    db=self.db, description=tool.description, allow_handle=self.allow_handle
+                )
+            elif isinstance(tool, InfoSQLDatabaseTool):
+                tools[i] = TracedInfoSQLDatabaseTool(db=self.db, description=tool.description)
+            elif isinstance(tool, ListSQLDatabaseTool):
+                tools[i] = TracedListSQLDatabaseTool(db=self.db)
+        return tools
+
+
+class EventQueryInput(BaseModel):
+    """Arguments for the get_events tool."""
+    event_type: str = Field(
+        description="'heat' for heat waves, 'cold' for cold snaps/cold waves, or 'both'"
+    )
+    region_ids: Optional[List[str]] = Field(
+        default=None,
+        description="NERC region IDs (e.g. '17') or names (e.g. 'RFC', 'PJM'); omit for all regions",
+    )
+    start_year: Optional[int] = Field(default=None, description="Earliest event start year (inclusive)")
+    end_year: Optional[int] = Field(default=None, description="Latest event start year (inclusive)")
+    order_by: str = Field(
+        default='severity',
+        description=f"One of {', '.join(ORDERABLE_COLUMNS)}. 'severity' returns the worst events first "
+                    "(hottest heat waves, coldest cold snaps)",
+    )
+    limit: int = Field(
+        default=EVENT_QUERY_MAX_ROWS,
+        description=f"Maximum number of events per event type (at most {EVENT_QUERY_MAX_ROWS})",
+    )
+
+
+def create_event_query_tool(db, allow_handle=False):
+    """
+    Create the typed get_events tool backed by prepared queries.
+
+    Args:
+        db (SQLDatabase): Database the agent is connected to
+        allow_handle (bool): Summarize large results behind a result handle
+            for submit_events instead of returning every row
+
+    Returns:
+        StructuredTool: Tool returning events as compact DS/DE/T/SC/ID/Type JSON
+    """
+    engine = db._engine
+
+    def get_events(event_type, region_ids=None, start_year=None, end_year=None,
+                   order_by='severity', limit=EVENT_QUERY_MAX_ROWS):
+        event_type = str(event_type).strip().lower()
+        if event_type not in ('heat', 'cold', 'both'):
+            raise ToolException("event_type must be 'heat', 'cold' or 'both'")
+        try:
+            ids = resolve_region_ids(region_ids) if region_ids else None
+            records = query_events(engine, event_type, ids, start_year, end_year, order_by, limit=limit)
+        except (ValueError, KeyError) as e:
+            raise ToolException(str(e))
+        if allow_handle and len(records) > OBSERVATION_ROW_THRESHOLD:
+            rows = [tuple(r[c] for c in COMPACT_COLUMNS) for r in records]
+            return format_observation(COMPACT_COLUMNS, rows, records)
+        return json.dumps({"data": records}, separators=(',', ':'))
+
+    return StructuredTool.from_function(
+        func=get_events,
+        name="get_events",
+        description=(
+            "Fetch heat wave or cold snap events from heat_wave_metadata/cold_wave_metadata, "
+            "filtered by NERC region and start year and sorted by severity or a column. "
+            "Returns JSON {\"data\": [{\"DS\", \"DE\", \"T\", \"SC\", \"ID\", \"Type\"}]} ready to use "
+            "in the answer. Prefer this over writing SQL for event lookups."
+        ),
+        args_schema=EventQueryInput,
+        handle_tool_error=True,
+    )
+
+
+class ConcurrentEventsInput(BaseModel):
+    """Arguments for the get_concurrent_events tool."""
+    event_type: str = Field(
+        description="'heat' for heat waves, 'cold' for cold snaps/cold waves, or 'both'"
+    )
+    region_ids: Optional[List[str]] = Field(
+        default=None,
+        description="NERC region IDs or names to consider; omit for all regions",
+    )
+    active_on: Optional[str] = Field(
+        default=None,
+        description="YYYY-MM-DD: return the events active on this day instead of clusters",
+    )
+    active_until: Optional[str] = Field(
+        default=None,
+        description="YYYY-MM-DD: with active_on, return the events overlapping active_on..active_until",
+    )
+    min_regions: Optional[int] = Field(
+        default=None,
+        description="Minimum distinct regions per cluster (default: every given region, or 2)",
+    )
+    start_year: Optional[int] = Field(default=None, description="Earliest event start year (inclusive)")
+    end_year: Optional[int] = Field(default=None, description="Latest event start year (inclusive)")
+    order_by: str = Field(
+        default='regions',
+        description=f"Cluster order, one of {', '.join(CLUSTER_ORDERS)}. 'regions' puts clusters spanning "
+                    "the most regions first, then the most severe",
+    )
+    limit: int = Field(default=DEFAULT_CLUSTER_LIMIT, description="Maximum number of clusters per event type")
+
+
+def create_concurrent_events_tool(db, allow_handle=False):
+    """
+    Create the get_concurrent_events tool backed by the in-memory interval index.
+
+    Args:
+        db (SQLDatabase): Database the agent is connected to
+        allow_handle (bool): Summarize large results behind a result handle
+
+    Returns:
+        StructuredTool: Tool returning co-occurring events as DS/DE/T/SC/ID/Type/cluster JSON with
+            each cluster's common window
+    """
+    engine = db._engine
+
+    def get_concurrent_events(event_type, region_ids=None, active_on=None, active_until=None, min_regions=None,
+                              start_year=None, end_year=None, order_by='regions', limit=DEFAULT_CLUSTER_LIMIT):
+        try:
+            ids = resolve_region_ids(region_ids) if region_ids else None
+            if active_on:
+                records = active_events(engine, event_type, active_on, active_until, ids)
+            else:
+                records = concurrent_events(engine, event_type, ids, min_regions, start_year, end_year,
+                                            order_by, limit)
+        except (ValueError, KeyError) as e:
+            raise ToolException(str(e))
+        if allow_handle and len(records) > OBSERVATION_ROW_THRESHOLD:
+            columns = CLUSTER_COLUMNS if not active_on else COMPACT_COLUMNS
+            rows = [tuple(r.get(c) for c in columns) for r in records]
+            return format_observation(columns, rows, records)
+        return json.dumps({"data": records}, separators=(',', ':'))
+
+    return StructuredTool.from_function(
+        func=get_concurrent_events,
+        name="get_concurrent_events",
+        description=(
+            "Find heat waves or cold snaps that happened at the same time in several NERC regions "
+            "(co-occurrence clusters of events all active during the window cluster_start..cluster_end, "
+            "numbered in 'cluster'), or the events active on a date (active_on). Returns JSON {\"data\": "
+            "[{\"DS\", \"DE\", \"T\", \"SC\", \"ID\", \"Type\", \"cluster\", \"cluster_start\", \"cluster_end\"}]}. "
+            "Use this instead of self-joining event tables on date ranges."
+        ),
+        args_schema=ConcurrentEventsInput,
+        handle_tool_error=True,
+    )
+
+
+class ReturnLevelInput(BaseModel):
+    """Arguments for the get_return_levels tool."""
+    event_type: str = Field(
+        description="'heat' for heat waves, 'cold' for cold snaps/cold waves, or 'both'"
+    )
+    return_periods: List[int] = Field(
+        default=list(DEFAULT_RETURN_PERIODS),
+        description="Return periods in years, e.g. [50] for a 1-in-50 year event",
+    )
+    region_ids: Optional[List[str]] = Field(
+        default=None,
+        description="NERC region IDs or names; omit for all regions",
+    )
+
+
+def create_return_level_tool(db):
+    """
+    Create the get_return_levels tool backed by cached extreme-value fits.
+
+    Args:
+        db (SQLDatabase): Database the agent is connected to
+
+    Returns:
+        StructuredTool: Tool returning "1-in-N year" levels per region as JSON
+    """
+    engine = db._engine
+
+    def get_return_levels(event_type, return_periods=DEFAULT_RETURN_PERIODS, region_ids=None):
+        try:
+            ids = resolve_region_ids(region_ids) if region_ids else None
+            records = return_levels(engine, str(event_type).strip().lower(), return_periods, ids)
+        except (ValueError, KeyError) as e:
+            raise ToolException(str(e))
+        return json.dumps({"data": records}, separators=(',', ':'))
+
+    return StructuredTool.from_function(
+        func=get_return_levels,
+        name="get_return_levels",
+        description=(
+            "Return levels (\"1-in-N year\" event severity) per NERC region from extreme-value fits to the "
+            "event tables: temperature T (°F), spatial coverage SC (%) and duration (days) expected to be "
+            "exceeded once in N years. Returns JSON {\"data\": [{\"ID\", \"Type\", \"return_period\", "
+            "\"T\", \"SC\", \"duration\", \"fit_years\"}]}; put these records in the answer unchanged."
+        ),
+        args_schema=ReturnLevelInput,
+        handle_tool_error=True,
+    )
+
+
+def _known_region(cls, value):
+    rid = resolve_region_id(value)
+    if rid is None:
+        raise ValueError(f"unknown NERC region '{value}'")
+    return rid
+
+
+def _normalize_type(cls, value):
+    return str(value).strip().lower()
+
+
+class EventRecord(BaseModel):
+    """A heat wave or cold snap event in the compact response shape."""
+    DS: date = Field(description="Event start date (YYYY-MM-DD)")
+    DE: date = Field(description="Event end date (YYYY-MM-DD)")
+    T: float = Field(description="Event temperature in °F")
+    SC: float = Field(description="Spatial coverage in %")
+    ID: str = Field(description="NERC region ID, e.g. '17'")
+    Type: Literal['heat', 'cold'] = Field(description="'heat' or 'cold'")
+    cluster: Optional[int] = Field(default=None, description="Co-occurrence cluster number from get_concurrent_events")
+    cluster_start: Optional[date] = Field(default=None, description="First day all events of the cluster are active")
+    cluster_end: Optional[date] = Field(default=None, description="Last day all events of the cluster are active")
+
+    _known_region = validator('ID', pre=True, allow_reuse=True)(_known_region)
+    _normalize_type = validator('Type', pre=True, allow_reuse=True)(_normalize_type)
+
+
+class ReturnLevelRecord(BaseModel):
+    """A "1-in-N year" level of a region, as returned by get_return_levels."""
+    ID: str = Field(description="NERC region ID, e.g. '17'")
+    Type: Literal['heat', 'cold'] = Field(description="'heat' or 'cold'")
+    return_period: int = Field(description="Return period in years")
+    T: Optional[float] = Field(description="Return-level temperature in °F")
+    SC: Optional[float] = Field(default=None, description="Return-level spatial coverage in %")
+    duration: Optional[float] = Field(default=None, description="Return-level duration in days")
+    fit_years: Optional[int] = Field(default=None, description="Years with events behind the fit")
+
+    _known_region = validator('ID', pre=True, allow_reuse=True)(_known_region)
+    _normalize_type = validator('Type', pre=True, allow_reuse=True)(_normalize_type)
+
+
+class SubmitEventsInput(BaseModel):
+    """Arguments for the submit_events tool."""
+    data: List[EventRecord] = Field(
+        default_factory=list,
+        description="Every event record of the answer; never truncate. Leave empty when using result_handle",
+    )
+    return_levels: List[ReturnLevelRecord] = Field(
+        default_factory=list,
+        description="Return-level records from get_return_levels, unchanged, for \"1-in-N year\" questions "
+                    "(instead of data)",
+    )
+    result_handle: Optional[str] = Field(
+        default=None,
+        description="Handle of a stored query result (from a summarized observation) to return in full",
+    )
+    event_type: Optional[Literal['heat', 'cold']] = Field(
+        default=None,
+        description="Event type of the rows behind result_handle, if the result has no type column",
+    )
+    insights: List[str] = Field(
+        description="At least three technical insights (temperature trends, spatial coverage changes, "
+                    "event frequency), one per item, without numbering"
+    )
+
+
+def event_record_to_dict(record) -> Dict[str, Any]:
+    """Convert a validated EventRecord to a JSON-ready compact record."""
+    values = record.dict(exclude_none=True) if isinstance(record, BaseModel) else dict(record)
+    for key in ('DS', 'DE', 'cluster_start', 'cluster_end'):
+        if isinstance(values.get(key), date):
+            values[key] = values[key].isoformat()
+    return values
+
+
+def validate_event_payload(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Validate a structured event payload ({"data": [...]}) into typed records.
+
+    Raises:
+        ValidationError: If any record does not match the EventRecord schema
+    """
+    return [event_record_to_dict(EventRecord.parse_obj(r)) for r in payload.get('data', [])]
+
+
+class SubmittedAnswer(str):
+    """Final response rendered by an accepted submit_events call."""
+
+
+class SubmitEventsAgentExecutor(AgentExecutor):
+    """AgentExecutor that ends the run with the response of an accepted submit_events call."""
+
+    def _get_tool_return(self, next_step_output):
+        _, observation = next_step_output
+        if isinstance(observation, SubmittedAnswer):
+            return_value_key = self.agent.return_values[0] if self.agent.return_values else 'output'
+            return AgentFinish({return_value_key: str(observation)}, "")
+        return super()._get_tool_return(next_step_output)
+
+
+def finish_on_submit(agent_executor):
+    """Copy of an AgentExecutor that returns accepted submit_events responses directly."""
+    return SubmitEventsAgentExecutor(**dict(agent_executor))
+
+
+def create_submit_events_tool():
+    """
+    Create the submit_events tool used to return answers via function calling.
+
+    The event list arrives as schema-validated tool arguments instead of
+    free-text JSON. The tool is not return_direct: validation and result
+    handle errors go back to the model as observations so it can call the
+    tool again, and only an accepted submission ends the run (see
+    SubmitEventsAgentExecutor), so the response always contains well-formed JSON.
+
+    Returns:
+        StructuredTool: Tool producing the final JSON + Technical Insights response
+    """
+    def submit_events(data=(), insights=(), result_handle=None, event_type=None, return_levels=()):
+        if return_levels:
+            if data or result_handle:
+                raise ToolException("Submit either event records (data/result_handle) or return_levels, not both.")
+            levels = [r.dict() if isinstance(r, BaseModel) else dict(r) for r in return_levels]
+            return SubmittedAnswer(build_event_response(levels, list(insights)))
+        records = [event_record_to_dict(r) for r in data]
+        if result_handle:
+            stored = get_result(result_handle)
+            if stored is None:
+                raise ToolException(f"Unknown or expired result_handle '{result_handle}'. Re-run the query.")
+            stored_records = stored['records'] or records_from_rows(stored['columns'], stored['rows'], event_type)
+            if stored_records is None:
+                raise ToolException("The stored result has no start_date/end_date/temperature/"
+                                    "spatial_coverage/NERC_ID columns; query those columns and retry.")
+            if any(r['Type'] is None for r in stored_records):
+                raise ToolException("Pass event_type ('heat' or 'cold') for this result_handle.")
+            records = stored_records + records
+        return SubmittedAnswer(build_event_response(records, list(insights)))
+
+    return StructuredTool.from_function(
+        func=submit_events,
+        name="submit_events",
+        description=(
+            "Submit the final answer: every event record (or the return levels) plus technical insights. "
+            "Call this exactly once, as the last step, instead of writing JSON in a message."
+        ),
+        args_schema=SubmitEventsInput,
+        handle_tool_error=True,
+        handle_validation_error=lambda e: f"Invalid submit_events arguments: {e}. Fix the records and call submit_events again.",
+    )
@@ -0,0 +1,38 @@
+"""Co-occurrence clusters of the interval index."""
+import numpy as np
+
+from utils.intervals import EventIntervalIndex
+
+
+def _index(events):
+    starts, ends, regions = zip(*events)
+    return EventIntervalIndex('heat', starts, ends, [100.0] * len(events), [50.0] * len(events), regions)
+
+
+def _clusters(index, min_regions):
+    positions, cluster, (first, last) = index.clusters(min_regions=min_regions)
+    clusters = {}
+    for position, number in zip(positions.tolist(), cluster.tolist()):
+        clusters.setdefault(number, set()).add(index.region_ids[position])
+    windows = np.datetime_as_string(np.c_[first, last].astype('datetime64[D]')).tolist()
+    return [sorted(clusters[number]) for number in sorted(clusters)], windows
+
+
+def test_overlap_chain_is_not_one_cluster():
+    # A overlaps B and B overlaps C, but A and C are never active together
+    index = _index([('2020-07-01', '2020-07-06', 'A'), ('2020-07-05', '2020-07-10', 'B'),
+                    ('2020-07-09', '2020-07-14', 'C')])
+    assert _clusters(index, 3) == ([], [])
+    assert _clusters(index, 2) == ([['A', 'B'], ['B', 'C']],
+                                   [['2020-07-05', '2020-07-06'], ['2020-07-09', '2020-07-10']])
+
+
+def test_cluster_span_is_common_window():
+    index = _index([('2020-07-01', '2020-07-30', 'A'), ('2020-07-05', '2020-07-20', 'B'),
+                    ('2020-07-10', '2020-07-15', 'C'), ('2020-08-01', '2020-08-03', 'A')])
+    assert _clusters(index, 2) == ([['A', 'B', 'C']], [['2020-07-10', '2020-07-15']])
+
+
+def test_adjacent_events_do_not_overlap():
+    index = _index([('2020-07-01', '2020-07-04', 'A'), ('2020-07-05', '2020-07-08', 'B')])
+    assert _clusters(index, 2) == ([], [])
@@ -0,0 +1,43 @@
+"""Templatizing agent SQL into reusable query plans."""
+from models.query_memory import templatize_sql
+from utils.intent import intent_shape, parse_intent
+
+
+def _intent(region_ids, n=None):
+    return {'region_ids': region_ids, 'n': n, 'start_year': None, 'end_year': None}
+
+
+def test_region_literal_outside_nerc_filter_is_kept():
+    sql = ("SELECT start_date, ROUND(temperature, 1) AS temperature FROM heat_wave_metadata "
+           "WHERE NERC_ID = 1 ORDER BY temperature DESC LIMIT 5")
+    template = templatize_sql(sql, _intent(['1'], n=5))
+    assert template == ("SELECT start_date, ROUND(temperature, 1) AS temperature FROM heat_wave_metadata "
+                        "WHERE NERC_ID = {region_0} ORDER BY temperature DESC LIMIT {n}")
+    assert template.format(region_0='17', n=3).count('ROUND(temperature, 1)') == 1
+
+
+def test_in_list_and_quoted_values():
+    sql = "SELECT * FROM cold_wave_metadata WHERE h.nerc_id IN ('17', 18) AND spatial_coverage > '17'"
+    assert templatize_sql(sql, _intent(['17', '18'])) == (
+        "SELECT * FROM cold_wave_metadata WHERE h.nerc_id IN ('{region_0}', {region_1}) AND spatial_coverage > '17'")
+
+
+def test_region_missing_from_filters_is_not_templatized():
+    sql = "SELECT * FROM heat_wave_metadata WHERE spatial_coverage > 17"
+    assert templatize_sql(sql, _intent(['17'])) is None
+
+
+def test_coverage_ranking_has_its_own_shape():
+    coverage = parse_intent("Top 5 heat waves with the most spatial coverage in RFC")
+    severity = parse_intent("Top 5 heat waves in ERCOT")
+    assert coverage['exact'] and severity['exact']
+    assert coverage['order'] == 'spatial_coverage' and severity['order'] == 'severity'
+    assert intent_shape(coverage) != intent_shape(severity)
+
+
+def test_single_worst_event_is_not_the_plural_shape():
+    single = parse_intent("worst heat wave in RFC")
+    plural = parse_intent("worst heat waves in RFC")
+    assert single['n'] == 1 and plural['n'] is None
+    assert intent_shape(single) != intent_shape(plural)
+    assert intent_shape(single) == intent_shape(parse_intent("worst 5 heat waves in ERCOT"))
@@ -0,0 +1,25 @@
+"""Local follow-up refinement of a previous answer."""
+import pandas as pd
+
+from utils.refinement import apply_followup, parse_followup
+
+
+def _events(n):
+    return pd.DataFrame({
+        'start_date': [f'{2000 + i}-07-01' for i in range(n)],
+        'end_date': [f'{2000 + i}-07-04' for i in range(n)],
+        'temperature': [100.0 + i for i in range(n)],
+        'spatial_coverage': [50.0] * n,
+        'NERC_ID': ['17'] * n,
+        'event_type': ['heat'] * n,
+    })
+
+
+def test_limit_within_previous_result_is_answered_locally():
+    refined = apply_followup(_events(5), parse_followup("top 3"))
+    assert refined['temperature'].tolist() == [104.0, 103.0, 102.0]
+
+
+def test_limit_beyond_previous_result_goes_to_the_agent():
+    assert parse_followup("top 10")['limit'] == 10
+    assert apply_followup(_events(5), parse_followup("top 10")) is None
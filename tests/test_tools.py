@@ -0,0 +1,31 @@
+"""Structured tools of the SQL agent."""
+import json
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine, text
+
+from models.tools import SubmittedAnswer, create_return_level_tool, create_submit_events_tool
+from utils.response_formatter import extract_json_from_response
+
+
+def _heat_wave_database(path):
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE heat_wave_metadata (event_ID INTEGER PRIMARY KEY, start_date DATE, "
+                          "end_date DATE, temperature REAL, duration INTEGER, NERC_ID INTEGER, spatial_coverage REAL)"))
+        for year in range(1990, 2010):
+            conn.execute(text("INSERT INTO heat_wave_metadata (start_date, end_date, temperature, duration, NERC_ID, "
+                              "spatial_coverage) VALUES (:s, :e, :t, 4, 17, :c)"),
+                         {'s': f'{year}-07-01', 'e': f'{year}-07-04', 't': 95 + (year * 7) % 11, 'c': 20 + year % 13})
+    return engine
+
+
+def test_submit_events_accepts_return_levels(tmp_path):
+    engine = _heat_wave_database(tmp_path / 'events.db')
+    levels = json.loads(create_return_level_tool(SQLDatabase(engine)).invoke(
+        {'event_type': 'heat', 'return_periods': [50], 'region_ids': ['RFC']}))['data']
+    assert [(r['ID'], r['return_period']) for r in levels] == [('17', 50)]
+
+    answer = create_submit_events_tool().invoke({'return_levels': levels, 'insights': ['a', 'b', 'c']})
+    assert isinstance(answer, SubmittedAnswer)
+    assert extract_json_from_response(answer)['data'] == levels
@@ -152,4 +152,122 @@ def render_dashboard_metrics():
         st.metric(label="Event Definition Used", value="Def 6", delta="Selected Def")
     st.subheader("Key Analysis Features")
     st.info("☀️ Heat wave analysis available for extreme high temperature events affecting grid reliability and planning.")
-    st.info("❄️ Cold snap analysis available for extreme low temperature events affecting grid reliability and planning.")
\ No newline at end of file
+    st.info("❄️ Cold snap analysis available for extreme low temperature events affecting grid reliability and planning.")
+
+
+def render_query_memory_admin(plans):
+    """
+    Render the admin view of stored question-to-SQL plans.
+    
+    Args:
+        plans (list): Stored plans from models.query_memory.list_plans
+    """
+    with st.sidebar.expander(f"Stored query plans ({len(plans)})"):
+        if not plans:
+            st.caption("No plans stored yet. Plans are captured from successful agent answers.")
+            return
+        st.caption(f"Total reuse hits: {sum(p['hit_count'] for p in plans)}")
+        for plan in plans:
+            st.markdown(f"**{plan['intent_shape']}** · {plan['hit_count']} hits")
+            st.caption(plan['example_question'] or '')
+            st.code(plan['template'], language='sql' if plan['kind'] == 'sql' else 'json')
+
+
+def render_model_router_admin(outcomes):
+    """
+    Render the admin view of agent outcomes per question shape and model tier.
+    
+    Args:
+        outcomes (list): Outcome statistics from models.router.list_outcomes
+    """
+    with st.sidebar.expander(f"Model routing ({len(outcomes)})"):
+        if not outcomes:
+            st.caption("No agent runs recorded yet.")
+            return
+        for row in outcomes:
+            st.markdown(f"**{row['route_key']}** · {row['tier']}")
+            st.caption(f"{row['attempts']} runs · {row['success_rate']:.0%} success · {row['mean_seconds']:.1f} s mean")
+
+def render_events_table(frame, key=None):
+    """
+    Render event results in Streamlit's virtualized, Arrow-backed data grid.
+    
+    Args:
+        frame (pd.DataFrame): Typed events frame from build_events_frame
+        key (str): Unique element key
+    """
+    if frame.empty:
+        st.info("No events found.")
+        return
+    st.dataframe(
+        frame,
+        key=key,
+        hide_index=True,
+        use_container_width=True,
+        height=min(450, 38 + 35 * len(frame)),
+        column_config={
+            "Start Date": st.column_config.DateColumn("Start Date", format="YYYY-MM-DD"),
+            "End Date": st.column_config.DateColumn("End Date", format="YYYY-MM-DD"),
+            "Temperature (°F)": st.column_config.NumberColumn("Temperature (°F)", format="%.1f"),
+            "Spatial Coverage (%)": st.column_config.NumberColumn("Spatial Coverage (%)", format="%.1f"),
+        },
+    )
+
+def render_collapsed_chat_message(question, summary, row_count, response_time, chat_index, render_entry):
+    """
+    Render an older chat entry collapsed to its question, summary line and row count.
+    
+    Args:
+        question (str): The user's question
+        summary (str): One-line summary of the response
+        row_count (int): Number of event rows in the response, or None
+        response_time (float): Time taken to generate the response
+        chat_index (int): The index of this chat in the conversation
+        render_entry (callable): Renders the entry's table and map inside the expander, only
+            once the user asks to load them
+    """
+    key = f"expand_entry_{chat_index}"
+    loaded = st.session_state.get(key, False)
+    rows = f" · {row_count} rows" if row_count is not None else ""
+    with st.expander(f"Question {chat_index+1}: {question}{rows}", expanded=loaded):
+        if summary:
+            st.markdown(summary)
+        st.caption(f"Response time: {response_time:.2f}s")
+        if st.toggle("Show table and map", key=key):
+            render_entry()
+
+def render_rerun_timings(timings):
+    """
+    Render recent page rerun timings against history length in the sidebar.
+    
+    Args:
+        timings (list): (history length, rerun seconds) pairs, oldest first
+    """
+    with st.sidebar.expander("Rerun timings"):
+        if not timings:
+            st.caption("No reruns recorded yet.")
+            return
+        entries, seconds = timings[-1]
+        st.metric(label="Last history render", value=f"{seconds * 1000:.0f} ms", delta=f"{entries} entries", delta_color="off")
+        st.line_chart({"history entries": [t[0] for t in timings], "render ms": [t[1] * 1000 for t in timings]},
+                      x="history entries", y="render ms", height=180)
+
+def render_session_memory(usage, text_bytes, rss_bytes=None):
+    """
+    Render per-session memory accounting in the sidebar.
+    
+    Args:
+        usage (dict): SessionArtifactStore.usage() accounting
+        text_bytes (int): Bytes of question/answer text in the history
+        rss_bytes (int): Process resident set size, if known
+    """
+    mb = 1024 * 1024
+    with st.sidebar.expander("Session memory"):
+        st.metric(label="Derived artifacts in memory", value=f"{usage['memory_bytes'] / mb:.1f} MB",
+                  delta=f"budget {usage['budget_bytes'] / mb:.0f} MB", delta_color="off")
+        st.caption(f"{usage['artifacts_in_memory']} in memory · {usage['artifacts_on_disk']} spilled "
+                   f"({usage['disk_bytes'] / mb:.1f} MB compressed) · history text {text_bytes / mb:.2f} MB")
+        st.caption(f"Hits {usage['hits']} · builds {usage['builds']} · reloads {usage['reloads']} · "
+                   f"spills {usage['spills']} · drops {usage['drops']}")
+        if rss_bytes:
+            st.caption(f"Process RSS: {rss_bytes / mb:.0f} MB")
@@ -0,0 +1,208 @@
+"""
+Record and replay of agent sessions.
+
+With AGENT_TRACE_MODE='record', every chat completion (raw HTTP response,
+streamed or not) and every SQL result the pipeline uses is appended to a
+gzip-compressed JSON-lines trace, keyed by a hash of the request. With
+'replay', the same requests are answered from the trace instead of Azure
+OpenAI and the database, so get_response re-runs offline with identical
+behaviour. Each answered question also records its final response and
+submit_events arguments, which benchmarks/bench_replay.py exports as a
+corpus for the JSON parsing and visualization benchmarks.
+
+LLM calls are intercepted with an httpx transport on the AzureChatOpenAI
+client; SQL results go through traced_sql at the points that execute
+queries (event queries, the agent's SQL tools and stored query plans).
+Results are stored after a JSON round trip in both modes, so recorded and
+replayed runs see the same values.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from config.config import AGENT_TRACE_MODE, AGENT_TRACE_PATH
+
+TRACE_MODES = ('off', 'record', 'replay')
+
+# Transport headers that no longer apply once a response body has been read
+_DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+class TraceMiss(LookupError):
+    """A replayed request has no recorded response."""
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=_json_default)
+
+
+def request_hash(kind: str, *parts) -> str:
+    """Stable hash of a request (kind plus JSON-serializable parts)."""
+    return hashlib.sha256(_canonical([kind, *parts]).encode('utf-8')).hexdigest()[:32]
+
+
+def read_trace(path: str) -> List[Dict[str, Any]]:
+    """Read every entry of a trace file."""
+    entries = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+class AgentTrace:
+    """A trace file being recorded or replayed."""
+
+    def __init__(self, mode: str, path: str):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown AGENT_TRACE_MODE '{mode}'. Use one of: {', '.join(TRACE_MODES)}")
+        self.mode = mode
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._recorded: Dict[str, deque] = defaultdict(deque)
+        self._last: Dict[str, Dict[str, Any]] = {}
+        if mode == 'replay':
+            for entry in read_trace(path):
+                if 'hash' in entry:
+                    self._recorded[entry['hash']].append(entry)
+        else:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def add(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._pending.append(entry)
+
+    def take(self, key: str) -> Dict[str, Any]:
+        """Next recorded entry for a request hash; the last one repeats once exhausted."""
+        with self._lock:
+            queue = self._recorded.get(key)
+            if queue:
+                self._last[key] = queue.popleft()
+            if key not in self._last:
+                raise TraceMiss(f"No recorded response for request {key} in {self.path}")
+            return self._last[key]
+
+    def flush(self):
+        """Append pending entries as one gzip member (one per answered question)."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(e, separators=(',', ':'), default=_json_default) + '\n'
+                                for e in pending))
+
+    def http_client(self):
+        """httpx client for AzureChatOpenAI that records or replays chat completions."""
+        import httpx
+        return httpx.Client(transport=_trace_transport_class()(self, httpx.HTTPTransport()))
+
+
+@lru_cache(maxsize=None)
+def _trace_transport_class():
+    # Built lazily so httpx is only imported once a traced LLM client is needed
+    import httpx
+
+    class TraceTransport(httpx.BaseTransport):
+        def __init__(self, trace: AgentTrace, inner):
+            self.trace = trace
+            self.inner = inner
+
+        def handle_request(self, request):
+            body = request.read()
+            try:
+                payload = json.loads(body) if body else None
+            except ValueError:
+                payload = body.decode('utf-8', 'replace')
+            key = request_hash('llm', request.method, request.url.path, payload)
+            if self.trace.mode == 'replay':
+                entry = self.trace.take(key)
+                return httpx.Response(entry['status'], headers={'content-type': entry['content_type']},
+                                      content=entry['body'].encode('utf-8'), request=request)
+            response = self.inner.handle_request(request)
+            try:
+                content = response.read()
+            finally:
+                response.close()
+            self.trace.add({'kind': 'llm', 'hash': key, 'status': response.status_code,
+                            'content_type': response.headers.get('content-type', ''),
+                            'body': content.decode('utf-8', 'replace')})
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS]
+            return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+        def close(self):
+            self.inner.close()
+
+    return TraceTransport
+
+
+_trace: Optional[AgentTrace] = None
+_trace_lock = threading.Lock()
+
+
+def get_trace() -> Optional[AgentTrace]:
+    """The process-wide trace for AGENT_TRACE_MODE, or None when tracing is off."""
+    global _trace
+    if AGENT_TRACE_MODE == 'off':
+        return None
+    with _trace_lock:
+        if _trace is None:
+            _trace = AgentTrace(AGENT_TRACE_MODE, AGENT_TRACE_PATH)
+        return _trace
+
+
+def traced_sql(source: str, key: str, run: Callable[[], Any]) -> Any:
+    """
+    Run a query, or take its result from the trace.
+
+    Args:
+        source (str): Query origin ('events', 'intervals', 'extremes', 'agent_sql', 'agent_schema', 'query_plan')
+        key (str): Query identity (statement and parameters)
+        run (callable): Executes the query; its result must be JSON-serializable
+
+    Returns:
+        Any: Query result
+    """
+    trace = get_trace()
+    if trace is None:
+        return run()
+    digest = request_hash('sql', source, key)
+    if trace.mode == 'replay':
+        return trace.take(digest)['result']
+    result = json.loads(json.dumps(run(), default=_json_default))
+    trace.add({'kind': 'sql', 'source': source, 'hash': digest, 'result': result})
+    return result
+
+
+def record_answer(question: str, output: str, response: str, tool_args: Optional[Dict[str, Any]] = None):
+    """Record a question's raw agent output, final response and submit_events arguments."""
+    trace = get_trace()
+    if trace is not None and trace.mode == 'record':
+        trace.add({'kind': 'answer', 'question': question, 'output': output, 'response': response,
+                   'tool_args': tool_args})
+
+
+def flush_trace():
+    """Write what was recorded for the current question."""
+    trace = get_trace()
+    if trace is not None and trace.mode == 'record':
+        trace.flush()
@@ -0,0 +1,235 @@
+"""
+Vectorized statistics for Technical Insights.
+
+Given the events DataFrame from parse_temperature_json, compute trend slopes,
+per-decade frequencies, coverage/duration statistics and extremes locally,
+render them as a compact fact sheet, and turn that into insight lines either
+with templates alone or with a short LLM call that only phrases the facts.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.config import STRING_ID_TO_SUBNAME
+
+INSIGHT_PROMPT = """You write the "Technical Insights" section of a transmission planning answer.
+Using ONLY the facts below, write {count} concise numbered insights about temperature trends,
+spatial coverage, event frequency, duration and extremes. Do not introduce numbers that are not
+in the facts and do not restate the question.
+
+Question: {question}
+
+Facts:
+{facts}"""
+
+
+def _region_name(region_id) -> str:
+    rid = str(region_id)
+    name = STRING_ID_TO_SUBNAME.get(rid)
+    return f"{name} ({rid})" if name else rid
+
+
+def _slope_per_decade(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """Least-squares slope of y against x (years), scaled to per decade."""
+    mask = np.isfinite(x) & np.isfinite(y)
+    x, y = x[mask], y[mask]
+    if len(x) < 3 or np.ptp(x) < 2:
+        return None
+    x_centered = x - x.mean()
+    slope = (x_centered * (y - y.mean())).sum() / (x_centered ** 2).sum()
+    return float(slope * 10)
+
+
+def _event_row(df: pd.DataFrame, idx) -> Dict[str, Any]:
+    row = df.loc[idx]
+    return {
+        'start_date': row['start_date'].strftime('%Y-%m-%d'),
+        'region': _region_name(row['NERC_ID']),
+        'temperature': float(row['temperature']),
+        'spatial_coverage': float(row['spatial_coverage']) if pd.notna(row.get('spatial_coverage')) else None,
+        'duration': int(row['duration']) if pd.notna(row.get('duration')) else None,
+    }
+
+
+def _group_facts(df: pd.DataFrame, event_type: str) -> Dict[str, Any]:
+    """Statistics for the events of one type."""
+    years = df['start_date'].dt.year.to_numpy(dtype=float) + df['start_date'].dt.dayofyear.to_numpy() / 366.0
+    temps = df['temperature'].to_numpy(dtype=float)
+    facts: Dict[str, Any] = {
+        'count': int(len(df)),
+        'temperature': {
+            'mean': float(np.nanmean(temps)), 'min': float(np.nanmin(temps)),
+            'max': float(np.nanmax(temps)), 'std': float(np.nanstd(temps)),
+        },
+        'temperature_trend_per_decade': _slope_per_decade(years, temps),
+    }
+
+    decades = (df['start_date'].dt.year // 10 * 10).value_counts().sort_index()
+    facts['events_per_decade'] = {f"{int(d)}s": int(c) for d, c in decades.items()}
+    if len(decades) >= 2:
+        # Compare the most recent half of the covered decades with the earlier half
+        half = len(decades) // 2
+        facts['frequency_change'] = {
+            'earlier_mean_per_decade': float(decades.iloc[:half].mean()),
+            'recent_mean_per_decade': float(decades.iloc[half:].mean()),
+        }
+
+    if 'spatial_coverage' in df.columns and df['spatial_coverage'].notna().any():
+        cov = df['spatial_coverage'].to_numpy(dtype=float)
+        facts['spatial_coverage'] = {
+            'mean': float(np.nanmean(cov)), 'median': float(np.nanmedian(cov)), 'max': float(np.nanmax(cov)),
+            'share_above_50': float(np.mean(cov[np.isfinite(cov)] > 50) * 100),
+        }
+        facts['coverage_trend_per_decade'] = _slope_per_decade(years, cov)
+
+    if 'duration' in df.columns and df['duration'].notna().any():
+        dur = df['duration'].to_numpy(dtype=float)
+        facts['duration_days'] = {'mean': float(np.nanmean(dur)), 'max': int(np.nanmax(dur)), 'min': int(np.nanmin(dur))}
+
+    # Most severe event: hottest heat wave / coldest cold snap
+    severe_idx = df['temperature'].idxmin() if event_type == 'cold' else df['temperature'].idxmax()
+    facts['most_severe'] = _event_row(df, severe_idx)
+    if 'spatial_coverage' in df.columns and df['spatial_coverage'].notna().any():
+        facts['widest'] = _event_row(df, df['spatial_coverage'].idxmax())
+    if 'duration' in df.columns and df['duration'].notna().any():
+        facts['longest'] = _event_row(df, df['duration'].idxmax())
+    return facts
+
+
+def compute_event_facts(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Compute insight statistics for parsed events.
+
+    Args:
+        df (pd.DataFrame): Events from parse_temperature_json (start_date,
+            temperature, NERC_ID and optionally end_date, spatial_coverage, event_type)
+
+    Returns:
+        dict: Overall facts plus per-event-type statistics under 'by_type'
+    """
+    d = df.copy()
+    d['start_date'] = pd.to_datetime(d['start_date'], errors='coerce')
+    d['temperature'] = pd.to_numeric(d['temperature'], errors='coerce')
+    if 'spatial_coverage' in d.columns:
+        d['spatial_coverage'] = pd.to_numeric(d['spatial_coverage'], errors='coerce')
+    if 'end_date' in d.columns:
+        end = pd.to_datetime(d['end_date'], errors='coerce')
+        d['duration'] = (end - d['start_date']).dt.days + 1
+    d = d.dropna(subset=['start_date', 'temperature'])
+    if 'event_type' not in d.columns:
+        d['event_type'] = 'event'
+    d['event_type'] = d['event_type'].astype(str).str.lower()
+
+    regions = d['NERC_ID'].astype(str).value_counts()
+    facts: Dict[str, Any] = {
+        'count': int(len(d)),
+        'period': (d['start_date'].min().strftime('%Y-%m-%d'), d['start_date'].max().strftime('%Y-%m-%d')) if len(d) else None,
+        'regions': {_region_name(r): int(c) for r, c in regions.items()},
+        'by_type': {},
+    }
+    for event_type, group in d.groupby('event_type', sort=True):
+        facts['by_type'][event_type] = _group_facts(group, event_type)
+    return facts
+
+
+def _signed(value, unit: str) -> str:
+    """Format a trend slope with its sign, or 'n/a' when it could not be fitted."""
+    return 'n/a' if value is None else f"{value:+.2f}{unit}"
+
+
+def format_fact_sheet(facts: Dict[str, Any]) -> str:
+    """Render facts as compact 'key: value' lines for the insight-writing call."""
+    lines = [f"events: {facts['count']}"]
+    if facts.get('period'):
+        lines.append(f"period: {facts['period'][0]} to {facts['period'][1]}")
+    if facts['regions']:
+        lines.append('events by region: ' + ', '.join(f"{r} {c}" for r, c in list(facts['regions'].items())[:8]))
+    for event_type, g in facts['by_type'].items():
+        p = event_type
+        t = g['temperature']
+        lines.append(f"{p} count: {g['count']}")
+        lines.append(f"{p} temperature °F: mean {t['mean']:.1f}, min {t['min']:.1f}, max {t['max']:.1f}, std {t['std']:.1f}")
+        lines.append(f"{p} temperature trend: {_signed(g['temperature_trend_per_decade'], '°F/decade')}")
+        lines.append(f"{p} events per decade: " + ', '.join(f"{d} {c}" for d, c in g['events_per_decade'].items()))
+        if 'frequency_change' in g:
+            fc = g['frequency_change']
+            lines.append(f"{p} mean events per decade: earlier {fc['earlier_mean_per_decade']:.1f}, recent {fc['recent_mean_per_decade']:.1f}")
+        if 'spatial_coverage' in g:
+            c = g['spatial_coverage']
+            lines.append(f"{p} spatial coverage %: mean {c['mean']:.1f}, median {c['median']:.1f}, max {c['max']:.1f}, "
+                         f"{c['share_above_50']:.0f}% of events above 50%")
+            lines.append(f"{p} coverage trend: {_signed(g['coverage_trend_per_decade'], ' pts/decade')}")
+        if 'duration_days' in g:
+            dd = g['duration_days']
+            lines.append(f"{p} duration days: mean {dd['mean']:.1f}, min {dd['min']}, max {dd['max']}")
+        for label in ('most_severe', 'widest', 'longest'):
+            if label in g:
+                e = g[label]
+                extra = f", coverage {e['spatial_coverage']:.1f}%" if e['spatial_coverage'] is not None else ''
+                extra += f", {e['duration']} days" if e['duration'] is not None else ''
+                lines.append(f"{p} {label.replace('_', ' ')} event: {e['start_date']} in {e['region']}, {e['temperature']:.1f}°F{extra}")
+    return '\n'.join(lines)
+
+
+def template_insights(facts: Dict[str, Any]) -> List[str]:
+    """Write insight lines from facts with fixed templates (no LLM)."""
+    insights: List[str] = []
+    if not facts['count']:
+        return ["No events matched the requested filters."]
+    if facts.get('period'):
+        regions = ', '.join(list(facts['regions'])[:5])
+        insights.append(f"{facts['count']} events between {facts['period'][0]} and {facts['period'][1]}, "
+                        f"most in {regions}.")
+    for event_type, g in facts['by_type'].items():
+        label = {'heat': 'Heat wave', 'cold': 'Cold snap'}.get(event_type, 'Event')
+        t = g['temperature']
+        trend = g['temperature_trend_per_decade']
+        sentence = f"{label} temperatures average {t['mean']:.1f}°F (range {t['min']:.1f}–{t['max']:.1f}°F)"
+        if trend is not None:
+            sentence += f", with a trend of {trend:+.2f}°F per decade across events"
+        insights.append(sentence + '.')
+        if 'spatial_coverage' in g:
+            c = g['spatial_coverage']
+            sentence = (f"{label} spatial coverage averages {c['mean']:.1f}% (max {c['max']:.1f}%), "
+                        f"and {c['share_above_50']:.0f}% of events cover more than half the region")
+            if g.get('coverage_trend_per_decade') is not None:
+                sentence += f"; coverage changes by {g['coverage_trend_per_decade']:+.2f} points per decade"
+            insights.append(sentence + '.')
+        if 'frequency_change' in g:
+            fc = g['frequency_change']
+            busiest = max(g['events_per_decade'].items(), key=lambda kv: kv[1])
+            insights.append(f"{label} frequency went from {fc['earlier_mean_per_decade']:.1f} to "
+                            f"{fc['recent_mean_per_decade']:.1f} events per decade between the earlier and recent "
+                            f"halves of the record; the {busiest[0]} had the most events ({busiest[1]}).")
+        e = g['most_severe']
+        extra = f" and lasted {e['duration']} days" if e['duration'] is not None else ''
+        insights.append(f"The most severe {label.lower()} started {e['start_date']} in {e['region']} "
+                        f"at {e['temperature']:.1f}°F{extra}.")
+    return insights
+
+
+def phrase_insights(facts: Dict[str, Any], llm, question: str = '', count: int = 3) -> List[str]:
+    """
+    Turn facts into insight lines with a short LLM call, falling back to templates.
+
+    Args:
+        facts (dict): Output of compute_event_facts
+        llm (BaseChatModel): Chat model used only for phrasing
+        question (str): The user's question, for context
+        count (int): Number of insights to request
+
+    Returns:
+        list: Insight lines without numbering
+    """
+    try:
+        message = llm.invoke(INSIGHT_PROMPT.format(count=count, question=question, facts=format_fact_sheet(facts)))
+        text = getattr(message, 'content', str(message))
+        lines = [re.sub(r'^\s*(?:\d+[.)]|[-*•])\s*', '', line).strip() for line in text.splitlines()]
+        lines = [line for line in lines if line]
+        if lines:
+            return lines
+    except Exception:
+        pass
+    return template_insights(facts)
@@ -0,0 +1,425 @@
+"""
+Pluggable cache backend shared by app processes.
+
+The answer cache, SQL result cache and rendered-figure cache go through one
+byte-oriented backend selected by CACHE_BACKEND:
+
+- 'memory': in-process LRU (the previous per-process behaviour)
+- 'sqlite': a local SQLite file shared by every replica on the host
+- 'redis':  any server speaking the Redis protocol (Redis, Valkey, KeyDB or
+  a local stand-in) at CACHE_URL
+
+Values are encoded without pickling: text as UTF-8, records and rows as
+JSON (orjson), DataFrames as Arrow IPC and Plotly figures as compressed
+Plotly JSON. Keys are namespaced and carry a per-namespace generation, so a
+namespace is invalidated on every backend by bumping its generation.
+
+Generations and seen data versions are control keys: they are stored without
+a TTL and never evicted by the memory backend, since losing one would bring
+back stale entries. A Redis server with maxmemory must therefore use a
+volatile-* or noeviction policy (allkeys-* policies may evict control keys).
+"""
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Optional
+from urllib.parse import urlparse
+
+import orjson
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import pyarrow as pa
+
+from utils.metrics import record_cache
+from config.config import (CACHE_BACKEND, CACHE_KEY_PREFIX, CACHE_MEMORY_MAX_MB,
+                           CACHE_SQLITE_PATH, CACHE_TTL_SECONDS, CACHE_URL)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, tuple):
+        return list(value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    Encode a cacheable value to tagged bytes without pickling.
+
+    Supports str (UTF-8), JSON-compatible data (orjson), DataFrames (Arrow IPC
+    with zstd) and Plotly figures (zlib'd Plotly JSON).
+    """
+    if isinstance(value, str):
+        return b'S' + value.encode('utf-8')
+    if isinstance(value, pd.DataFrame):
+        table = pa.Table.from_pandas(value, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        options = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return b'F' + sink.getvalue().to_pybytes()
+    if isinstance(value, go.Figure):
+        return b'P' + zlib.compress(value.to_json().encode('utf-8'), 6)
+    return b'J' + orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def decode_value(payload: bytes) -> Any:
+    """Decode bytes produced by encode_value."""
+    tag, body = payload[:1], payload[1:]
+    if tag == b'S':
+        return body.decode('utf-8')
+    if tag == b'F':
+        return pa.ipc.open_stream(pa.py_buffer(body)).read_all().to_pandas()
+    if tag == b'P':
+        return pio.from_json(zlib.decompress(body).decode('utf-8'))
+    if tag == b'J':
+        return orjson.loads(body)
+    raise ValueError(f"Unknown cache payload tag {tag!r}")
+
+
+class MemoryBackend:
+    """In-process LRU cache of bytes, capped in total size; control keys are kept apart."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._control: dict = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_control(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._control.get(key)
+
+    def set_control(self, key: str, value: bytes):
+        with self._lock:
+            self._control[key] = value
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at and expires_at < time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes and len(self._data) > 1:
+                self._remove(next(iter(self._data)))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._bytes -= len(item[0])
+
+
+class SQLiteBackend:
+    """Cache in a local SQLite file shared by all processes on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] < time.time():
+            self.delete(key)
+            return None
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(value), time.time() + ttl if ttl else None),
+            )
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    # Entries are only removed on expiry, and control keys never expire
+    def get_control(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    def set_control(self, key: str, value: bytes):
+        self.set(key, value)
+
+
+class RedisBackend:
+    """
+    Minimal Redis-protocol (RESP2) client for GET/SET/DEL.
+
+    Works against Redis-compatible servers or a local stand-in; one
+    connection per thread, reconnecting after socket errors. After a failed
+    connection attempt, calls fail fast for a backoff period (doubling up to
+    max_backoff seconds) instead of each waiting for the connect timeout.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0, max_backoff: float = 30.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip('/') or 0)
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self._local = threading.local()
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if time.monotonic() < self._retry_at:
+                raise ConnectionError(f"Cache server {self.host}:{self.port} is unavailable")
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            except OSError:
+                self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+                self._retry_at = time.monotonic() + self._backoff
+                raise
+            self._backoff = 0.0
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn = conn
+            if self.password:
+                self._command(b'AUTH', self.password.encode())
+            if self.db:
+                self._command(b'SELECT', str(self.db).encode())
+        return conn
+
+    def _command(self, *parts: bytes):
+        sock, reader = self._connection()
+        request = b'*%d\r\n' % len(parts) + b''.join(b'$%d\r\n%s\r\n' % (len(p), p) for p in parts)
+        try:
+            sock.sendall(request)
+            return self._read_reply(reader)
+        except (OSError, ConnectionError):
+            self._local.conn = None
+            sock.close()
+            raise
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Cache server closed the connection")
+        tag, body = line[:1], line[1:-2]
+        if tag == b'+':
+            return body
+        if tag == b'-':
+            raise RuntimeError(body.decode('utf-8', 'replace'))
+        if tag == b':':
+            return int(body)
+        if tag == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if tag == b'*':
+            return [self._read_reply(reader) for _ in range(max(int(body), 0))]
+        raise ConnectionError(f"Unexpected reply from cache server: {line!r}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._command(b'GET', key.encode())
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        if ttl:
+            self._command(b'SET', key.encode(), value, b'EX', str(int(ttl)).encode())
+        else:
+            self._command(b'SET', key.encode(), value)
+
+    def delete(self, key: str):
+        self._command(b'DEL', key.encode())
+
+    # Without a TTL, volatile-* eviction policies never evict control keys
+    def get_control(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    def set_control(self, key: str, value: bytes):
+        self.set(key, value)
+
+
+def create_cache_backend(kind: str = CACHE_BACKEND):
+    """
+    Create the configured cache backend.
+
+    Args:
+        kind (str): 'memory', 'sqlite' or 'redis'
+
+    Returns:
+        MemoryBackend | SQLiteBackend | RedisBackend
+    """
+    if kind == 'sqlite':
+        return SQLiteBackend(CACHE_SQLITE_PATH)
+    if kind == 'redis':
+        return RedisBackend(CACHE_URL)
+    if kind != 'memory':
+        raise ValueError(f"Unknown CACHE_BACKEND '{kind}'. Use one of: memory, sqlite, redis")
+    return MemoryBackend(int(CACHE_MEMORY_MAX_MB * 1024 * 1024))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend():
+    """Process-wide cache backend instance (also outside a Streamlit script run)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_cache_backend()
+    return _backend
+
+
+# Generations resolved in the current thread since pin_generations (one app rerun)
+_pinned = threading.local()
+
+
+def pin_generations():
+    """
+    Resolve each namespace's generation at most once in this thread until the next call.
+
+    The app calls it at the start of every rerun, so cache lookups during a rerun do not
+    each read the generation from the backend. Threads that never call it always read it.
+    """
+    _pinned.generations = {}
+
+
+def _generation(backend, namespace: str) -> str:
+    pinned = getattr(_pinned, 'generations', None)
+    if pinned is not None and namespace in pinned:
+        return pinned[namespace]
+    payload = backend.get_control(f"{CACHE_KEY_PREFIX}:gen:{namespace}")
+    generation = payload.decode() if payload else '0'
+    if pinned is not None:
+        pinned[namespace] = generation
+    return generation
+
+
+def namespace_generation(namespace: str) -> str:
+    """Current generation of a namespace; it changes whenever the namespace is invalidated."""
+    try:
+        return _generation(get_cache_backend(), namespace)
+    except Exception:
+        return '0'
+
+
+def cache_key(namespace: str, key: str, backend=None) -> str:
+    """Backend key for a logical key: prefix, namespace, generation and key hash."""
+    backend = backend or get_cache_backend()
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    return f"{CACHE_KEY_PREFIX}:{namespace}:{_generation(backend, namespace)}:{digest}"
+
+
+def cache_get(namespace: str, key: str) -> Optional[Any]:
+    """Return a cached value, or None on a miss or backend error."""
+    try:
+        backend = get_cache_backend()
+        payload = backend.get(cache_key(namespace, key, backend))
+        value = decode_value(payload) if payload is not None else None
+    except Exception:
+        value = None
+    record_cache(namespace, value is not None)
+    return value
+
+
+def cache_set(namespace: str, key: str, value: Any, ttl: Optional[int] = CACHE_TTL_SECONDS):
+    """Store a value; backend errors are ignored so caching never breaks a request."""
+    if value is None:
+        return
+    try:
+        backend = get_cache_backend()
+        backend.set(cache_key(namespace, key, backend), encode_value(value), ttl)
+    except Exception:
+        pass
+
+
+def cached(namespace: str, key: str, build: Callable[[], Any], ttl: Optional[int] = CACHE_TTL_SECONDS) -> Any:
+    """Return the cached value for key, building and storing it on a miss."""
+    value = cache_get(namespace, key)
+    if value is None:
+        value = build()
+        cache_set(namespace, key, value, ttl)
+    return value
+
+
+def sync_namespaces(namespaces, version: str) -> bool:
+    """
+    Invalidate namespaces when an external data version differs from the one last seen.
+
+    The version lives with the data (e.g. the database), so a process whose backend is not
+    shared with the writer of the data (CACHE_BACKEND=memory) still notices its updates.
+    The first version a backend sees is only recorded.
+
+    Args:
+        namespaces (list): Namespaces derived from the versioned data
+        version (str): Current version of the data
+
+    Returns:
+        bool: Whether the namespaces were invalidated
+    """
+    backend = get_cache_backend()
+    key = f"{CACHE_KEY_PREFIX}:seen:{','.join(namespaces)}"
+    seen = backend.get_control(key)
+    if seen is not None and seen.decode() == version:
+        return False
+    if seen is not None:
+        for namespace in namespaces:
+            invalidate_namespace(namespace)
+    backend.set_control(key, version.encode())
+    return seen is not None
+
+
+def invalidate_namespace(namespace: str):
+    """Invalidate every entry of a namespace by bumping its generation."""
+    backend = get_cache_backend()
+    generation = str(time.time_ns())
+    backend.set_control(f"{CACHE_KEY_PREFIX}:gen:{namespace}", generation.encode())
+    pinned = getattr(_pinned, 'generations', None)
+    if pinned is not None:
+        pinned[namespace] = generation
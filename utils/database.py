@@ -1,11 +1,262 @@
-from langchain_community.utilities import SQLDatabase
-from config.config import DB_CONNECTION_STRING
+import json
+import time
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import MetaData, Table, bindparam, create_engine, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from utils.agent_trace import traced_sql
+from utils.cache_backend import cached
+from utils.metrics import SQL_LATENCY, SQL_QUERIES
+from config.config import DB_CONNECTION_STRING, EVENT_QUERY_MAX_ROWS
+
+# Event metadata table for each event type
+EVENT_TABLES = {
+    'heat': 'heat_wave_metadata',
+    'cold': 'cold_wave_metadata',
+}
+
+# Columns the event query path may sort on; 'severity' is hottest first for
+# heat waves and coldest first for cold snaps
+ORDERABLE_COLUMNS = ('severity', 'temperature', 'spatial_coverage', 'duration', 'start_date')
+
+# Single-row table holding the version of the event tables. Catalog writes bump it, so app
+# processes notice updates made elsewhere even when they share no cache backend with the writer
+DATA_VERSION_TABLE = 'event_data_version'
+
 
 def create_sql_database():
     """
     Create a SQLDatabase object from the connection string.
-    
+
     Returns:
         SQLDatabase: A SQLDatabase object for querying
     """
-    return SQLDatabase.from_uri(DB_CONNECTION_STRING, sample_rows_in_table_info=2)
\ No newline at end of file
+    from langchain_community.utilities import SQLDatabase
+    engine = create_engine(DB_CONNECTION_STRING)
+    # The data version table is bookkeeping, not something the agent should query
+    ignore_tables = [DATA_VERSION_TABLE] if inspect(engine).has_table(DATA_VERSION_TABLE) else None
+    return SQLDatabase(engine, ignore_tables=ignore_tables, sample_rows_in_table_info=2)
+
+
+def data_version(engine) -> str:
+    """
+    Current version of the event tables.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+
+    Returns:
+        str: Version set by the last bump_data_version, '0' if the tables were never versioned
+    """
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(text(f"SELECT version FROM {DATA_VERSION_TABLE}")).fetchone()
+    except SQLAlchemyError:
+        return '0'
+    return str(row[0]) if row else '0'
+
+
+def bump_data_version(engine) -> str:
+    """
+    Record that the event tables changed (creating the version table if needed).
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+
+    Returns:
+        str: The new version
+    """
+    version = str(time.time_ns())
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} (version VARCHAR(32) NOT NULL)"))
+        conn.execute(text(f"DELETE FROM {DATA_VERSION_TABLE}"))
+        conn.execute(text(f"INSERT INTO {DATA_VERSION_TABLE} (version) VALUES (:version)"), {'version': version})
+    return version
+
+
+@lru_cache(maxsize=None)
+def get_event_table(engine, event_type: str) -> Table:
+    """
+    Reflect and cache the metadata table for an event type.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+        event_type (str): 'heat' or 'cold'
+
+    Returns:
+        Table: Reflected heat_wave_metadata or cold_wave_metadata table
+    """
+    if event_type not in EVENT_TABLES:
+        raise ValueError(f"Unknown event type '{event_type}'. Use one of: {', '.join(EVENT_TABLES)}")
+    return Table(EVENT_TABLES[event_type], MetaData(), autoload_with=engine)
+
+
+def get_column(table: Table, name: str):
+    """Look up a column case-insensitively (e.g. NERC_ID vs nerc_id)."""
+    for column in table.columns:
+        if column.name.lower() == name.lower():
+            return column
+    raise KeyError(f"Column '{name}' not found in table '{table.name}'")
+
+
+def build_event_query(table: Table, event_type: str, region_ids: Optional[List[str]] = None,
+                      start_year: Optional[int] = None, end_year: Optional[int] = None,
+                      order_by: str = 'severity', descending: Optional[bool] = None):
+    """
+    Build a parameterized SELECT over an event metadata table.
+
+    Year bounds are expressed as ranges on start_date (rather than
+    EXTRACT(YEAR ...)) so an index on start_date or NERC_ID can be used, and
+    all values are bound parameters so the compiled statement is reused.
+
+    Returns:
+        tuple: (Select statement, dict of bound parameter values)
+    """
+    temperature = get_column(table, 'temperature')
+    start_date = get_column(table, 'start_date')
+    nerc_id = get_column(table, 'NERC_ID')
+    stmt = select(
+        start_date,
+        get_column(table, 'end_date'),
+        temperature,
+        get_column(table, 'spatial_coverage'),
+        nerc_id,
+    )
+    params: Dict[str, Any] = {}
+    if region_ids:
+        stmt = stmt.where(nerc_id.in_(bindparam('region_ids', expanding=True)))
+        # NERC_ID may be stored as text or integer; bind in the column's own type
+        try:
+            python_type = nerc_id.type.python_type
+        except NotImplementedError:
+            python_type = str
+        params['region_ids'] = [python_type(r) for r in region_ids]
+    if start_year is not None:
+        stmt = stmt.where(start_date >= bindparam('start_bound'))
+        params['start_bound'] = f"{int(start_year):04d}-01-01"
+    if end_year is not None:
+        stmt = stmt.where(start_date < bindparam('end_bound'))
+        params['end_bound'] = f"{int(end_year) + 1:04d}-01-01"
+
+    if order_by not in ORDERABLE_COLUMNS:
+        raise ValueError(f"Cannot order by '{order_by}'. Use one of: {', '.join(ORDERABLE_COLUMNS)}")
+    if order_by == 'severity':
+        column = temperature
+        if descending is None:
+            descending = event_type == 'heat'
+    else:
+        column = get_column(table, order_by)
+        if descending is None:
+            descending = order_by != 'start_date'
+    stmt = stmt.order_by(column.desc() if descending else column.asc())
+    return stmt, params
+
+
+def _iso_date(value) -> str:
+    """Format a date-like database value as YYYY-MM-DD."""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return str(value)[:10] if value is not None else ''
+
+
+def _round(value, digits: int = 1):
+    """Round numeric database values, leaving missing values as None."""
+    try:
+        return round(float(value), digits)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_compact_record(row, event_type: str) -> Dict[str, Any]:
+    """
+    Convert an event row to the compact DS/DE/T/SC/ID/Type shape used in responses.
+
+    Args:
+        row (Sequence): (start_date, end_date, temperature, spatial_coverage, NERC_ID)
+        event_type (str): 'heat' or 'cold'
+
+    Returns:
+        dict: Compact event record
+    """
+    start, end, temperature, coverage, nerc_id = row[:5]
+    return {
+        'DS': _iso_date(start),
+        'DE': _iso_date(end),
+        'T': _round(temperature),
+        'SC': _round(coverage),
+        'ID': str(nerc_id),
+        'Type': event_type,
+    }
+
+
+def records_from_rows(columns, rows, event_type: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Convert arbitrary query rows to compact records by column name.
+
+    Args:
+        columns (list): Column names of the result
+        rows (list): Row tuples
+        event_type (str): Event type for all rows, used when the result has no type column
+
+    Returns:
+        list | None: Compact records, or None if the event columns are missing
+    """
+    keys = [str(k).lower() for k in columns]
+    wanted = ['start_date', 'end_date', 'temperature', 'spatial_coverage', 'nerc_id']
+    if not all(k in keys for k in wanted):
+        return None
+    idx = [keys.index(k) for k in wanted]
+    type_idx = next((keys.index(k) for k in ('event_type', 'type') if k in keys), None)
+    records = []
+    for row in rows:
+        etype = str(row[type_idx]).lower() if type_idx is not None else event_type
+        records.append(to_compact_record([row[i] for i in idx], etype))
+    return records
+
+
+def query_events(engine, event_type: str, region_ids: Optional[List[str]] = None,
+                 start_year: Optional[int] = None, end_year: Optional[int] = None,
+                 order_by: str = 'severity', descending: Optional[bool] = None,
+                 limit: int = EVENT_QUERY_MAX_ROWS) -> List[Dict[str, Any]]:
+    """
+    Query heat wave and/or cold snap events with a prepared statement.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+        event_type (str): 'heat', 'cold' or 'both'
+        region_ids (list): NERC string IDs to restrict to (None for all regions)
+        start_year (int): First year (inclusive) of event start dates
+        end_year (int): Last year (inclusive) of event start dates
+        order_by (str): One of ORDERABLE_COLUMNS
+        descending (bool): Sort direction; defaults depend on order_by
+        limit (int): Maximum rows per event type
+
+    Returns:
+        list: Compact event records
+    """
+    event_types = list(EVENT_TABLES) if event_type == 'both' else [event_type]
+    limit = max(1, min(int(limit), EVENT_QUERY_MAX_ROWS))
+    params = [event_types, sorted(map(str, region_ids or [])), start_year, end_year, order_by, descending, limit]
+    key = json.dumps([str(engine.url)] + params)
+    # Traces are keyed without the database URL so a replay needs no database
+    return traced_sql('events', json.dumps(params), lambda: cached('events', key, lambda: _run_event_queries(
+        engine, event_types, region_ids, start_year, end_year, order_by, descending, limit)))
+
+
+def _run_event_queries(engine, event_types, region_ids, start_year, end_year, order_by, descending, limit):
+    """Execute the per-event-type queries behind query_events (uncached)."""
+    records: List[Dict[str, Any]] = []
+    with engine.connect() as conn:
+        for etype in event_types:
+            table = get_event_table(engine, etype)
+            stmt, params = build_event_query(table, etype, region_ids, start_year, end_year,
+                                             order_by, descending)
+            stmt = stmt.limit(bindparam('row_limit'))
+            params['row_limit'] = limit
+            SQL_QUERIES.inc(source='events')
+            with SQL_LATENCY.time(source='events'):
+                rows = conn.execute(stmt, params).fetchall()
+            records.extend(to_compact_record(row, etype) for row in rows)
+    return records
@@ -0,0 +1,227 @@
+"""
+Return periods and extreme-value statistics per NERC region.
+
+Planning standards ask for "1-in-N year" severity levels. For every region,
+the annual extremes of event temperature (hottest heat wave, coldest cold
+snap), duration and spatial coverage are fitted with a generalized extreme
+value (GEV) distribution by L-moments. All regions are fitted at once: the
+annual extremes form a (region x year) matrix, NaN where a region had no
+event, and the L-moments are computed row-wise on it. Years without an
+event are accounted for when converting a return period to a level.
+
+Fitted parameters are stored in the 'extremes' cache namespace, which is
+invalidated with the event tables (see catalog.incremental), so return-level
+questions are answered without touching the database.
+"""
+import json
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils.agent_trace import traced_sql
+from utils.cache_backend import cached
+from utils.intervals import event_index
+from config.config import STRING_ID_TO_SUBNAME
+
+# Fitted variables, named as in the return-level records: temperature, spatial coverage, duration
+VARIABLES = ('T', 'SC', 'duration')
+DEFAULT_RETURN_PERIODS = (10, 25, 50, 100)
+# Regions with fewer years with events are not fitted
+MIN_FIT_YEARS = 10
+EULER_GAMMA = 0.5772156649015329
+
+_gamma = np.frompyfunc(math.gamma, 1, 1)
+
+
+def annual_extremes(region_codes: np.ndarray, years: np.ndarray, values: np.ndarray, regions: int,
+                    first_year: int, last_year: int) -> np.ndarray:
+    """
+    Largest value per region and year.
+
+    Args:
+        region_codes (np.ndarray): Region index of each event
+        years (np.ndarray): Start year of each event
+        values (np.ndarray): Event values (negate to take minima)
+        regions (int): Number of regions
+        first_year (int): First year of the record
+        last_year (int): Last year of the record
+
+    Returns:
+        np.ndarray: (regions, years) annual maxima, NaN for years without events
+    """
+    out = np.full((regions, last_year - first_year + 1), np.nan)
+    np.fmax.at(out, (region_codes, years - first_year), values)
+    return out
+
+
+def fit_gev(samples: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Fit a GEV distribution to each row of a NaN-padded sample matrix by L-moments.
+
+    Uses Hosking's (1985) approximation for the shape. Rows with a near-zero shape
+    take the Gumbel limit.
+
+    Args:
+        samples (np.ndarray): (series, observations) values, NaN where missing
+
+    Returns:
+        dict: location 'xi', scale 'alpha' and shape 'k' (Hosking's sign: k > 0 has a
+            bounded upper tail) per row, and the sample size 'n'
+    """
+    x = np.sort(samples, axis=1)  # NaNs sort last
+    n = np.sum(~np.isnan(x), axis=1).astype(np.float64)
+    j = np.arange(x.shape[1], dtype=np.float64)
+    valid = j[None, :] < n[:, None]
+    x = np.where(valid, x, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b0 = x.sum(axis=1) / n
+        b1 = (x * j).sum(axis=1) / (n * (n - 1))
+        b2 = (x * j * (j - 1)).sum(axis=1) / (n * (n - 1) * (n - 2))
+        l1, l2, l3 = b0, 2 * b1 - b0, 6 * b2 - 6 * b1 + b0
+        t3 = l3 / l2
+        c = 2 / (3 + t3) - math.log(2) / math.log(3)
+        k = 7.8590 * c + 2.9554 * c ** 2
+        gumbel = np.abs(k) < 1e-6
+        safe_k = np.where(gumbel, 1.0, k)
+        gamma = _gamma(1 + safe_k).astype(np.float64)
+        alpha = np.where(gumbel, l2 / math.log(2), l2 * safe_k / ((1 - 2.0 ** -safe_k) * gamma))
+        xi = np.where(gumbel, l1 - EULER_GAMMA * alpha, l1 - alpha * (1 - gamma) / safe_k)
+    return {'xi': xi, 'alpha': alpha, 'k': np.where(gumbel, 0.0, k), 'n': n}
+
+
+def gev_quantile(xi, alpha, k, probability) -> np.ndarray:
+    """Value not exceeded with the given probability, broadcasting parameters against probabilities."""
+    xi, alpha, k, probability = np.broadcast_arrays(*(np.asarray(v, np.float64) for v in (xi, alpha, k, probability)))
+    y = -np.log(probability)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        general = xi + alpha * (1 - y ** k) / np.where(k == 0, 1.0, k)
+    return np.where(k == 0, xi - alpha * np.log(y), general)
+
+
+def _fit_event_type(engine, event_type: str) -> Dict[str, Any]:
+    """GEV parameters of every region and variable of one event table (uncached)."""
+    index = event_index(engine, event_type)
+    if not len(index):
+        return {'regions': [], 'first_year': None, 'last_year': None, 'fits': {}}
+    years = index.starts.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+    first_year, last_year = int(years.min()), int(years.max())
+    # Annual extremes: hottest heat wave or coldest cold snap (negated), longest, widest
+    series = {
+        'T': index.temperatures if event_type == 'heat' else -index.temperatures,
+        'SC': index.coverages,
+        'duration': (index.ends - index.starts + 1).astype(np.float64),
+    }
+    fits = {}
+    for variable, values in series.items():
+        maxima = annual_extremes(index.region_codes, years, values, len(index.regions), first_year, last_year)
+        fit = fit_gev(maxima)
+        fits[variable] = {name: np.round(v, 6).tolist() for name, v in fit.items()}
+    return {'regions': index.regions.tolist(), 'first_year': first_year, 'last_year': last_year, 'fits': fits}
+
+
+def fitted_extremes(engine, event_type: str) -> Dict[str, Any]:
+    """
+    GEV fits of an event table, from the 'extremes' cache namespace when available.
+
+    Returns:
+        dict: 'regions', 'first_year', 'last_year' and per-variable 'fits' ({'xi', 'alpha',
+            'k', 'n'} lists aligned with 'regions')
+    """
+    key = json.dumps([str(engine.url), event_type])
+    return cached('extremes', key, lambda: _fit_event_type(engine, event_type))
+
+
+def return_levels(engine, event_type: str, return_periods: Sequence[int] = DEFAULT_RETURN_PERIODS,
+                  region_ids: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    "1-in-N year" event temperature, spatial coverage and duration per region.
+
+    The annual probability of at least one event in a region is its share of years with
+    events, so the level exceeded once in N years is the GEV quantile at 1 - 1/(N * share).
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+        event_type (str): 'heat', 'cold' or 'both'
+        return_periods (list): Return periods in years
+        region_ids (list): NERC string IDs to restrict to (None for all regions)
+
+    Returns:
+        list: Records {'ID', 'Type', 'return_period', 'T', 'SC', 'duration', 'fit_years'},
+            by region then return period; regions with fewer than MIN_FIT_YEARS years with
+            events are omitted
+    """
+    event_types = ['heat', 'cold'] if event_type == 'both' else [event_type]
+    if any(t not in ('heat', 'cold') for t in event_types):
+        raise ValueError(f"Unknown event type '{event_type}'. Use 'heat', 'cold' or 'both'")
+    periods = np.asarray(sorted({int(p) for p in return_periods}), np.float64)
+    if not len(periods) or periods.min() <= 1:
+        raise ValueError("Return periods must be whole numbers of years greater than 1")
+    wanted = {str(r) for r in region_ids} if region_ids else None
+
+    params = ['return_levels', event_types, periods.astype(int).tolist(), sorted(wanted or [])]
+
+    def run():
+        records: List[Dict[str, Any]] = []
+        for etype in event_types:
+            fitted = fitted_extremes(engine, etype)
+            if not fitted['regions']:
+                continue
+            # Every event has all variables, so the years with events are the same for each
+            n = np.asarray(fitted['fits']['T']['n'], np.float64)
+            share = n / (fitted['last_year'] - fitted['first_year'] + 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                probability = 1 - 1 / (periods[None, :] * share[:, None])
+            probability = np.where(probability > 0, probability, np.nan)
+            levels = {}
+            for variable in VARIABLES:
+                fit = {name: np.asarray(v, np.float64)[:, None] for name, v in fitted['fits'][variable].items()}
+                level = gev_quantile(fit['xi'], fit['alpha'], fit['k'], probability)
+                levels[variable] = -level if (variable == 'T' and etype == 'cold') else level
+            levels['SC'] = np.clip(levels['SC'], 0, 100)
+            levels['duration'] = np.maximum(levels['duration'], 1)
+            for i, rid in enumerate(fitted['regions']):
+                if n[i] < MIN_FIT_YEARS or (wanted and rid not in wanted):
+                    continue
+                for j, period in enumerate(periods):
+                    records.append({
+                        'ID': rid, 'Type': etype, 'return_period': int(period),
+                        **{variable: _round(levels[variable][i, j]) for variable in VARIABLES},
+                        'fit_years': int(n[i]),
+                    })
+        return records
+
+    # Traced like the interval queries: a cold fit reads the event tables
+    return traced_sql('extremes', json.dumps(params), run)
+
+
+def _round(value: float) -> Optional[float]:
+    return round(float(value), 1) if np.isfinite(value) else None
+
+
+def return_level_insights(records: List[Dict[str, Any]]) -> List[str]:
+    """Template Technical Insights for return-level records."""
+    insights: List[str] = []
+    for etype in ('heat', 'cold'):
+        rows = [r for r in records if r['Type'] == etype and r['T'] is not None]
+        if not rows:
+            continue
+        label = 'heat wave' if etype == 'heat' else 'cold snap'
+        period = max(r['return_period'] for r in rows)
+        at_period = [r for r in rows if r['return_period'] == period]
+        extreme = (max if etype == 'heat' else min)(at_period, key=lambda r: r['T'])
+        name = STRING_ID_TO_SUBNAME.get(extreme['ID'], extreme['ID'])
+        insights.append(f"The most severe 1-in-{period} year {label} is in {name} at {extreme['T']:.1f}°F.")
+        widest = max((r for r in at_period if r['SC'] is not None), key=lambda r: r['SC'], default=None)
+        if widest:
+            insights.append(f"{STRING_ID_TO_SUBNAME.get(widest['ID'], widest['ID'])} has the widest 1-in-{period} "
+                            f"year {label} coverage, {widest['SC']:.1f}% of the region.")
+        longest = max((r for r in at_period if r['duration'] is not None), key=lambda r: r['duration'], default=None)
+        if longest:
+            insights.append(f"The longest 1-in-{period} year {label} lasts about {longest['duration']:.0f} days, "
+                            f"in {STRING_ID_TO_SUBNAME.get(longest['ID'], longest['ID'])}.")
+    if records:
+        fewest = min(r['fit_years'] for r in records)
+        insights.append(f"Levels come from GEV fits to annual extremes; the shortest record has {fewest} years "
+                        f"with events, so levels beyond about {4 * fewest} years are extrapolated.")
+    return insights
@@ -0,0 +1,240 @@
+"""
+Lightweight rule-based parsing of planner questions into a canonical intent.
+
+The intent captures the slots that event questions vary on (event type,
+regions, N, year bounds) so that questions differing only in those values
+share an intent "shape".
+"""
+import re
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from utils.regions import expand_with_neighbors, find_region_mentions, neighbors_available, NAME_TO_ID
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'fifteen': 15,
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'hundred': 100,
+}
+
+HEAT_WORDS = ('heat wave', 'heatwave', 'heat-wave', 'hot spell', 'heat event')
+COLD_WORDS = ('cold snap', 'coldsnap', 'cold wave', 'coldwave', 'cold-wave', 'cold spell', 'cold event', 'freeze')
+
+# Words that may appear in a question without changing the query it needs.
+# Anything else marks the intent as inexact so cached plans are not reused.
+FILLER_WORDS = {
+    'what', 'whats', "what's", 'are', 'is', 'was', 'were', 'the', 'a', 'an', 'of', 'in', 'for', 'my',
+    'our', 'service', 'territory', 'region', 'regions', 'area', 'worst', 'top', 'most', 'severe',
+    'extreme', 'historical', 'historic', 'heat', 'wave', 'waves', 'heatwave', 'heatwaves', 'cold',
+    'snap', 'snaps', 'coldsnap', 'coldsnaps', 'coldwave', 'coldwaves', 'spell', 'spells', 'event',
+    'events', 'all', 'after', 'since', 'from', 'before', 'until', 'between', 'and', 'to', 'year',
+    'years', 'show', 'me', 'list', 'give', 'find', 'get', 'please', 'which', 'hottest', 'coldest', 'spatial',
+    'extent', 'coverage', 'widest', 'nerc', 'hot', 'freeze', 'freezes', 'ever', 'recorded', 'with', 'their',
+}
+
+# "with the most spatial coverage": events ranked by coverage instead of severity
+COVERAGE_PATTERN = re.compile(r"\b(?:spatial(?:ly)?|coverage|extent|widest|widespread)\b")
+# Plural event nouns; "worst heat wave" without them asks for a single event
+PLURAL_PATTERN = re.compile(r"\b(?:heat[\s-]?waves|cold[\s-]?(?:snaps|waves)|(?:hot|cold) spells|events|freezes)\b")
+
+# "RFC and neighbouring regions": expanded to adjacent regions from the region graph
+NEIGHBOR_PATTERN = re.compile(r"\b(?:neighbou?r(?:ing|s)?|adjacent|bordering|surrounding)\b")
+NEIGHBOR_WORDS = {'neighbour', 'neighbours', 'neighbouring', 'neighbor', 'neighbors', 'neighboring', 'adjacent',
+                  'bordering', 'surrounding', 'its', 'plus'}
+
+# "hit RFC and SPP at the same time": co-occurrence clusters from the interval index
+CONCURRENT_PATTERN = re.compile(r"\b(?:at the same time|simultaneous(?:ly)?|concurrent(?:ly)?|co-?occurr(?:ing|ed|ent)"
+                                r"|overlapping|at once)\b")
+CONCURRENT_WORDS = {'at', 'same', 'time', 'simultaneous', 'simultaneously', 'concurrent', 'concurrently', 'co',
+                    'occurring', 'occurred', 'cooccurring', 'overlapping', 'once', 'hit', 'hitting', 'struck',
+                    'affected', 'multiple', 'several', 'across', 'cluster', 'clusters', 'together', 'did', 'that'}
+
+# "1-in-50 year heat wave", "100-year cold snap", "return levels": return levels from extreme-value fits
+RETURN_PERIOD_PATTERN = re.compile(r"\b(?:1|one)[\s-]+in[\s-]+(\d+)(?:[\s-]+years?)?\b"
+                                   r"|\b(\d+)[\s-]*(?:year|yr)\b(?=[\s-]+(?:return|heat|cold|freeze|event|extreme|level))"
+                                   r"|\breturn[\s-]+period\s+(?:of\s+)?(\d+)\b")
+RETURN_LEVEL_PATTERN = re.compile(r"\breturn[\s-]+(?:levels?|periods?)\b")
+RETURN_WORDS = {'in', 'yr', 'return', 'level', 'levels', 'period', 'periods', 'expected', 'design', 'severity',
+                'temperature', 'duration', 'statistics', 'how', 'bad', 'would', 'be', 'could', 'get', 'one'}
+
+# "active on 2012-07-05" / "on July 5, 2012": events active on a day
+MONTHS = {name: i for i, names in enumerate((
+    ('january', 'jan'), ('february', 'feb'), ('march', 'mar'), ('april', 'apr'), ('may',), ('june', 'jun'),
+    ('july', 'jul'), ('august', 'aug'), ('september', 'sep', 'sept'), ('october', 'oct'),
+    ('november', 'nov'), ('december', 'dec')), 1) for name in names}
+ACTIVE_WORDS = {'on', 'active', 'ongoing', 'underway', 'during', 'happening', 'occurring'} | set(MONTHS)
+
+
+def _extract_n(text: str) -> Optional[int]:
+    """Extract the requested number of events ("10 worst", "worst five", "top 20")."""
+    number = r'(\d+|' + '|'.join(NUMBER_WORDS) + r')'
+    patterns = (
+        rf'\b(?:worst|top|most severe|hottest|coldest)\s+{number}\b',
+        rf'\b{number}\s+(?:worst|most severe|hottest|coldest|top)\b',
+        rf'\b{number}(?:th|st|nd|rd)?\s+worst\b',
+    )
+    for pattern in patterns:
+        m = re.search(pattern, text)
+        if m:
+            value = m.group(1)
+            n = int(value) if value.isdigit() else NUMBER_WORDS[value]
+            # Ignore years caught by the pattern ("worst 2012 heat wave")
+            return n if n < 1900 else None
+    return None
+
+
+def extract_years(text: str):
+    """Extract (start_year, end_year) bounds on event start dates, both inclusive."""
+    year = r'((?:18|19|20)\d{2})'
+    m = re.search(rf'\bbetween\s+(?:year\s+)?{year}\s+and\s+{year}\b', text) or \
+        re.search(rf'\bfrom\s+(?:year\s+)?{year}\s+(?:to|until|through)\s+{year}\b', text)
+    if m:
+        return int(m.group(1)), int(m.group(2))
+    start = end = None
+    m = re.search(rf'\bafter\s+(?:the\s+)?(?:year\s+)?{year}\b', text)
+    if m:
+        start = int(m.group(1)) + 1
+    m = re.search(rf'\b(?:since|from)\s+(?:the\s+)?(?:year\s+)?{year}\b', text)
+    if m:
+        start = int(m.group(1))
+    m = re.search(rf'\bbefore\s+(?:the\s+)?(?:year\s+)?{year}\b', text)
+    if m:
+        end = int(m.group(1)) - 1
+    m = re.search(rf'\b(?:until|through)\s+(?:the\s+)?(?:year\s+)?{year}\b', text)
+    if m:
+        end = int(m.group(1))
+    if start is None and end is None:
+        m = re.search(rf'\bin\s+(?:the\s+)?(?:year\s+)?{year}\b', text)
+        if m:
+            start = end = int(m.group(1))
+    return start, end
+
+
+def _extract_date(text: str) -> Optional[str]:
+    """Extract a single day ("2012-07-05", "July 5, 2012", "5 July 2012") as YYYY-MM-DD."""
+    month = r'(' + '|'.join(sorted(MONTHS, key=len, reverse=True)) + r')\.?'
+    m = re.search(r'\b((?:18|19|20)\d{2})-(\d{1,2})-(\d{1,2})\b', text)
+    if m:
+        year, month_number, day = (int(v) for v in m.groups())
+    else:
+        m = re.search(rf'\b{month}\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+((?:18|19|20)\d{{2}})\b', text)
+        if m:
+            month_number, day, year = MONTHS[m.group(1)], int(m.group(2)), int(m.group(3))
+        else:
+            m = re.search(rf'\b(\d{{1,2}})(?:st|nd|rd|th)?\s+{month}\s+((?:18|19|20)\d{{2}})\b', text)
+            if not m:
+                return None
+            day, month_number, year = int(m.group(1)), MONTHS[m.group(2)], int(m.group(3))
+    try:
+        return date(year, month_number, day).isoformat()
+    except ValueError:
+        return None
+
+
+def _is_exact(text: str, extra_words=frozenset()) -> bool:
+    """Return True if every word is a recognised slot value or filler word."""
+    residual = text
+    for name in sorted(NAME_TO_ID, key=len, reverse=True):
+        residual = re.sub(r'(?<![a-z0-9])' + re.escape(name.lower()).replace(r'\ ', r'[\s-]+') + r'(?![a-z0-9])', ' ', residual)
+    residual = re.sub(r'\b(?:\d+(?:th|st|nd|rd)?|' + '|'.join(NUMBER_WORDS) + r')\b', ' ', residual)
+    words = re.findall(r"[a-z']+", residual)
+    return all(w in FILLER_WORDS or w in extra_words for w in words)
+
+
+def parse_intent(question: str) -> Dict[str, Any]:
+    """
+    Parse a question into a canonical intent.
+
+    Args:
+        question (str): The user's question
+
+    Returns:
+        dict: Intent with keys kind ('worst', 'all', 'concurrent' for events
+        at the same time in several regions, 'active' for events active on
+        a day, or 'return_level' for "1-in-N year" levels), event_type
+        ('heat', 'cold' or None), order ('severity', or 'spatial_coverage'
+        when events are ranked by coverage), region_ids, neighbor_ids (regions added
+        from the region graph when the question asks for neighbours of the
+        named ones without listing them), n (1 for a single "worst heat wave"),
+        start_year, end_year, on_date (YYYY-MM-DD for 'active'),
+        return_period (N years, or None for the default periods) and exact
+        (True when the question contains nothing beyond these slots and no
+        regions were inferred)
+    """
+    text = ' '.join(question.lower().split())
+    is_heat = any(w in text for w in HEAT_WORDS)
+    is_cold = any(w in text for w in COLD_WORDS)
+    event_type = 'heat' if is_heat and not is_cold else 'cold' if is_cold and not is_heat else None
+    n = _extract_n(text)
+    start_year, end_year = extract_years(text)
+    kind = 'worst' if (n is not None or re.search(r'\b(worst|most severe|hottest|coldest)\b', text)) else 'all'
+    if kind == 'worst' and n is None and not PLURAL_PATTERN.search(text):
+        n = 1
+    order = 'spatial_coverage' if COVERAGE_PATTERN.search(text) else 'severity'
+    on_date = _extract_date(text)
+    return_match = RETURN_PERIOD_PATTERN.search(text)
+    return_period = int(next(g for g in return_match.groups() if g)) if return_match else None
+    extra_words = frozenset()
+    if return_period or RETURN_LEVEL_PATTERN.search(text):
+        kind, extra_words = 'return_level', frozenset(RETURN_WORDS)
+    elif on_date:
+        kind, extra_words = 'active', frozenset(ACTIVE_WORDS)
+        start_year = end_year = None
+    elif CONCURRENT_PATTERN.search(text):
+        kind, extra_words = 'concurrent', frozenset(CONCURRENT_WORDS)
+    mentions = find_region_mentions(text)
+    region_ids: List[str] = list(dict.fromkeys(rid for _, rid in mentions))
+    neighbor_ids: List[str] = []
+    inferred = False
+    neighbor_match = NEIGHBOR_PATTERN.search(text)
+    if region_ids and neighbor_match:
+        anchors = [rid for offset, rid in mentions if offset < neighbor_match.start()]
+        if anchors and len(anchors) < len(mentions):
+            # "RFC and neighbouring regions of MRO US, GATEWAY": the neighbours are listed
+            extra_words = extra_words | NEIGHBOR_WORDS
+        elif neighbors_available():
+            # "RFC and its neighbours", "neighbours of RFC": expanded from the region graph
+            expanded = expand_with_neighbors(region_ids)
+            neighbor_ids = expanded[len(region_ids):]
+            region_ids = expanded
+            inferred = True
+    return {
+        'kind': kind,
+        'event_type': event_type,
+        'order': order,
+        'region_ids': region_ids,
+        'neighbor_ids': neighbor_ids,
+        'n': n,
+        'start_year': start_year,
+        'end_year': end_year,
+        'on_date': on_date,
+        'return_period': return_period,
+        # Inferred region sets are left to the agent, which is told the neighbours
+        'exact': event_type is not None and not inferred and _is_exact(text, extra_words),
+    }
+
+
+def intent_shape(intent: Dict[str, Any]) -> str:
+    """
+    Canonical key for an intent with slot values abstracted away.
+
+    "worst 10 heat waves in RFC" and "worst 5 heat waves in ERCOT" share the
+    shape 'worst|heat|order=severity|regions=1|n|start=-,end=-'; ranking by
+    coverage gives another shape.
+    """
+    return '|'.join([
+        intent['kind'],
+        intent['event_type'] or 'any',
+        f"order={intent.get('order', 'severity')}",
+        f"regions={len(intent['region_ids'])}",
+        'n' if intent['n'] is not None else '-',
+        _year_shape(intent),
+    ])
+
+
+def _year_shape(intent: Dict[str, Any]) -> str:
+    """Shape of the year bounds: a single year, an open/closed range, or none."""
+    start, end = intent['start_year'], intent['end_year']
+    if start is not None and start == end:
+        return 'year'
+    return 'start=' + ('y' if start is not None else '-') + ',end=' + ('y' if end is not None else '-')
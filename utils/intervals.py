@@ -0,0 +1,355 @@
+"""
+In-memory interval index over heat wave and cold snap events.
+
+Simultaneity questions ("which heat waves hit RFC, MRO US and SPP at the
+same time", "which cold snaps were active on 2021-02-15") need date-range
+self-joins in SQL. Instead, each event table is loaded once per process into
+NumPy arrays sorted by start day, with a running maximum of end days. An
+overlap query is then two binary searches plus one vectorized filter of the
+candidate slice. Co-occurrence clusters come from one sweep over the sorted
+starts and ends: a cluster is a set of events that are all active during a
+common window, and that window is reported as the cluster span. The index is rebuilt when the
+'events' cache namespace is invalidated (e.g. by catalog.incremental).
+
+Results use the compact DS/DE/T/SC/ID/Type records of the event query path,
+plus a 'cluster' number and the cluster's 'cluster_start'/'cluster_end'
+window for co-occurrence clusters.
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from utils.agent_trace import traced_sql
+from utils.cache_backend import namespace_generation
+from utils.database import EVENT_TABLES, get_column, get_event_table
+from utils.metrics import SQL_LATENCY, SQL_QUERIES
+from config.config import EVENT_QUERY_MAX_ROWS
+
+# Orders for co-occurrence clusters: most regions first, most severe first, or chronological
+CLUSTER_ORDERS = ('regions', 'severity', 'start_date')
+DEFAULT_CLUSTER_LIMIT = 10
+
+
+def _day_numbers(values) -> np.ndarray:
+    """Dates as int64 days since 1970-01-01."""
+    return pd.to_datetime(pd.Series(values), format='mixed').to_numpy('datetime64[D]').astype(np.int64)
+
+
+def _day_string(days: np.ndarray) -> List[str]:
+    return np.datetime_as_string(np.asarray(days).astype('datetime64[D]')).tolist()
+
+
+class EventIntervalIndex:
+    """
+    Events of one type sorted by start day, for overlap and co-occurrence queries.
+
+    Args:
+        event_type (str): 'heat' or 'cold'
+        starts (array): Event start dates
+        ends (array): Event end dates (inclusive)
+        temperatures (array): Event temperatures (°F)
+        coverages (array): Spatial coverages (%)
+        region_ids (array): NERC region string IDs
+    """
+
+    def __init__(self, event_type: str, starts, ends, temperatures, coverages, region_ids):
+        self.event_type = event_type
+        starts, ends = _day_numbers(starts), _day_numbers(ends)
+        region_ids = np.asarray([str(r) for r in region_ids], dtype=object)
+        order = np.lexsort((region_ids, starts))
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.temperatures = np.asarray(temperatures, np.float64)[order]
+        self.coverages = np.asarray(coverages, np.float64)[order]
+        self.region_ids = region_ids[order]
+        # Region codes for distinct-region counts; running max end bounds the candidates of a day
+        self.regions, self.region_codes = np.unique(self.region_ids, return_inverse=True)
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _mask(self, region_ids: Optional[Sequence[str]] = None, start_year: Optional[int] = None,
+              end_year: Optional[int] = None) -> np.ndarray:
+        """Events in the given regions whose start year is within the bounds."""
+        mask = np.ones(len(self), dtype=bool)
+        if region_ids:
+            mask &= np.isin(self.region_ids, [str(r) for r in region_ids])
+        if start_year is not None:
+            mask &= self.starts >= _day_numbers([f"{int(start_year):04d}-01-01"])[0]
+        if end_year is not None:
+            mask &= self.starts < _day_numbers([f"{int(end_year) + 1:04d}-01-01"])[0]
+        return mask
+
+    def overlapping(self, first_day, last_day=None, region_ids: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Events overlapping a date range.
+
+        Args:
+            first_day (str | date): First day of the range
+            last_day (str | date): Last day of the range (first_day when omitted)
+            region_ids (list): Regions to restrict to (all when omitted)
+
+        Returns:
+            np.ndarray: Positions of the events, in start order
+        """
+        first, last = _day_numbers([first_day, first_day if last_day is None else last_day])
+        # Events starting after the range cannot overlap it; nor can any event before the
+        # first one whose running max end reaches the range
+        lo = np.searchsorted(self.max_ends, first, side='left')
+        hi = np.searchsorted(self.starts, last, side='right')
+        positions = lo + np.flatnonzero(self.ends[lo:hi] >= first)
+        if region_ids:
+            positions = positions[np.isin(self.region_ids[positions], [str(r) for r in region_ids])]
+        return positions
+
+    def clusters(self, region_ids: Optional[Sequence[str]] = None, min_regions: int = 2,
+                 start_year: Optional[int] = None, end_year: Optional[int] = None):
+        """
+        Co-occurrence clusters: events that are all active on the same days.
+
+        A sweep over event starts and ends finds the windows in which the set of active
+        events is maximal, i.e. a start is followed directly by an end. Each window whose
+        events span at least min_regions regions is a cluster, with the window as its span.
+        An event can belong to several clusters.
+
+        Args:
+            region_ids (list): Regions to consider (all when omitted)
+            min_regions (int): Minimum number of distinct regions in a cluster
+            start_year (int): First event start year (inclusive)
+            end_year (int): Last event start year (inclusive)
+
+        Returns:
+            tuple: (event positions, cluster number of each, starting at 0 in chronological
+                order, and (first day, last day) arrays of the common window of each cluster)
+        """
+        positions = np.flatnonzero(self._mask(region_ids, start_year, end_year))
+        empty = np.empty(0, np.int64)
+        if not len(positions):
+            return empty, empty, (empty, empty)
+        starts, ends = self.starts[positions], self.ends[positions] + 1
+        # Sweep order: by day, with an event ending the day before another starts processed first
+        days = np.concatenate([starts, ends])
+        is_start = np.r_[np.ones(len(starts), bool), np.zeros(len(ends), bool)]
+        order = np.lexsort((is_start, days))
+        days, is_start = days[order], is_start[order]
+        opens = np.flatnonzero(is_start[:-1] & ~is_start[1:])
+        window_start, window_end = days[opens], days[opens + 1]
+
+        # Windows are disjoint and ordered, so the windows an event covers are a contiguous range
+        first = np.searchsorted(window_start, starts, side='left')
+        count = np.maximum(np.searchsorted(window_end, ends, side='right') - first, 0)
+        member = np.repeat(np.arange(len(positions)), count)
+        window = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count - first, count)
+
+        codes = self.region_codes[positions][member]
+        pairs = np.unique(window * len(self.regions) + codes)
+        distinct = np.bincount(pairs // len(self.regions), minlength=len(window_start))
+        kept = distinct >= max(int(min_regions), 1)
+        number = np.cumsum(kept) - 1
+        keep = kept[window]
+        member, window = member[keep], window[keep]
+        order = np.lexsort((member, window))
+        return (positions[member[order]], number[window[order]],
+                (window_start[kept], window_end[kept] - 1))
+
+    def records(self, positions: np.ndarray, cluster: Optional[np.ndarray] = None,
+                windows=None) -> List[Dict[str, Any]]:
+        """
+        Compact DS/DE/T/SC/ID/Type records of events.
+
+        Args:
+            positions (np.ndarray): Event positions
+            cluster (np.ndarray): Cluster number of each event, added as 'cluster'
+            windows (tuple): (first day, last day) arrays of each event's cluster window, added
+                as 'cluster_start' and 'cluster_end'
+
+        Returns:
+            list: Records in the order of positions
+        """
+        records = [{'DS': ds, 'DE': de, 'T': round(float(t), 1), 'SC': round(float(sc), 1), 'ID': rid,
+                    'Type': self.event_type}
+                   for ds, de, t, sc, rid in zip(_day_string(self.starts[positions]), _day_string(self.ends[positions]),
+                                                 self.temperatures[positions], self.coverages[positions],
+                                                 self.region_ids[positions])]
+        if cluster is not None:
+            for record, number in zip(records, cluster.tolist()):
+                record['cluster'] = number
+        if windows is not None:
+            for record, first, last in zip(records, _day_string(windows[0]), _day_string(windows[1])):
+                record['cluster_start'], record['cluster_end'] = first, last
+        return records
+
+
+def load_event_index(engine, event_type: str) -> EventIntervalIndex:
+    """
+    Read an event table into an interval index.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+        event_type (str): 'heat' or 'cold'
+
+    Returns:
+        EventIntervalIndex: Index over every event of the table
+    """
+    table = get_event_table(engine, event_type)
+    columns = [get_column(table, name) for name in ('start_date', 'end_date', 'temperature', 'spatial_coverage', 'NERC_ID')]
+    SQL_QUERIES.inc(source='intervals')
+    with engine.connect() as conn, SQL_LATENCY.time(source='intervals'):
+        rows = conn.execute(select(*columns)).fetchall()
+    values = list(zip(*rows)) if rows else [[]] * 5
+    return EventIntervalIndex(event_type, *values)
+
+
+@lru_cache(maxsize=8)
+def _cached_index(engine, event_type: str, generation: str) -> EventIntervalIndex:
+    return load_event_index(engine, event_type)
+
+
+def event_index(engine, event_type: str) -> EventIntervalIndex:
+    """The interval index of an event table, built once per process and 'events' cache generation."""
+    return _cached_index(engine, event_type, namespace_generation('events'))
+
+
+def _event_types(event_type: str) -> List[str]:
+    event_type = str(event_type).strip().lower()
+    if event_type == 'both':
+        return list(EVENT_TABLES)
+    if event_type not in EVENT_TABLES:
+        raise ValueError(f"Unknown event type '{event_type}'. Use 'heat', 'cold' or 'both'")
+    return [event_type]
+
+
+def active_events(engine, event_type: str, first_day, last_day=None,
+                  region_ids: Optional[Sequence[str]] = None,
+                  limit: int = EVENT_QUERY_MAX_ROWS) -> List[Dict[str, Any]]:
+    """
+    Events active on a day, or overlapping a date range.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+        event_type (str): 'heat', 'cold' or 'both'
+        first_day (str | date): Day (or first day of the range), YYYY-MM-DD
+        last_day (str | date): Last day of the range (inclusive); first_day when omitted
+        region_ids (list): NERC string IDs to restrict to (None for all regions)
+        limit (int): Maximum events per event type
+
+    Returns:
+        list: Compact event records in start order
+    """
+    event_types = _event_types(event_type)
+    limit = max(1, min(int(limit), EVENT_QUERY_MAX_ROWS))
+    params = ['active', event_types, str(first_day), str(last_day or first_day), sorted(map(str, region_ids or [])), limit]
+
+    def run():
+        records: List[Dict[str, Any]] = []
+        for etype in event_types:
+            index = event_index(engine, etype)
+            records.extend(index.records(index.overlapping(first_day, last_day, region_ids)[:limit]))
+        return records
+
+    return traced_sql('intervals', json.dumps(params), run)
+
+
+def concurrent_events(engine, event_type: str, region_ids: Optional[Sequence[str]] = None,
+                      min_regions: Optional[int] = None, start_year: Optional[int] = None,
+                      end_year: Optional[int] = None, order_by: str = 'regions',
+                      limit: int = DEFAULT_CLUSTER_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Events that co-occur across regions, grouped into numbered clusters.
+
+    A cluster is a set of events that are all active during a common window
+    (see EventIntervalIndex.clusters). Clusters covering fewer than
+    min_regions distinct regions are dropped.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+        event_type (str): 'heat', 'cold' or 'both'
+        region_ids (list): Regions to consider (None for all regions)
+        min_regions (int): Minimum distinct regions per cluster; every given region by
+            default, or 2 when no regions are given
+        start_year (int): First event start year (inclusive)
+        end_year (int): Last event start year (inclusive)
+        order_by (str): One of CLUSTER_ORDERS
+        limit (int): Maximum clusters per event type
+
+    Returns:
+        list: Compact event records with a 'cluster' number (1 = first cluster in order_by order)
+            and the cluster's common window ('cluster_start', 'cluster_end')
+    """
+    if order_by not in CLUSTER_ORDERS:
+        raise ValueError(f"Cannot order clusters by '{order_by}'. Use one of: {', '.join(CLUSTER_ORDERS)}")
+    event_types = _event_types(event_type)
+    region_ids = [str(r) for r in region_ids or []]
+    if min_regions is None:
+        min_regions = len(set(region_ids)) if len(set(region_ids)) >= 2 else 2
+    limit = max(1, int(limit))
+    params = ['clusters', event_types, sorted(region_ids), min_regions, start_year, end_year, order_by, limit]
+
+    def run():
+        records: List[Dict[str, Any]] = []
+        offset = 1
+        for etype in event_types:
+            index = event_index(engine, etype)
+            positions, cluster, (first_days, last_days) = index.clusters(region_ids, min_regions, start_year,
+                                                                         end_year)
+            if not len(positions):
+                continue
+            ranked = _rank_clusters(index, positions, cluster, order_by)[:limit]
+            # Renumber the kept clusters in rank order and list their events cluster by cluster
+            number = np.full(cluster.max() + 1, -1)
+            number[ranked] = np.arange(len(ranked))
+            keep = number[cluster] >= 0
+            positions, windows = positions[keep], (first_days[cluster[keep]], last_days[cluster[keep]])
+            cluster = number[cluster[keep]]
+            order = np.argsort(cluster, kind='stable')
+            records.extend(index.records(positions[order], cluster[order] + offset,
+                                         (windows[0][order], windows[1][order])))
+            offset += len(ranked)
+        return records[:EVENT_QUERY_MAX_ROWS]
+
+    return traced_sql('intervals', json.dumps(params), run)
+
+
+def _rank_clusters(index: EventIntervalIndex, positions: np.ndarray, cluster: np.ndarray, order_by: str) -> np.ndarray:
+    """Cluster numbers in the requested order."""
+    count = cluster.max() + 1
+    if order_by == 'start_date':
+        return np.arange(count)
+    # Peak severity per cluster: hottest member for heat waves, coldest for cold snaps
+    sign = 1.0 if index.event_type == 'heat' else -1.0
+    severity = np.full(count, -np.inf)
+    np.maximum.at(severity, cluster, sign * index.temperatures[positions])
+    if order_by == 'severity':
+        return np.lexsort((np.arange(count), -severity))
+    codes = index.region_codes[positions]
+    pairs = np.unique(cluster * len(index.regions) + codes)
+    distinct = np.bincount(pairs // len(index.regions), minlength=count)
+    return np.lexsort((np.arange(count), -severity, -distinct))
+
+
+def answer_from_intervals(intent: Dict[str, Any], engine) -> Optional[List[Dict[str, Any]]]:
+    """
+    Answer a parsed 'concurrent' or 'active' question directly from the interval index.
+
+    Clusters must span every named region, or two regions when one region (plus
+    its neighbours) or none is named.
+
+    Returns:
+        list | None: Compact event records, or None if the intent is not a simultaneity question
+    """
+    if intent['event_type'] is None:
+        return None
+    if intent['kind'] == 'active':
+        return active_events(engine, intent['event_type'], intent['on_date'],
+                             region_ids=intent['region_ids'] or None)
+    if intent['kind'] == 'concurrent':
+        named = len(intent['region_ids']) - len(intent.get('neighbor_ids') or [])
+        return concurrent_events(engine, intent['event_type'], intent['region_ids'] or None, max(named, 2),
+                                 intent['start_year'], intent['end_year'],
+                                 limit=intent['n'] or DEFAULT_CLUSTER_LIMIT)
+    return None
@@ -0,0 +1,315 @@
+"""
+Prometheus-style metrics for throughput, latency and cache efficiency.
+
+A small dependency-free registry of counters, gauges and histograms with
+labels, rendered in the Prometheus text exposition format. The exposition is
+served over HTTP on METRICS_PORT (scrape http://host:port/metrics) and/or
+written periodically to METRICS_FILE for a node-exporter textfile collector.
+Instrumentation lives next to the code it measures (llm_service, database,
+visualization, cache layers); this module only stores and exposes values.
+"""
+import atexit
+import bisect
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config.config import METRICS_FILE, METRICS_FILE_INTERVAL_SECONDS, METRICS_HOST, METRICS_PORT
+
+# Latency buckets in seconds, from local cache hits to multi-step agent runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+_REGISTRY: List["_Metric"] = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return '\n'.join(lines + self.samples())
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally labelled."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the gauge from a callback at scrape time."""
+        self._function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        """Increment while the block runs (e.g. questions in flight)."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                value = None
+            return [] if value is None else [f"{self.name} {_format_number(value)}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram of observations (latencies in seconds)."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            counts[0][bisect.bisect_left(self.buckets, value)] += 1
+            counts[1] += value
+            counts[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def _process_rss_bytes() -> Optional[float]:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+# Application metrics
+QUESTIONS = Counter('gridcopilot_questions_total', 'Questions answered, by answer path', ['path'])
+STAGE_LATENCY = Histogram('gridcopilot_stage_latency_seconds', 'Latency of pipeline stages', ['stage'])
+LLM_CALLS = Counter('gridcopilot_llm_calls_total', 'Chat completion calls, by purpose', ['purpose'])
+MODEL_ANSWERS = Counter('gridcopilot_model_answers_total', 'Agent runs per model tier, by outcome', ['tier', 'outcome'])
+MODEL_LATENCY = Histogram('gridcopilot_model_latency_seconds', 'Agent run latency per model tier', ['tier'])
+SQL_QUERIES = Counter('gridcopilot_sql_queries_total', 'SQL statements executed against the database', ['source'])
+SQL_LATENCY = Histogram('gridcopilot_sql_latency_seconds', 'SQL execution latency', ['source'])
+CACHE_REQUESTS = Counter('gridcopilot_cache_requests_total', 'Cache lookups, by cache layer and result', ['cache', 'result'])
+QUESTIONS_IN_FLIGHT = Gauge('gridcopilot_questions_in_flight', 'Questions currently being answered (queue depth)')
+ACTIVE_SESSIONS = Gauge('gridcopilot_active_sessions', 'Streamlit sessions with live session state')
+PROCESS_RSS = Gauge('gridcopilot_process_resident_memory_bytes', 'Resident memory of the app process',
+                    function=_process_rss_bytes)
+PROCESS_START = Gauge('gridcopilot_process_start_time_seconds', 'Start time of the app process (unix epoch)')
+PROCESS_START.set(time.time())
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a lookup in a cache layer as a hit or a miss."""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+    return '\n'.join(m.render() for m in metrics) + '\n'
+
+
+def process_metrics_path(path: str = METRICS_FILE) -> str:
+    """Per-process exposition file, so replicas on one host do not overwrite each other ('m.prom' -> 'm.<pid>.prom')."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def _with_instance_label(text: str, pid: int) -> str:
+    """Add a pid label to every sample, keeping series from different replica files distinct."""
+    lines = []
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, _, rest = line.rpartition(' ')
+            if name.endswith('}'):
+                name = f'{name[:-1]},pid="{pid}"}}'
+            else:
+                name = f'{name}{{pid="{pid}"}}'
+            line = f'{name} {rest}'
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics_file(path: str = METRICS_FILE):
+    """Atomically write the exposition to a file (textfile collector format), with a pid label."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(tmp, 'w') as f:
+        f.write(_with_instance_label(render_metrics(), os.getpid()))
+    os.replace(tmp, path)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def _write_file_forever(path: str, interval: float):
+    while True:
+        try:
+            write_metrics_file(path)
+        except OSError:
+            pass
+        time.sleep(interval)
+
+
+def start_metrics_exporter(port: int = METRICS_PORT, path: str = METRICS_FILE) -> Optional[int]:
+    """
+    Start the metrics HTTP endpoint and/or file writer once per process.
+
+    Args:
+        port (int): Port for /metrics (0 disables the endpoint)
+        path (str): Exposition file path ('' disables the file writer); each process
+            writes its own file (process_metrics_path)
+
+    Returns:
+        int | None: Port the endpoint is listening on, or None if not serving
+    """
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return None
+        _exporter_started = True
+    if path:
+        path = process_metrics_path(path)
+        # Files of exited replicas would otherwise be collected forever
+        atexit.register(_remove_file, path)
+        threading.Thread(target=_write_file_forever, args=(path, METRICS_FILE_INTERVAL_SECONDS),
+                         name='gridcopilot-metrics-file', daemon=True).start()
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((METRICS_HOST, port), _MetricsHandler)
+    except OSError as e:
+        # Usually another replica on this host already owns the port
+        print(f"Metrics endpoint not started: cannot bind {METRICS_HOST}:{port} ({e}). "
+              f"Give each replica its own METRICS_PORT.", file=sys.stderr)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='gridcopilot-metrics', daemon=True).start()
+    return server.server_address[1]
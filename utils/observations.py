@@ -0,0 +1,124 @@
+"""
+Compact tool observations for the agent and an in-process store of full results.
+
+Query results are fed back to the LLM as a header plus pipe-delimited typed
+rows instead of Python reprs. Results above a row threshold are summarized
+(row count, per-column statistics, a short preview) and the full rows are
+kept in a bounded store under a short handle, so the app can render the
+complete table and map without the model copying every row.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config.config import OBSERVATION_ROW_THRESHOLD, OBSERVATION_PREVIEW_ROWS, RESULT_STORE_MAX_ENTRIES
+
+_RESULTS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_LOCK = threading.Lock()
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+
+def put_result(columns: Sequence[str], rows: Sequence[Sequence[Any]], records: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Store a full query result and return its handle.
+
+    Args:
+        columns (list): Column names
+        rows (list): Row tuples
+        records (list): Compact event records, when already known (get_events)
+
+    Returns:
+        str: Handle such as 'r1a2b3c4'
+    """
+    rows = [tuple(r) for r in rows]
+    # Derived from the content so identical results (and recorded agent runs) get the same handle
+    handle = 'r' + hashlib.sha1(repr((list(columns), rows)).encode('utf-8')).hexdigest()[:8]
+    with _LOCK:
+        _RESULTS[handle] = {'columns': list(columns), 'rows': rows, 'records': records}
+        # Re-storing an existing result makes it the most recent too
+        _RESULTS.move_to_end(handle)
+        while len(_RESULTS) > RESULT_STORE_MAX_ENTRIES:
+            _RESULTS.popitem(last=False)
+    return handle
+
+
+def get_result(handle: str) -> Optional[Dict[str, Any]]:
+    """Return a stored result ({'columns', 'rows', 'records'}) or None if evicted."""
+    with _LOCK:
+        result = _RESULTS.get(str(handle).strip())
+        if result is not None:
+            _RESULTS.move_to_end(str(handle).strip())
+        return result
+
+
+def _format_value(value) -> str:
+    """Format a database value compactly (ISO dates, 1-decimal floats)."""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d') if value.time() == datetime.min.time() else value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (float, Decimal)):
+        return f"{float(value):.1f}"
+    return str(value).replace('|', '/').replace('\n', ' ')
+
+
+def _column_summary(name: str, values: List[Any]) -> str:
+    """One-line summary of a column: numeric range and mean, date range, or distinct values."""
+    present = [v for v in values if v is not None]
+    if not present:
+        return f"{name}: all empty"
+    if all(isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in present):
+        nums = [float(v) for v in present]
+        return f"{name}: min {min(nums):.1f}, max {max(nums):.1f}, mean {sum(nums) / len(nums):.1f}"
+    if all(isinstance(v, (date, datetime)) for v in present) or \
+            all(isinstance(v, str) and _ISO_DATE.match(v) for v in present):
+        return f"{name}: {_format_value(min(present))} .. {_format_value(max(present))}"
+    distinct = sorted({str(v) for v in present})
+    if len(distinct) > 12:
+        return f"{name}: {len(distinct)} distinct values"
+    return f"{name}: {len(distinct)} distinct ({', '.join(distinct)})"
+
+
+def format_observation(columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                       records: Optional[List[Dict[str, Any]]] = None,
+                       allow_handle: bool = True) -> str:
+    """
+    Format a query result as a compact observation for the LLM.
+
+    Args:
+        columns (list): Column names
+        rows (list): Row tuples
+        records (list): Compact event records to store alongside the rows
+        allow_handle (bool): Summarize large results behind a handle; when
+            False all rows are listed (the model has to copy them itself)
+
+    Returns:
+        str: Observation text
+    """
+    if not rows:
+        return "rows: 0"
+    header = 'columns: ' + '|'.join(columns)
+    if not allow_handle or len(rows) <= OBSERVATION_ROW_THRESHOLD:
+        body = '\n'.join('|'.join(_format_value(v) for v in row) for row in rows)
+        return f"rows: {len(rows)}\n{header}\n{body}"
+
+    handle = put_result(columns, rows, records)
+    preview = '\n'.join('|'.join(_format_value(v) for v in row) for row in rows[:OBSERVATION_PREVIEW_ROWS])
+    summary = '\n'.join('  ' + _column_summary(name, [row[i] for row in rows]) for i, name in enumerate(columns))
+    return (
+        f"rows: {len(rows)} (showing first {OBSERVATION_PREVIEW_ROWS}; full result stored as handle {handle})\n"
+        f"{header}\n{preview}\n"
+        f"summary:\n{summary}\n"
+        f"To return all {len(rows)} rows, call submit_events with result_handle=\"{handle}\" instead of listing them."
+    )
+
+
+def result_columns_and_rows(result) -> Tuple[List[str], List[tuple]]:
+    """Fetch column names and row tuples from a SQLAlchemy result."""
+    return list(result.keys()), [tuple(r) for r in result.fetchall()]
@@ -0,0 +1,233 @@
+"""
+Local follow-up refinement of a previous answer's events.
+
+Follow-ups such as "only after 2010", "sort by spatial coverage" or "top 10"
+are parsed into filter/sort/limit operations and executed with pandas on the
+events of the most recent answer, so the table and choropleth re-render
+without another agent run. Follow-ups that need data outside the previous
+result (new regions, other event types, more rows) are left to the agent.
+"""
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.analytics import compute_event_facts, template_insights
+from utils.intent import COLD_WORDS, HEAT_WORDS, NUMBER_WORDS, extract_years
+from utils.regions import find_region_ids, NAME_TO_ID
+from utils.response_formatter import build_event_response
+from utils.visualization import parse_temperature_json
+
+# Words that mark a question as a follow-up on the previous result
+FOLLOWUP_CUES = ('only', 'just', 'now', 'sort', 'sorted', 'order', 'filter', 'then', 'same', 'keep',
+                 'limit', 'narrow', 'restrict', 'of those', 'of these', 'among')
+
+FOLLOWUP_FILLER = {
+    'only', 'just', 'now', 'sort', 'sorted', 'order', 'ordered', 'filter', 'then', 'same', 'keep', 'limit',
+    'narrow', 'restrict', 'of', 'those', 'these', 'them', 'it', 'among', 'by', 'the', 'a', 'an', 'in', 'to',
+    'show', 'me', 'events', 'event', 'ones', 'results', 'with', 'where', 'that', 'are', 'is', 'and', 'but',
+    'please', 'after', 'since', 'from', 'before', 'until', 'through', 'between', 'year', 'years', 'top',
+    'first', 'worst', 'most', 'severe', 'ascending', 'descending', 'asc', 'desc', 'highest', 'lowest',
+    'largest', 'smallest', 'longest', 'shortest', 'hottest', 'coldest', 'spatial', 'coverage', 'temperature',
+    'temp', 'date', 'start', 'duration', 'severity', 'days', 'day', 'above', 'over', 'greater', 'more',
+    'than', 'below', 'under', 'less', 'at', 'least', 'longer', 'shorter', 'heat', 'wave', 'waves', 'heatwave',
+    'heatwaves', 'cold', 'snap', 'snaps', 'coldsnap', 'coldsnaps', 'coldwave', 'coldwaves', 'region',
+    'regions', 'for', 'what', 'about', 'how',
+}
+
+SORT_COLUMNS = {
+    'spatial coverage': 'spatial_coverage', 'coverage': 'spatial_coverage', 'temperature': 'temperature',
+    'temp': 'temperature', 'start date': 'start_date', 'date': 'start_date', 'duration': 'duration',
+    'severity': 'severity',
+}
+
+THRESHOLD_COLUMNS = {
+    'spatial coverage': 'spatial_coverage', 'coverage': 'spatial_coverage', 'temperature': 'temperature',
+    'temp': 'temperature', 'duration': 'duration',
+}
+
+_NUMBER = r'(\d+|' + '|'.join(NUMBER_WORDS) + r')'
+_GREATER = r'(?:above|over|greater than|more than|at least|>=|>)'
+_LESS = r'(?:below|under|less than|at most|<=|<)'
+
+
+def _to_int(value: str) -> int:
+    return int(value) if value.isdigit() else NUMBER_WORDS[value]
+
+
+def parse_followup(question: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a follow-up into local operations.
+
+    Args:
+        question (str): Follow-up question
+
+    Returns:
+        dict | None: Operations (start_year, end_year, region_ids, event_type,
+        thresholds, sort, descending, limit), or None if the question is not a
+        follow-up that can be answered from the previous result
+    """
+    text = ' '.join(question.lower().strip().rstrip('?.!').split())
+    if not text:
+        return None
+    mentions_type = any(w in text for w in HEAT_WORDS + COLD_WORDS)
+    has_cue = any(re.search(rf'\b{cue}\b', text) for cue in FOLLOWUP_CUES)
+    if mentions_type and not has_cue:
+        return None
+
+    ops: Dict[str, Any] = {'thresholds': []}
+    consumed = text
+
+    start, end = extract_years(text)
+    if start is not None or end is not None:
+        ops['start_year'], ops['end_year'] = start, end
+        consumed = re.sub(r'\b(?:18|19|20)\d{2}\b', ' ', consumed)
+
+    region_ids = find_region_ids(question)
+    if region_ids:
+        ops['region_ids'] = region_ids
+        for name in sorted(NAME_TO_ID, key=len, reverse=True):
+            consumed = re.sub(r'(?<![a-z0-9])' + re.escape(name.lower()).replace(r'\ ', r'[\s-]+') + r'(?![a-z0-9])', ' ', consumed)
+
+    if mentions_type:
+        is_heat = any(w in text for w in HEAT_WORDS)
+        is_cold = any(w in text for w in COLD_WORDS)
+        if is_heat != is_cold:
+            ops['event_type'] = 'heat' if is_heat else 'cold'
+
+    for label, column in THRESHOLD_COLUMNS.items():
+        for op, pattern in (('>', _GREATER), ('<', _LESS)):
+            m = re.search(rf'\b{label}\s+(?:is\s+|of\s+)?{pattern}\s+(-?\d+(?:\.\d+)?)\s*(?:%|percent|°f|f|degrees|days?)?', consumed)
+            if m:
+                ops['thresholds'].append((column, op, float(m.group(1))))
+                consumed = consumed.replace(m.group(0), ' ')
+    m = re.search(r'\b(longer|shorter) than\s+(\d+)\s*days?', consumed)
+    if m:
+        ops['thresholds'].append(('duration', '>' if m.group(1) == 'longer' else '<', float(m.group(2))))
+        consumed = consumed.replace(m.group(0), ' ')
+    m = re.search(rf'\b(?:at least|more than)\s+(\d+)\s*days?', consumed)
+    if m:
+        ops['thresholds'].append(('duration', '>', float(m.group(1)) - (1 if 'least' in m.group(0) else 0)))
+        consumed = consumed.replace(m.group(0), ' ')
+
+    sort_names = '|'.join(sorted(SORT_COLUMNS, key=len, reverse=True))
+    m = re.search(rf'\b(?:sort|sorted|order|ordered)\s+(?:them\s+|it\s+|these\s+|those\s+)?by\s+({sort_names})'
+                  rf'(?:\s+(ascending|descending|asc|desc|lowest first|highest first))?', consumed)
+    if m:
+        ops['sort'] = SORT_COLUMNS[m.group(1)]
+        if m.group(2):
+            ops['descending'] = m.group(2) in ('descending', 'desc', 'highest first')
+        consumed = consumed.replace(m.group(0), ' ')
+
+    m = re.search(rf'\b(?:top|first|worst|only|just)\s+(?:the\s+)?(?:worst\s+|top\s+|first\s+)?{_NUMBER}\b', consumed)
+    if m:
+        ops['limit'] = _to_int(m.group(1))
+        if re.search(r'\b(worst|top)\b', m.group(0)) and 'sort' not in ops:
+            ops['sort'] = 'severity'
+        consumed = consumed.replace(m.group(0), ' ')
+
+    # Every remaining word must be follow-up phrasing, otherwise let the agent answer
+    residual = re.sub(r'-?\d+(?:\.\d+)?', ' ', consumed)
+    words = re.findall(r"[a-z']+", residual)
+    if any(w not in FOLLOWUP_FILLER for w in words):
+        return None
+    if not (ops['thresholds'] or any(k in ops for k in ('start_year', 'end_year', 'region_ids', 'event_type', 'sort', 'limit'))):
+        return None
+    return ops
+
+
+def apply_followup(df: pd.DataFrame, ops: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """
+    Apply follow-up operations to a previous result with pandas.
+
+    Returns:
+        pd.DataFrame | None: Refined events, or None if the follow-up asks for
+        data outside the previous result (regions or event types not in it, or
+        more rows than it has)
+    """
+    # "top 10" after a 5-row answer needs events the previous result does not hold
+    if ops.get('limit') and ops['limit'] > len(df):
+        return None
+    d = df.copy()
+    d['start_date'] = pd.to_datetime(d['start_date'])
+    d['NERC_ID'] = d['NERC_ID'].astype(str)
+    if 'end_date' in d.columns:
+        d['duration'] = (pd.to_datetime(d['end_date'], errors='coerce') - d['start_date']).dt.days + 1
+    types = d['event_type'].astype(str).str.lower() if 'event_type' in d.columns else None
+
+    if ops.get('region_ids'):
+        if not set(ops['region_ids']) <= set(d['NERC_ID']):
+            return None
+        d = d[d['NERC_ID'].isin(ops['region_ids'])]
+    if ops.get('event_type'):
+        if types is None or ops['event_type'] not in set(types):
+            return None
+        d = d[types.loc[d.index] == ops['event_type']]
+    if ops.get('start_year') is not None:
+        d = d[d['start_date'].dt.year >= ops['start_year']]
+    if ops.get('end_year') is not None:
+        d = d[d['start_date'].dt.year <= ops['end_year']]
+    for column, op, value in ops.get('thresholds', []):
+        if column not in d.columns:
+            return None
+        values = pd.to_numeric(d[column], errors='coerce')
+        d = d[values > value] if op == '>' else d[values < value]
+
+    sort = ops.get('sort')
+    if sort == 'severity':
+        # Hottest heat waves and coldest cold snaps first
+        sign = (d['event_type'].astype(str).str.lower() == 'cold').map({True: 1, False: -1}) if 'event_type' in d.columns else -1
+        d = d.assign(_severity=pd.to_numeric(d['temperature'], errors='coerce') * sign)
+        d = d.sort_values('_severity', kind='stable').drop(columns='_severity')
+    elif sort in d.columns:
+        descending = ops.get('descending', sort != 'start_date')
+        d = d.sort_values(sort, ascending=not descending, kind='stable')
+    if ops.get('limit'):
+        d = d.head(ops['limit'])
+    return d
+
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert an events DataFrame back to compact DS/DE/T/SC/ID/Type records."""
+    records = []
+    for row in df.itertuples(index=False):
+        r = row._asdict()
+        records.append({
+            'DS': pd.Timestamp(r['start_date']).strftime('%Y-%m-%d'),
+            'DE': str(r.get('end_date', ''))[:10],
+            'T': r.get('temperature'),
+            'SC': r.get('spatial_coverage'),
+            'ID': str(r['NERC_ID']),
+            'Type': r.get('event_type'),
+        })
+    return records
+
+
+def refine_from_history(question: str, history: List[Dict[str, Any]]) -> Optional[Tuple[str, float, int]]:
+    """
+    Answer a follow-up locally from the most recent answer that has events.
+
+    Args:
+        question (str): Follow-up question
+        history (list): st.session_state.history entries
+
+    Returns:
+        tuple | None: (response, response_time, index of the refined history
+        entry), or None if the agent is needed
+    """
+    ops = parse_followup(question)
+    if ops is None:
+        return None
+    start_time = time.time()
+    for index in range(len(history) - 1, -1, -1):
+        is_temp_data, df, _ = parse_temperature_json(history[index]['response'])
+        if not is_temp_data or df is None:
+            continue
+        refined = apply_followup(df, ops)
+        if refined is None:
+            return None
+        records = frame_to_records(refined)
+        insights = template_insights(compute_event_facts(refined)) if records else ["No events in the previous result match this follow-up."]
+        return build_event_response(records, insights), time.time() - start_time, index
+    return None
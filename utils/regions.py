@@ -0,0 +1,147 @@
+"""
+NERC subregion name resolution shared by the agent tools and query planning.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.config import STRING_ID_TO_SUBNAME, REGION_ALIASES, NERC_GEOJSON_PATH, REGION_ADJACENCY_PATH
+
+# Upper-cased SUBNAME -> string ID, plus the planner aliases
+NAME_TO_ID = {name.upper(): rid for rid, name in STRING_ID_TO_SUBNAME.items()}
+NAME_TO_ID.update({alias.upper(): rid for alias, rid in REGION_ALIASES.items()})
+
+
+def resolve_region_id(value) -> Optional[str]:
+    """
+    Resolve a NERC region ID, SUBNAME or alias to its string ID.
+
+    Args:
+        value (str | int): Region ID ("17"), SUBNAME ("RFC") or alias ("PJM")
+
+    Returns:
+        str | None: The string ID, or None if the value is not recognised
+    """
+    if value is None:
+        return None
+    key = str(value).strip().upper()
+    if key in STRING_ID_TO_SUBNAME:
+        return key
+    return NAME_TO_ID.get(key) or NAME_TO_ID.get(key.replace('-', ' '))
+
+
+def resolve_region_ids(values: Iterable) -> List[str]:
+    """
+    Resolve a list of region IDs/names to string IDs, preserving order.
+
+    Args:
+        values (iterable): Region IDs, SUBNAMEs or aliases
+
+    Returns:
+        list: Unique string IDs
+
+    Raises:
+        ValueError: If any value cannot be resolved
+    """
+    resolved: List[str] = []
+    unknown: List[str] = []
+    for value in values:
+        rid = resolve_region_id(value)
+        if rid is None:
+            unknown.append(str(value))
+        elif rid not in resolved:
+            resolved.append(rid)
+    if unknown:
+        known = ", ".join(f'{rid}={name}' for rid, name in STRING_ID_TO_SUBNAME.items())
+        raise ValueError(f"Unknown NERC region(s): {', '.join(unknown)}. Known regions: {known}")
+    return resolved
+
+
+def find_region_mentions(text: str) -> List[Tuple[int, str]]:
+    """
+    Find every NERC region mention in free text.
+
+    Longer names are matched first so "MRO US" is not also read as "MRO" and
+    "NEW YORK" is not split.
+
+    Args:
+        text (str): Question text
+
+    Returns:
+        list: (character offset, string ID) of each mention, in order of appearance
+    """
+    upper = f" {text.upper()} "
+    found = []
+    for name in sorted(NAME_TO_ID, key=len, reverse=True):
+        pattern = r'(?<![A-Z0-9])' + re.escape(name).replace(r'\ ', r'[\s-]+') + r'(?![A-Z0-9])'
+        for m in re.finditer(pattern, upper):
+            found.append((m.start() - 1, NAME_TO_ID[name]))
+            # Blank out the match so shorter names don't match inside it
+            upper = upper[:m.start()] + ' ' * (m.end() - m.start()) + upper[m.end():]
+    return sorted(found)
+
+
+def find_region_ids(text: str) -> List[str]:
+    """
+    Find NERC regions mentioned in free text, in order of appearance.
+
+    Args:
+        text (str): Question text
+
+    Returns:
+        list: Unique string IDs of the regions mentioned
+    """
+    ids: List[str] = []
+    for _, rid in find_region_mentions(text):
+        if rid not in ids:
+            ids.append(rid)
+    return ids
+
+
+@lru_cache(maxsize=1)
+def _adjacency() -> Dict[str, List[dict]]:
+    """The region adjacency graph, or {} when no NERC geometry (or cached graph) is available."""
+    if not os.path.exists(NERC_GEOJSON_PATH):
+        return {}
+    try:
+        from catalog.adjacency import region_adjacency  # deferred: shapely is only needed to build the graph
+        return region_adjacency(NERC_GEOJSON_PATH, REGION_ADJACENCY_PATH)
+    except Exception:
+        return {}
+
+
+def neighbors_available() -> bool:
+    """Whether neighbouring regions can be resolved from geometry."""
+    return bool(_adjacency())
+
+
+def region_neighbors(region_id: str) -> List[str]:
+    """
+    Neighbouring NERC regions of a region, longest shared boundary first.
+
+    Args:
+        region_id (str): Region string ID
+
+    Returns:
+        list: String IDs of the neighbours ([] when the graph is unavailable)
+    """
+    return [n['id'] for n in _adjacency().get(str(region_id), [])]
+
+
+def expand_with_neighbors(region_ids: Iterable[str]) -> List[str]:
+    """
+    The regions followed by their neighbours, deterministically ordered and without repeats.
+
+    Args:
+        region_ids (iterable): Region string IDs
+
+    Returns:
+        list: The given IDs, then each one's neighbours in shared-boundary order
+    """
+    region_ids = list(region_ids)
+    expanded: List[str] = []
+    for rid in region_ids + [n for rid in region_ids for n in region_neighbors(rid)]:
+        if rid not in expanded:
+            expanded.append(rid)
+    return expanded
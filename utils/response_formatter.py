@@ -3,7 +3,8 @@
 import json
 import re
 import html
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+import pandas as pd
 def robust_json_parse(json_str: str) -> Optional[Dict[str, Any]]:
     """Inline robust JSON parsing to handle malformed JSON."""
     try:
@@ -65,6 +66,53 @@ def robust_json_parse(json_str: str) -> Optional[Dict[str, Any]]:
     
     return None
 
+# Build a display mapping (source_key -> display_name)
+# Support both abbreviated (DS, DE, T, SC, ID, Type) and verbose keys
+DISPLAY_MAP_CANDIDATES = [
+    {
+        'DS': 'Start Date',
+        'DE': 'End Date',
+        'T': 'Temperature (°F)',
+        'SC': 'Spatial Coverage (%)',
+        'ID': 'NERC ID',
+        'Type': 'Event Type',
+        'return_period': 'Return Period (years)',
+        'duration': 'Duration (days)',
+        'fit_years': 'Years Fitted',
+    },
+    {
+        'start_date': 'Start Date',
+        'end_date': 'End Date',
+        'temperature': 'Temperature (°F)',
+        'spatial_coverage': 'Spatial Coverage (%)',
+        'NERC_ID': 'NERC ID',
+        'event_type': 'Event Type',
+    },
+]
+
+# Preferred column order using display names
+PREFERRED_COLUMN_ORDER: List[str] = [
+    'Start Date',
+    'End Date',
+    'Event Type',
+    'NERC ID',
+    'Temperature (°F)',
+    'Spatial Coverage (%)',
+]
+
+def _display_map(first_keys) -> Dict[str, str]:
+    """Map source keys to display names, title-casing keys without a known mapping."""
+    display_map: Dict[str, str] = {}
+    for cand in DISPLAY_MAP_CANDIDATES:
+        overlap = set(first_keys).intersection(cand.keys())
+        if overlap:
+            display_map.update(cand)
+    # For any remaining keys, generate a title-cased display
+    for k in first_keys:
+        if k not in display_map:
+            display_map[k] = k.replace('_', ' ').title()
+    return display_map
+
 def extract_json_from_response(response: str) -> Optional[Dict[str, Any]]:
     """Extract JSON data from LLM response for visualization purposes."""
     try:
@@ -98,49 +146,12 @@ def format_json_response_as_table(response: str) -> str:
         if not events_raw or not isinstance(events_raw[0], dict):
             return "No events found."
 
-        # Build a display mapping (source_key -> display_name)
-        # Support both abbreviated (DS, DE, T, SC, ID, Type) and verbose keys
-        display_map_candidates = [
-            {
-                'DS': 'Start Date',
-                'DE': 'End Date',
-                'T': 'Temperature (°F)',
-                'SC': 'Spatial Coverage (%)',
-                'ID': 'NERC ID',
-                'Type': 'Event Type',
-            },
-            {
-                'start_date': 'Start Date',
-                'end_date': 'End Date',
-                'temperature': 'Temperature (°F)',
-                'spatial_coverage': 'Spatial Coverage (%)',
-                'NERC_ID': 'NERC ID',
-                'event_type': 'Event Type',
-            },
-        ]
-
         # Determine which candidate mapping applies based on first row
         first_keys = set(events_raw[0].keys())
-        display_map: Dict[str, str] = {}
-        for cand in display_map_candidates:
-            overlap = first_keys.intersection(cand.keys())
-            if overlap:
-                display_map.update(cand)
-        # For any remaining keys, generate a title-cased display
-        for k in first_keys:
-            if k not in display_map:
-                display_map[k] = k.replace('_', ' ').title()
+        display_map = _display_map(first_keys)
 
         # Construct preferred column order using display names
-        preferred_order: List[str] = [
-            'Start Date',
-            'End Date',
-            'Event Type',
-            'NERC ID',
-            'Temperature (°F)',
-            'Spatial Coverage (%)',
-        ]
-
+        preferred_order: List[str] = PREFERRED_COLUMN_ORDER
         # Build list of all display columns across all rows
         all_source_keys = set()
         for e in events_raw:
@@ -205,27 +216,28 @@ def format_json_response_as_table(response: str) -> str:
     except (json.JSONDecodeError, KeyError, TypeError):
         return response
 
+METHODOLOGY_NOTE = "\n\n*Heat wave and cold snap events identified using Definition 6: Heat wave events are detected based on daily maximum temperature with two temperature thresholds (T1 ~ 97.5th percentile and T2 ~ 81st percentile). All days in the event must have temperature > T2, with at least 3 consecutive days > T1, and the average temperature across all event days > T1.*"
+
+def format_insights_section(response: str) -> str:
+    """Return the Technical Insights section with the methodology note, or '' if absent."""
+    insights_idx = response.find('### Technical Insights:')
+    if insights_idx == -1:
+        return ""
+    insights_text = response[insights_idx:].strip()
+    # Remove any trailing empty Supporting Visualization sections
+    if "### Supporting Visualization" in insights_text:
+        insights_text = re.sub(r'\n*### Supporting Visualization\s*$', '', insights_text)
+    return insights_text + METHODOLOGY_NOTE
+
 def enhance_response_presentation(response: str) -> str:
     """Format response with JSON table conversion or basic markdown."""
     # Try to convert JSON to table
     json_table = format_json_response_as_table(response)
     if json_table != response:
         # Check if response contains technical insights section
-        insights_idx = response.find('### Technical Insights:')
-        if insights_idx != -1:
-            insights_text = response[insights_idx:].strip()
-            # Add methodology note after technical insights
-            methodology_note = "\n\n*Heat wave and cold snap events identified using Definition 6: Heat wave events are detected based on daily maximum temperature with two temperature thresholds (T1 ~ 97.5th percentile and T2 ~ 81st percentile). All days in the event must have temperature > T2, with at least 3 consecutive days > T1, and the average temperature across all event days > T1.*"
-            
-            # Check if insights_text already has Supporting Visualization section
-            if "### Supporting Visualization" in insights_text:
-                # Replace any existing empty Supporting Visualization section with our complete one
-                import re
-                # Remove any trailing empty Supporting Visualization sections
-                insights_text = re.sub(r'\n*### Supporting Visualization\s*$', '', insights_text)
-                return f"## Analysis Results\n\n{json_table}\n\n" + insights_text + methodology_note
-            else:
-                return f"## Analysis Results\n\n{json_table}\n\n" + insights_text + methodology_note
+        insights_text = format_insights_section(response)
+        if insights_text:
+            return f"## Analysis Results\n\n{json_table}\n\n" + insights_text
         # No insights found, return only table
         return f"## Analysis Results\n\n{json_table}"
     
@@ -234,3 +246,73 @@ def enhance_response_presentation(response: str) -> str:
         return response
     else:
         return f"## Analysis\n{response}"
+
+def build_events_frame(response: str) -> Optional[pd.DataFrame]:
+    """
+    Convert the events JSON of a response to a typed, columnar DataFrame for the grid view.
+
+    Uses the same display names and column order as the HTML table, with
+    dates as datetimes, numeric columns as floats and categorical columns as
+    categories, so Streamlit can ship it as Arrow and sort/filter client-side.
+
+    Returns:
+        pd.DataFrame | None: Events frame, or None if the response has no events JSON
+    """
+    data = extract_json_from_response(response)
+    if not (isinstance(data, dict) and isinstance(data.get('data'), list)):
+        return None
+    events = [e for e in data['data'] if isinstance(e, dict)]
+    if not events:
+        return pd.DataFrame(columns=PREFERRED_COLUMN_ORDER)
+
+    frame = pd.DataFrame.from_records(events)
+    frame = frame.rename(columns=_display_map(frame.columns))
+    # Duplicate display names (mixed abbreviated/verbose keys) are merged left to right
+    if frame.columns.duplicated().any():
+        frame = frame.T.groupby(level=0, sort=False).first().T
+    columns = [c for c in PREFERRED_COLUMN_ORDER if c in frame.columns]
+    columns += sorted(c for c in frame.columns if c not in columns)
+    frame = frame[columns]
+
+    for col in ('Start Date', 'End Date'):
+        if col in frame.columns:
+            frame[col] = pd.to_datetime(frame[col], errors='coerce', format='ISO8601')
+    for col in ('Temperature (°F)', 'Spatial Coverage (%)'):
+        if col in frame.columns:
+            frame[col] = pd.to_numeric(frame[col], errors='coerce').round(1)
+    for col in ('Event Type', 'NERC ID'):
+        if col in frame.columns:
+            frame[col] = frame[col].astype(str).astype('category')
+    return frame.reset_index(drop=True)
+
+def build_event_response(events: List[Dict[str, Any]], insights: List[str]) -> str:
+    """Compose a response in the agent's output format (JSON block + Technical Insights)."""
+    payload = json.dumps({"data": events}, indent=2)
+    numbered = "\n".join(f"{i}. {line}" for i, line in enumerate(insights, 1))
+    return f"```json\n{payload}\n```\n\n### Technical Insights:\n{numbered}"
+
+def replace_insights(response: str, insights: List[str]) -> str:
+    """Replace (or append) the Technical Insights section of a response."""
+    numbered = "\n".join(f"{i}. {line}" for i, line in enumerate(insights, 1))
+    idx = response.find('### Technical Insights:')
+    head = response[:idx].rstrip() if idx != -1 else response.rstrip()
+    return f"{head}\n\n### Technical Insights:\n{numbered}"
+
+def summarize_response(response: str, max_length: int = 160) -> Tuple[str, Optional[int]]:
+    """
+    Summarize a response for a collapsed history entry.
+
+    Returns:
+        tuple: (summary line: the first Technical Insight, or the first line of
+        text; number of event rows, or None if the response has no events JSON)
+    """
+    data = extract_json_from_response(response)
+    row_count = len(data['data']) if isinstance(data, dict) and isinstance(data.get('data'), list) else None
+    idx = response.find('### Technical Insights:')
+    text = response[idx + len('### Technical Insights:'):] if idx != -1 else re.sub(r'```.*?```', '', response, flags=re.DOTALL)
+    lines = [re.sub(r'^\s*(?:\d+[.)]|[-*•](?=\s))\s*', '', line).strip() for line in text.splitlines()
+             if not line.lstrip().startswith('#')]
+    summary = next((line for line in lines if line), '')
+    if len(summary) > max_length:
+        summary = summary[:max_length - 1].rstrip() + '…'
+    return summary, row_count
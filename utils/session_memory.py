@@ -0,0 +1,208 @@
+"""
+Per-session memory budget for derived chat artifacts.
+
+History entries keep their question and answer text, but the events frames
+and Plotly figures derived from them (figures embed the NERC GeoJSON and can
+be megabytes each) are held in a per-session store with byte accounting.
+When the store exceeds its budget the least recently used artifacts are
+spilled to disk as compressed payloads (Arrow IPC for frames, Plotly JSON
+for figures) or dropped, and are reloaded or rebuilt on demand.
+"""
+import os
+import shutil
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+import plotly.graph_objects as go
+import pyarrow as pa
+
+from utils.cache_backend import decode_value, encode_value
+from utils.metrics import ACTIVE_SESSIONS, record_cache
+from config.config import CACHE_DIR, SESSION_MEMORY_BUDGET_MB, SESSION_SPILL_ENABLED
+
+SPILL_DIR = os.path.join(CACHE_DIR, 'session_spill')
+
+# One store per live session; sessions are counted from it for the metrics
+_STORES: "weakref.WeakSet[SessionArtifactStore]" = weakref.WeakSet()
+ACTIVE_SESSIONS.set_function(lambda: len(_STORES))
+
+# Per-point trace properties counted when sizing a figure
+FIGURE_ARRAY_PROPERTIES = ('x', 'y', 'z', 'lat', 'lon', 'locations', 'text', 'hovertext', 'customdata')
+
+
+class LRUDict(OrderedDict):
+    """Dict bounded to maxsize entries, evicting the least recently used."""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+def estimate_nbytes(value: Any) -> int:
+    """Approximate in-memory size of an artifact in bytes."""
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, go.Figure):
+        return figure_nbytes(value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 0
+
+
+def figure_nbytes(fig: go.Figure) -> int:
+    """
+    Approximate size of a Plotly figure from the point counts of its traces and frames.
+
+    Avoids serializing the figure. Embedded GeoJSON is measured once per figure: the traces
+    of a map carry copies of the same boundaries, so copies with as many features are
+    assumed to be the same size.
+    """
+    geojson_nbytes: Dict[int, int] = {}
+    total = 0
+    traces = list(fig.data) + [trace for frame in fig.frames or () for trace in frame.data]
+    for trace in traces:
+        for name in FIGURE_ARRAY_PROPERTIES:
+            if name in trace and trace[name] is not None:
+                values = trace[name]
+                total += values.nbytes if isinstance(values, np.ndarray) else 8 * len(values)
+        geojson = trace['geojson'] if 'geojson' in trace else None
+        if isinstance(geojson, dict):
+            features = len(geojson.get('features') or ())
+            if features not in geojson_nbytes:
+                geojson_nbytes[features] = len(orjson.dumps(geojson))
+            total += geojson_nbytes[features]
+    return total
+
+
+class SessionArtifactStore:
+    """
+    LRU store of derived artifacts for one Streamlit session, capped in bytes.
+
+    Args:
+        budget_bytes (int): In-memory byte budget for artifacts
+        spill (bool): Spill evicted frames/figures to disk instead of dropping them
+    """
+
+    def __init__(self, budget_bytes: int = SESSION_MEMORY_BUDGET_MB * 1024 * 1024, spill: bool = SESSION_SPILL_ENABLED):
+        self.budget_bytes = int(budget_bytes)
+        self.spill_dir = os.path.join(SPILL_DIR, uuid.uuid4().hex) if spill else None
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._spilled: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'builds': 0, 'reloads': 0, 'spills': 0, 'drops': 0}
+        _STORES.add(self)
+        if self.spill_dir:
+            # Remove the session's spill files once the session state is garbage collected
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._memory.values())
+
+    @property
+    def disk_bytes(self) -> int:
+        return sum(size for _, size in self._spilled.values())
+
+    def get_or_build(self, key: str, build: Callable[[], Any]) -> Any:
+        """
+        Return an artifact, reloading it from disk or rebuilding it if evicted.
+
+        Args:
+            key (str): Artifact key, e.g. 'figure:3'
+            build (callable): Builds the artifact from the entry's answer text
+
+        Returns:
+            The artifact (None results are cached too)
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['hits'] += 1
+                record_cache('session_artifacts', True)
+                return self._memory[key][0]
+            spilled = self._spilled.pop(key, None)
+        record_cache('session_artifacts', False)
+        value = None
+        if spilled is not None:
+            try:
+                with open(spilled[0], 'rb') as f:
+                    value = decode_value(f.read())
+                os.remove(spilled[0])
+                self.stats['reloads'] += 1
+            except (OSError, ValueError, pa.ArrowException):
+                spilled = None
+        if spilled is None:
+            value = build()
+            self.stats['builds'] += 1
+        self._put(key, value)
+        return value
+
+    def _put(self, key: str, value: Any):
+        nbytes = estimate_nbytes(value)
+        with self._lock:
+            self._memory[key] = (value, nbytes)
+            self._memory.move_to_end(key)
+            # Keep the artifact just built even if it alone exceeds the budget
+            while len(self._memory) > 1 and self.memory_bytes > self.budget_bytes:
+                old_key, (old_value, _) = self._memory.popitem(last=False)
+                self._evict(old_key, old_value)
+
+    def _evict(self, key: str, value: Any):
+        if self.spill_dir and isinstance(value, (pd.DataFrame, go.Figure)):
+            try:
+                payload = encode_value(value)
+                os.makedirs(self.spill_dir, exist_ok=True)
+                path = os.path.join(self.spill_dir, f"{key.replace(':', '_')}.bin")
+                with open(path, 'wb') as f:
+                    f.write(payload)
+                self._spilled[key] = (path, len(payload))
+                self.stats['spills'] += 1
+                return
+            except (OSError, TypeError, ValueError, pa.ArrowException):
+                pass
+        self.stats['drops'] += 1
+
+    def usage(self) -> Dict[str, Any]:
+        """Memory accounting for the admin view."""
+        with self._lock:
+            return {
+                'artifacts_in_memory': len(self._memory),
+                'memory_bytes': self.memory_bytes,
+                'artifacts_on_disk': len(self._spilled),
+                'disk_bytes': self.disk_bytes,
+                'budget_bytes': self.budget_bytes,
+                **self.stats,
+            }
+
+
+def history_text_bytes(history) -> int:
+    """Bytes held by the question/answer text of a session's history."""
+    return sum(len(chat.get('question') or '') + len(chat.get('response') or '') for chat in history)
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of the Streamlit process, if psutil is available."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
@@ -0,0 +1,26 @@
+"""
+Signatures of the source files behind derived on-disk caches.
+
+A cache file (area weights, simplified geometry, adjacency graph) stores the
+signature of the files it was built from: absolute path, size and content
+hash. It is rebuilt when the signature differs, so pointing a setting at
+another file, or replacing a file with a copy whose timestamp is older, still
+invalidates it.
+"""
+import hashlib
+import json
+import os
+
+
+def file_signature(path: str) -> dict:
+    """Absolute path, size and SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return {'path': os.path.abspath(path), 'size': os.path.getsize(path), 'sha256': digest.hexdigest()}
+
+
+def sources_signature(*paths: str) -> str:
+    """Signature of the files a cache is built from, as a string to store with the cache."""
+    return json.dumps([file_signature(path) for path in paths], sort_keys=True)
@@ -3,21 +3,32 @@
 import json
 import re
 import pandas as pd
-import plotly.express as px  # type: ignore
 import plotly.graph_objects as go  # type: ignore
 import streamlit as st
-from shapely.geometry import shape, mapping
 import os
+import math
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional, Any
-from .response_formatter import robust_json_parse
+from .response_formatter import extract_json_from_response, robust_json_parse
+from config.config import (NERC_GEOJSON_PATH, STRING_ID_TO_SUBNAME, COUNTIES_GEOJSON_PATH, CACHE_DIR, MAP_LEVEL,
+                           COUNTY_SIMPLIFY_TOLERANCE, COUNTY_COORD_DECIMALS)
+from utils.metrics import STAGE_LATENCY
+from utils.sources import sources_signature
 
 # Check if GeoJSON file exists
-GEOJSON_PATH = "/Users/chat200/Downloads/NERC_regions_subregions 2.json"
+GEOJSON_PATH = NERC_GEOJSON_PATH
 GEOJSON_AVAILABLE = os.path.exists(GEOJSON_PATH)
+COUNTY_GEOJSON_AVAILABLE = os.path.exists(COUNTIES_GEOJSON_PATH)
+
+# Status messages returned with (or instead of) a map
+GEOJSON_MISSING_MESSAGE = "GeoJSON file not found. Cannot create choropleth map."
+EVENT_MAP_NOTE = ("*Temperatures shown in NERC region represent maximum recorded during the heat wave event or "
+                  "minimum recorded during the cold snap event.*")
 
 @st.cache_data
 def load_nerc_geojson(path: str) -> Dict[str, Any]:
     """Load and cache GeoJSON file."""
+    from shapely.geometry import shape, mapping  # deferred: only needed once geometry is loaded
     with open(path, 'r') as f:
         gj = json.load(f)
     # Simplify each feature geometry to reduce complexity
@@ -33,25 +44,6 @@ def load_nerc_geojson(path: str) -> Dict[str, Any]:
             continue
     return gj
 
-# Hardcoded mapping of string ID to SUBNAME for reliable labeling
-STRING_ID_TO_SUBNAME = {
-    "1": "AZ-NM-SNV",
-    "2": "CA-MX US",
-    "3": "ERCOT",
-    "4": "FRCC",
-    "5": "NEW ENGLAND",
-    "6": "NWPP",
-    "7": "RMPA",
-    "8": "SPP",
-    "9": "DELTA",
-    "10": "SOUTHEASTERN",
-    "11": "CENTRAL",
-    "12": "VACAR",
-    "15": "NEW YORK",
-    "17": "RFC",
-    "18": "MRO US",
-    "20": "GATEWAY"
-}
 
 
 
@@ -104,6 +96,7 @@ def parse_temperature_json(response: str) -> Tuple[bool, Optional[pd.DataFrame],
 @st.cache_data
 def get_subname_centroids(nerc_geojson: Dict[str, Any]) -> pd.DataFrame:
     """Generate centroids for NERC regions to display SUBNAME labels."""
+    from shapely.geometry import shape
     labels = []
     for feature in nerc_geojson.get("features", []):
         geom_data = feature.get("geometry")
@@ -134,7 +127,6 @@ def create_animated_choropleth_from_data(df: pd.DataFrame, event_type: str = 'he
     try:
         # Load GeoJSON
         if not GEOJSON_AVAILABLE:
-            st.error("GeoJSON file not found. Cannot create choropleth map.")
             return None
         nerc_geojson = load_nerc_geojson(GEOJSON_PATH)
 
@@ -283,20 +275,328 @@ def create_animated_choropleth_from_data(df: pd.DataFrame, event_type: str = 'he
         return fig
         
     except Exception:
-        st.error("Error creating animated choropleth.")
         return None
 
 
+def _simplified_counties_path(tolerance: float, decimals: int) -> str:
+    return os.path.join(CACHE_DIR, f"counties_simplified_{tolerance:g}_{decimals}.json")
+
+
+@lru_cache(maxsize=4)
+def load_county_geometry(path: str = COUNTIES_GEOJSON_PATH, tolerance: float = COUNTY_SIMPLIFY_TOLERANCE,
+                         decimals: int = COUNTY_COORD_DECIMALS) -> Dict[str, Any]:
+    """
+    Load simplified, quantized county geometry once per process.
+
+    The first load simplifies all counties together (shapely coverage simplification, so
+    neighbouring counties keep a shared border), rounds coordinates and writes the result
+    to CACHE_DIR with the signature of the source file; later processes read that file
+    unless the source changed.
+
+    Returns:
+        dict: 'features' (FIPS -> GeoJSON feature) and 'bounds' (FIPS -> (minx, miny, maxx, maxy))
+    """
+    cache_path = _simplified_counties_path(tolerance, decimals)
+    sources = sources_signature(path)
+    features = None
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get('sources') == sources:
+            features = cached['features']
+    if features is None:
+        import numpy as np
+        import shapely
+        from shapely.geometry import shape, mapping
+        with open(path) as f:
+            source = [feature for feature in json.load(f)['features'] if feature.get('geometry')]
+        geoms = shapely.make_valid(np.array([shape(feature['geometry']) for feature in source], dtype=object))
+        geoms = shapely.coverage_simplify(geoms, tolerance)
+        geoms = shapely.transform(geoms, lambda coords: np.round(coords, decimals))
+        features = [{'type': 'Feature', 'id': str(feature['id']),
+                     'properties': {'NAME': feature['properties'].get('NAME', ''),
+                                    'STATE': feature['properties'].get('STATE', '')},
+                     'geometry': mapping(geom)} for feature, geom in zip(source, geoms) if not geom.is_empty]
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(f"{cache_path}.tmp", 'w') as f:
+            json.dump({'type': 'FeatureCollection', 'sources': sources, 'features': features}, f, separators=(',', ':'))
+        os.replace(f"{cache_path}.tmp", cache_path)
+
+    def bounds(geometry):
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        lons = [x for polygon in polygons for ring in polygon for x, _ in ring]
+        lats = [y for polygon in polygons for ring in polygon for _, y in ring]
+        return min(lons), min(lats), max(lons), max(lats)
+
+    return {'features': {feature['id']: feature for feature in features},
+            'bounds': {feature['id']: bounds(feature['geometry']) for feature in features}}
+
+
+def _county_region_matrix():
+    from catalog.spatial import county_region_weights  # deferred: shapely is only needed for county maps
+    weights, county_ids, region_ids = county_region_weights(COUNTIES_GEOJSON_PATH, GEOJSON_PATH)
+    return weights.toarray(), county_ids, region_ids
+
+
+@lru_cache(maxsize=1)
+def county_regions() -> Dict[str, List[str]]:
+    """NERC subregion ID -> FIPS of the counties overlapping it (empty without NERC geometry)."""
+    if not (GEOJSON_AVAILABLE and COUNTY_GEOJSON_AVAILABLE):
+        return {}
+    dense, county_ids, region_ids = _county_region_matrix()
+    return {rid: [county_ids[i] for i in dense[:, j].nonzero()[0]] for j, rid in enumerate(region_ids)}
+
+
+@lru_cache(maxsize=1)
+def county_main_region() -> Dict[str, str]:
+    """FIPS -> NERC subregion ID holding most of the county's area (counties in no subregion omitted)."""
+    if not (GEOJSON_AVAILABLE and COUNTY_GEOJSON_AVAILABLE):
+        return {}
+    dense, county_ids, region_ids = _county_region_matrix()
+    main = dense.argmax(axis=1)
+    return {fips: region_ids[j] for fips, j, row in zip(county_ids, main, dense) if row[j] > 0}
+
+
+def counties_in_regions(region_ids: Optional[List[str]] = None) -> List[str]:
+    """FIPS of the counties in any of the NERC subregions (all counties when none are given)."""
+    features = load_county_geometry()['features']
+    if not region_ids:
+        return list(features)
+    membership = county_regions()
+    if not membership:
+        return list(features)
+    selected = {fips for rid in region_ids for fips in membership.get(str(rid), [])}
+    return [fips for fips in features if fips in selected]
+
+
+def _map_view(bounds: List[Tuple[float, float, float, float]]) -> Tuple[Dict[str, float], float]:
+    """Mapbox center and zoom that fit the bounding boxes."""
+    if not bounds:
+        return {'lat': 39.5, 'lon': -98}, 3.2
+    west, south = min(b[0] for b in bounds), min(b[1] for b in bounds)
+    east, north = max(b[2] for b in bounds), max(b[3] for b in bounds)
+    span = max(east - west, (north - south) * 1.6, 0.5)
+    zoom = min(max(math.log2(360 / span) - 0.2, 2.5), 8.0)
+    return {'lat': (south + north) / 2, 'lon': (west + east) / 2}, zoom
+
+
+def create_county_choropleth(values: pd.DataFrame, value_column: str, event_type: str = 'heat',
+                             region_ids: Optional[List[str]] = None, title: Optional[str] = None,
+                             value_label: Optional[str] = None, detail_column: Optional[str] = None,
+                             value_range: Optional[Tuple[float, float]] = None):
+    """
+    Create a county choropleth from per-county values bound by FIPS.
+
+    Only the counties with values and the counties within region_ids are shipped to the
+    browser, and the map is zoomed to them.
+
+    Args:
+        values (pd.DataFrame): One row per county with a 'FIPS' column
+        value_column (str): Column to color by
+        event_type (str): 'heat', 'cold' or 'mixed' (color scale)
+        region_ids (list): NERC subregion IDs whose counties are shown even without values
+        title (str): Figure title
+        value_label (str): Colorbar and hover label of the values (default: from value_column)
+        detail_column (str): Column with a text line added to each county's hover
+        value_range (tuple): Fixed (min, max) of the color scale
+
+    Returns:
+        go.Figure: The county map
+    """
+    geometry = load_county_geometry()
+    values = values.assign(FIPS=values['FIPS'].astype(str).str.zfill(5))
+    values = values[values['FIPS'].isin(geometry['features'])]
+    in_regions = counties_in_regions(region_ids) if region_ids else []
+    shown = list(dict.fromkeys(in_regions + values['FIPS'].tolist()))
+    geojson = {'type': 'FeatureCollection', 'features': [geometry['features'][fips] for fips in shown]}
+    center, zoom = _map_view([geometry['bounds'][fips] for fips in shown])
+    color_scale = {'heat': 'YlOrRd', 'cold': 'Blues_r'}.get(event_type, 'RdBu_r')
+    names = [geometry['features'][fips]['properties']['NAME'] for fips in values['FIPS']]
+    label = value_label or value_column.replace('_', ' ').title()
+    detail = '<br>%{customdata}' if detail_column else ''
+
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=geojson, featureidkey='id', locations=values['FIPS'], z=values[value_column],
+        text=names, customdata=values[detail_column] if detail_column else None, colorscale=color_scale,
+        zmin=value_range[0] if value_range else None, zmax=value_range[1] if value_range else None,
+        marker_opacity=0.8, marker_line_width=0.3, marker_line_color='white', colorbar=dict(title=label),
+        hovertemplate='<b>%{text}</b> (%{location})<br>' + f'{label}: %{{z:.1f}}' + detail + '<extra></extra>'))
+    fig.update_layout(
+        mapbox_style='carto-positron', mapbox=dict(zoom=zoom, center=center),
+        margin={'r': 10, 't': 80, 'l': 10, 'b': 10}, height=700,
+        title={'text': title or 'County Map', 'x': 0.5, 'xanchor': 'center'})
+    return fig
+
+
+def region_severity(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Most severe event type of each region in an answer mixing heat waves and cold snaps.
+
+    Heat and cold temperatures are not comparable, so each region's hottest heat wave and
+    coldest cold snap are scored 0-1 against the answer's events of the same type, and the
+    region takes the higher score: positive for heat, negative for cold.
+
+    Returns:
+        pd.DataFrame: Indexed by NERC_ID with 'severity' (-1 to 1) and 'detail' (hover text)
+    """
+    parts = []
+    for etype, sign, agg, label in (('heat', 1, 'max', 'Hottest heat wave'), ('cold', -1, 'min', 'Coldest cold snap')):
+        events = df[df['event_type'] == etype]
+        if events.empty:
+            continue
+        low, high = events['temperature'].min(), events['temperature'].max()
+        extreme = events.groupby('NERC_ID')['temperature'].agg(agg)
+        score = (extreme - low if sign > 0 else high - extreme) / (high - low) if high > low else extreme * 0 + 1.0
+        parts.append(pd.DataFrame({'severity': sign * score + 0.0, 'score': score,
+                                   'detail': [f"{label}: {t:.1f}°F" for t in extreme]}, index=extreme.index))
+    if not parts:
+        return pd.DataFrame(columns=['severity', 'detail'])
+    severity = pd.concat(parts).sort_values('score', ascending=False, kind='stable')
+    return severity[~severity.index.duplicated()][['severity', 'detail']]
+
+
+def create_county_choropleth_from_data(df: pd.DataFrame, event_type: str = 'heat'):
+    """
+    Show region-level events on the counties of their NERC subregions.
+
+    The values are region-level (events are not resolved by county) and are labelled as
+    such: each county shows the subregion holding most of its area. Heat or cold answers
+    show the region's most extreme event temperature; answers mixing both show the
+    region's more severe event type (region_severity) instead of averaging temperatures.
+    The map is zoomed to the subregions in the answer.
+    """
+    membership = county_regions()
+    if not membership or (event_type not in ('heat', 'cold') and 'event_type' not in df.columns):
+        return create_animated_choropleth_from_data(df, event_type)
+    df = df.assign(NERC_ID=df['NERC_ID'].astype(str))
+    if event_type in ('heat', 'cold'):
+        agg = 'max' if event_type == 'heat' else 'min'
+        extreme = df.groupby('NERC_ID')['temperature'].agg(agg)
+        region_values = pd.DataFrame({'value': extreme, 'detail': [f"NERC region {rid}" for rid in extreme.index]})
+        label = f"Region {agg} temperature (°F)"
+        value_range = None
+    else:
+        region_values = region_severity(df)
+        region_values = region_values.rename(columns={'severity': 'value'})
+        region_values['detail'] = [f"NERC region {rid} · {detail}" for rid, detail in region_values['detail'].items()]
+        label = "Region severity (heat + / cold −)"
+        value_range = (-1.0, 1.0)
+    values = pd.DataFrame(list(county_main_region().items()), columns=['FIPS', 'NERC_ID'])
+    values = values[values['NERC_ID'].isin(region_values.index)]
+    values = values.join(region_values, on='NERC_ID')
+    title_suffix = {'heat': 'Heat Wave', 'cold': 'Cold Snap'}.get(event_type, 'Heat Wave and Cold Snap')
+    return create_county_choropleth(values, 'value', event_type, list(region_values.index),
+                                    title=f"{title_suffix} Events - NERC Region Values on Counties",
+                                    value_label=label, detail_column='detail', value_range=value_range)
+
+
+def parse_return_level_json(response: str) -> Tuple[bool, Optional[pd.DataFrame], Optional[str]]:
+    """Parse return-level records (utils.extremes) from a response and detect the event type."""
+    data = extract_json_from_response(response)
+    if not (isinstance(data, dict) and isinstance(data.get('data'), list) and data['data']):
+        return False, None, None
+    df = pd.DataFrame([e for e in data['data'] if isinstance(e, dict)])
+    if not {'ID', 'Type', 'return_period', 'T'}.issubset(df.columns):
+        return False, None, None
+    event_type = str(df['Type'].iloc[0]) if df['Type'].nunique() == 1 else 'mixed'
+    return True, df.rename(columns={'ID': 'NERC_ID', 'T': 'temperature'}), event_type
+
+
+def create_return_level_choropleth(df: pd.DataFrame, event_type: str = 'heat'):
+    """
+    Map "1-in-N year" event temperatures per NERC region, one frame per return period.
+
+    Uses the colour scales, base map and labels of create_animated_choropleth_from_data.
+    Heat wave and cold snap levels are never drawn on the same frame: an answer with both
+    gets one frame per event type and return period, each with its type's colour scale.
+    """
+    if not GEOJSON_AVAILABLE:
+        return None
+    nerc_geojson = load_nerc_geojson(GEOJSON_PATH)
+    df = df.dropna(subset=['temperature']).assign(NERC_ID=lambda d: d['NERC_ID'].astype(str))
+    if df.empty:
+        return None
+    if 'Type' not in df.columns:
+        df = df.assign(Type=event_type)
+    names = {'heat': 'Heat Wave', 'cold': 'Cold Snap'}
+    title_suffix = names.get(event_type, 'Heat Wave and Cold Snap')
+
+    def color_axis(etype):
+        rows = df[df['Type'] == etype]
+        vmin, vmax = rows['temperature'].min(), rows['temperature'].max()
+        if vmin == vmax:
+            vmin, vmax = vmin - 1, vmax + 1
+        return dict(colorscale={'heat': 'YlOrRd', 'cold': 'Blues_r'}.get(etype, 'RdBu_r'), cmin=vmin, cmax=vmax,
+                    showscale=True, colorbar=dict(title=f"Temperature (°F)<br>{names.get(etype, 'Temperature')}",
+                                                  titleside='right'))
+
+    def choropleth(etype, period):
+        rows = df[(df['Type'] == etype) & (df['return_period'] == period)]
+        return go.Choroplethmapbox(
+            geojson=nerc_geojson, featureidkey='properties.ID', locations=rows['NERC_ID'], z=rows['temperature'],
+            coloraxis='coloraxis', marker_opacity=0.8, marker_line_width=1, marker_line_color='white',
+            hovertemplate='<b>NERC Region: %{location}</b><br>' +
+                          f'1-in-{period} year temperature: %{{z:.1f}}°F<extra></extra>',
+            name=f'1-in-{period} year')
+
+    types = [t for t in ('heat', 'cold') if t in set(df['Type'])] or list(dict.fromkeys(df['Type']))
+    steps = [(etype, period) for etype in types for period in sorted(df.loc[df['Type'] == etype, 'return_period'].unique())]
+
+    def step_name(etype, period):
+        return f'1-in-{period} years' if len(types) == 1 else f"{names.get(etype, etype)} 1-in-{period} years"
+
+    label_df = get_subname_centroids(nerc_geojson)
+    fig = go.Figure([choropleth(*steps[0]), go.Scattermapbox(
+        lat=label_df['lat'], lon=label_df['lon'], mode='text', text=label_df['SUBNAME'],
+        textfont=dict(size=12, color='black'), showlegend=False, hoverinfo='none')])
+    fig.frames = [go.Frame(data=[choropleth(etype, period)], name=step_name(etype, period),
+                           layout=dict(coloraxis=color_axis(etype)))
+                  for etype, period in steps]
+    fig.update_layout(
+        mapbox_style='carto-positron',
+        mapbox=dict(zoom=3.2, center={'lat': 39.5, 'lon': -98}, layers=[dict(
+            sourcetype='geojson', source=nerc_geojson, type='line', color='black', line=dict(width=2))]),
+        coloraxis=color_axis(steps[0][0]),
+        margin={'r': 10, 't': 80, 'l': 10, 'b': 10}, height=700,
+        sliders=[dict(active=0, pad={'t': 50}, steps=[
+            dict(label=fr.name, method='animate', args=[[fr.name], {'frame': {'duration': 0, 'redraw': True},
+                                                                   'mode': 'immediate'}])
+            for fr in fig.frames])],
+        title={'text': f"Return-Level {title_suffix} Temperatures - NERC Regions", 'x': 0.5, 'xanchor': 'center'})
+    return fig
+
+
 def execute_viz_code(code: Optional[str], response: Optional[str] = None):
-    """Execute visualization code or generate automatic visualization from response."""
-    # Only handle temperature event visualization
+    """
+    Execute visualization code or generate automatic visualization from response.
+
+    Nothing is rendered here: the status message is returned, so a caller that caches the
+    figure can still show it when the figure comes from the cache.
+
+    Returns:
+        tuple: (figure or None, status), status being ('info' or 'error', message) or None
+    """
+    # Only handle temperature event and return-level visualization
     if response:
+        is_levels, df, event_type = parse_return_level_json(response)
+        if is_levels and df is not None:
+            if not GEOJSON_AVAILABLE:
+                return None, ('error', GEOJSON_MISSING_MESSAGE)
+            with STAGE_LATENCY.time(stage='figure'):
+                return create_return_level_choropleth(df, event_type or 'mixed'), None
         is_temp_data, df, event_type = parse_temperature_json(response)
         
         if is_temp_data and df is not None:
-            st.info("*Temperatures shown in NERC region represent maximum recorded during the heat wave event or minimum recorded during the cold snap event.*")
-            return create_animated_choropleth_from_data(df, event_type or 'mixed')
+            with STAGE_LATENCY.time(stage='figure'):
+                if MAP_LEVEL == 'county' and COUNTY_GEOJSON_AVAILABLE:
+                    fig = create_county_choropleth_from_data(df, event_type or 'mixed')
+                elif not GEOJSON_AVAILABLE:
+                    return None, ('error', GEOJSON_MISSING_MESSAGE)
+                else:
+                    fig = create_animated_choropleth_from_data(df, event_type or 'mixed')
+            if fig is None:
+                return None, ('error', "Error creating animated choropleth.")
+            return fig, ('info', EVENT_MAP_NOTE)
     
     # No visualization possible
-    st.info("No visualization data detected. Please provide temperature event data.")
-    return None
+    return None, ('info', "No visualization data detected. Please provide temperature event data.")
@@ -0,0 +1,53 @@
+"""
+Background warm-up of heavy modules.
+
+The landing page only needs Streamlit and the access-code check. While a user
+is typing their code, a daemon thread imports the modules the main app needs
+(pandas, plotly, shapely, SQLAlchemy, LangChain and the app's own modules)
+so the first authenticated rerun finds them in sys.modules. Python's import
+lock makes a main-thread import of a module that is still warming up wait
+for it rather than import it twice.
+"""
+import importlib
+import threading
+import time
+from typing import Dict, Optional
+
+# Heaviest first: the agent stack dominates cold-start time
+WARMUP_MODULES = (
+    'langchain_openai',
+    'langchain_community.agent_toolkits',
+    'pandas',
+    'pyarrow',
+    'plotly.graph_objects',
+    'shapely.geometry',
+    'sqlalchemy',
+    'models.llm_service',
+    'utils.visualization',
+    'utils.refinement',
+    'utils.session_memory',
+)
+
+WARMUP_TIMINGS: Dict[str, float] = {}
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def _warm_up():
+    for name in WARMUP_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception:
+            continue
+        WARMUP_TIMINGS[name] = time.perf_counter() - start
+
+
+def start_background_warmup() -> threading.Thread:
+    """Start the warm-up thread once per process and return it."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_warm_up, name='gridcopilot-warmup', daemon=True)
+            _thread.start()
+        return _thread